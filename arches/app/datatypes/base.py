@@ -221,6 +221,16 @@ class BaseDataType(object):
             if display_value:
                 return str(display_value)
 
+    def get_display_values__bulk(self, tiles, node):
+        """
+        Returns a list of the display values of the given node in each of a list of tiles,
+        in the same order as the tiles
+
+        Datatypes that look up their display values in the database override this
+        to resolve the values of all the tiles at once
+        """
+        return [self.get_display_value(tile, node) for tile in tiles]
+
     def get_search_terms(self, nodevalue, nodeid=None):
         """
         Returns a nodevalue if it qualifies as a search term
@@ -12,6 +12,7 @@ from arches.app.datatypes.datatypes import DataTypeFactory, get_value_from_jsonl
 from arches.app.models.concept import get_preflabel_from_valueid, get_preflabel_from_conceptid, get_valueids_from_concept_label
 from arches.app.search.elasticsearch_dsl_builder import Bool, Match, Range, Term, Nested, Exists, Terms
 from arches.app.utils.date_utils import ExtendedDateFormat
+from arches.app.utils.lru_cache import LRUCache
 # for the RDF graph export helper functions
 from rdflib import Namespace, URIRef, Literal, BNode
 from rdflib import ConjunctiveGraph as Graph
@@ -25,10 +26,13 @@ cidoc_nm = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
 
 logger = logging.getLogger(__name__)
 
+# the concept values most recently looked up by this process, keyed to valueid
+concept_value_cache = LRUCache(settings.CONCEPT_VALUE_CACHE_SIZE)
+
+
 class BaseConceptDataType(BaseDataType):
     def __init__(self, model=None):
         super(BaseConceptDataType, self).__init__(model=model)
-        self.value_lookup = {}
         self.collection_lookup = {}
         self.collection_by_node_lookup = {}
 
@@ -58,14 +62,52 @@ class BaseConceptDataType(BaseDataType):
         return result
 
     def get_value(self, valueid):
-        try:
-            return self.value_lookup[valueid]
-        except:
+        value = concept_value_cache.get(str(valueid))
+        if value is None:
             try:
-                self.value_lookup[valueid] = models.Value.objects.get(pk=valueid)
-                return self.value_lookup[valueid]
+                value = models.Value.objects.get(pk=valueid)
+                concept_value_cache.set(str(valueid), value)
             except ObjectDoesNotExist:
                 return models.Value()
+        return value
+
+    def get_values__bulk(self, valueids):
+        """
+        Returns a dictionary of concept values keyed to valueid, fetching the values
+        that aren't already cached with a single query
+
+        Arguments:
+        valueids -- a list of valueids (strings or uuids)
+
+        """
+
+        ret = {}
+        missing = set()
+        for valueid in valueids:
+            value = concept_value_cache.get(str(valueid))
+            if value is None:
+                missing.add(str(valueid))
+            else:
+                ret[str(valueid)] = value
+        if len(missing) > 0:
+            for value in models.Value.objects.filter(pk__in=missing):
+                concept_value_cache.set(str(value.pk), value)
+                ret[str(value.pk)] = value
+        return ret
+
+    def get_display_values__bulk(self, tiles, node):
+        valueids = []
+        for tile in tiles:
+            data = self.get_tile_data(tile)
+            nodevalue = data.get(str(node.nodeid)) if data else None
+            for valueid in nodevalue if isinstance(nodevalue, list) else [nodevalue]:
+                try:
+                    valueids.append(uuid.UUID(str(valueid)))
+                except ValueError:
+                    # leave empty and invalid values to get_display_value
+                    pass
+        self.get_values__bulk(valueids)
+        return super(BaseConceptDataType, self).get_display_values__bulk(tiles, node)
 
     def get_concept_export_value(self, valueid, concept_export_value_type=None):
         ret = ""
@@ -22,11 +22,11 @@ from arches.app.utils.date_utils import ExtendedDateFormat
 from arches.app.utils.module_importer import get_class_from_modulename
 from arches.app.utils.permission_backend import user_is_resource_reviewer
 from arches.app.utils.geo_utils import GeoUtils
+from arches.app.utils.thumbnails import create_thumbnail, is_image
 import arches.app.utils.task_management as task_management
 from arches.app.search.elasticsearch_dsl_builder import Query, Dsl, Bool, Match, Range, Term, Terms, Nested, Exists, RangeDSLException
 from arches.app.search.search_engine_factory import SearchEngineInstance as se
 from arches.app.search.mappings import RESOURCES_INDEX
-from django.core.cache import cache
 from django.core.files import File
 from django.core.files.base import ContentFile
 from django.core.files.storage import FileSystemStorage, default_storage
@@ -445,11 +445,6 @@ class DateDataType(BaseDataType):
         except KeyError:
             pass
 
-    def after_update_all(self, tile=None):
-        config = cache.get("time_wheel_config_anonymous")
-        if config is not None:
-            cache.delete("time_wheel_config_anonymous")
-
     def is_a_literal_in_rdf(self):
         return True
 
@@ -1354,6 +1349,7 @@ class FileListDataType(BaseDataType):
                 file_model.tile = tile
                 if models.TileModel.objects.filter(pk=tile.tileid).count() > 0:
                     file_model.save()
+                    self.create_mobile_thumbnail(file_model)
                 if current_tile_data[nodeid] is not None:
                     resave_tile = False
                     updated_file_records = []
@@ -1375,6 +1371,18 @@ class FileListDataType(BaseDataType):
                                 tile_to_update.provisionaledits[str(user.id)]["value"][nodeid] = updated_file_records
                             tile_to_update.save()
 
+    def create_mobile_thumbnail(self, file_model):
+        """
+        Saves the thumbnail sent to mobile devices for an uploaded image so
+        that it doesn't need to be rendered when syncing mobile surveys
+        """
+
+        if is_image(file_model):
+            try:
+                create_thumbnail(file_model, settings.MOBILE_IMAGE_SIZE_LIMITS["thumb"])
+            except Exception as e:
+                logger.warning(_("Unable to create a thumbnail of file {0}: {1}").format(file_model.fileid, e))
+
     def get_compatible_renderers(self, file_data):
         extension = Path(file_data["name"]).suffix.strip(".")
         compatible_renderers = []
@@ -1589,6 +1597,8 @@ class FileListDataType(BaseDataType):
 
                     file_model.tile = tile
                     file_model.save()
+                    if created:
+                        self.create_mobile_thumbnail(file_model)
                     if file["name"] == file_data.name and "url" not in list(file.keys()):
                         file["file_id"] = str(file_model.pk)
                         file["url"] = str(file_model.path.url)
@@ -1938,26 +1948,48 @@ class ResourceInstanceDataType(BaseDataType):
             ret = cursor.fetchone()
         return ret
 
-    def get_display_value(self, tile, node):
+    def get_resource_names__bulk(self, resourceids):
+        """
+        Returns a dictionary of the display names of the resources with the given ids keyed to resourceid,
+        fetching the resources and calculating their names all at once
+
+        Ids of resources that aren't in the system are left out of the dictionary
+        """
         from arches.app.models.resource import Resource  # import here rather than top to avoid circular import
 
-        resourceid = None
-        data = self.get_tile_data(tile)
-        nodevalue = self.get_id_list(data[str(node.nodeid)])
+        resources = list(Resource.objects.filter(pk__in=resourceids)) if len(resourceids) > 0 else []
+        Resource.get_descriptors__bulk(resources)
+        return {str(resource.pk): resource.name for resource in resources}
 
-        items = []
-        for resourceXresource in nodevalue:
+    def get_related_resourceids(self, tile, node):
+        data = self.get_tile_data(tile)
+        resourceids = []
+        for resourceXresource in self.get_id_list(data[str(node.nodeid)]):
             try:
-                resourceid = resourceXresource["resourceId"]
-                related_resource = Resource.objects.get(pk=resourceid)
-                displayname = related_resource.displayname()
-                if displayname is not None:
-                    items.append(displayname)
+                resourceids.append(str(uuid.UUID(resourceXresource["resourceId"])))
             except (TypeError, KeyError):
                 pass
-            except:
-                logger.info(f'Resource with id "{resourceid}" not in the system.')
-        return ", ".join(items)
+            except ValueError:
+                logger.info(f'Resource with id "{resourceXresource["resourceId"]}" not in the system.')
+        return resourceids
+
+    def get_display_value(self, tile, node):
+        return self.get_display_values__bulk([tile], node)[0]
+
+    def get_display_values__bulk(self, tiles, node):
+        resourceids_by_tile = [self.get_related_resourceids(tile, node) for tile in tiles]
+        names = self.get_resource_names__bulk({resourceid for resourceids in resourceids_by_tile for resourceid in resourceids})
+
+        display_values = []
+        for resourceids in resourceids_by_tile:
+            items = []
+            for resourceid in resourceids:
+                if resourceid not in names:
+                    logger.info(f'Resource with id "{resourceid}" not in the system.')
+                elif names[resourceid] is not None:
+                    items.append(names[resourceid])
+            display_values.append(", ".join(items))
+        return display_values
 
     def to_json(self, tile, node):
         from arches.app.models.resource import Resource  # import here rather than top to avoid circular import
@@ -2090,25 +2122,22 @@ class ResourceInstanceDataType(BaseDataType):
 
 class ResourceInstanceListDataType(ResourceInstanceDataType):
     def to_json(self, tile, node):
-        from arches.app.models.resource import Resource  # import here rather than top to avoid circular import
-
-        resourceid = None
         data = self.get_tile_data(tile)
         if data:
             nodevalue = self.get_id_list(data[str(node.nodeid)])
+            names = self.get_resource_names__bulk(self.get_related_resourceids(tile, node))
             items = []
 
             for resourceXresource in nodevalue:
                 try:
-                    resourceid = resourceXresource["resourceId"]
-                    related_resource = Resource.objects.get(pk=resourceid)
-                    displayname = related_resource.displayname()
-                    resourceXresource["display_value"] = displayname
-                    items.append(resourceXresource)
-                except (TypeError, KeyError):
+                    resourceid = str(uuid.UUID(resourceXresource["resourceId"]))
+                    if resourceid in names:
+                        resourceXresource["display_value"] = names[resourceid]
+                        items.append(resourceXresource)
+                    else:
+                        logger.info(f'Resource with id "{resourceid}" not in the system.')
+                except (TypeError, KeyError, ValueError):
                     pass
-                except:
-                    logger.info(f'Resource with id "{resourceid}" not in the system.')
             return self.compile_json(tile, node, instance_details=items)
 
     def collects_multiple_values(self):
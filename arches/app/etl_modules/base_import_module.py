@@ -1,7 +1,13 @@
+import io
+import json
+import time
+from datetime import datetime
 from django.utils.translation import ugettext as _
 from django.utils.decorators import method_decorator
-from django.db import connection
+from django.db import connection, transaction
+from arches.app.models.system_settings import settings
 from arches.app.utils.decorators import user_created_transaction_match
+from arches.app.utils.index_database import get_resourceids_by_transaction, index_resources_by_transaction
 from arches.app.utils.transaction import reverse_edit_log_entries
 import arches.app.tasks as tasks
 import arches.app.utils.task_management as task_management
@@ -10,7 +16,155 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+LOAD_STAGING_COLUMNS = (
+    "nodegroupid",
+    "legacyid",
+    "resourceid",
+    "tileid",
+    "parenttileid",
+    "value",
+    "loadid",
+    "nodegroup_depth",
+    "source_description",
+    "passes_validation",
+)
+
+
+def copy_value(value):
+    """
+    Formats a value for use in a PostgreSQL COPY statement using the default text format
+
+    """
+
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_models(cursor, model, instances):
+    """
+    Inserts model instances into the model's table with a single COPY statement
+
+    Arguments:
+    cursor -- a database cursor
+    model -- the model class of the instances
+    instances -- a list of model instances
+
+    """
+
+    if len(instances) == 0:
+        return
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for instance in instances:
+        buffer.write("\t".join(copy_value(field.get_db_prep_save(field.pre_save(instance, True), connection)) for field in fields))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert("COPY {0} ({1}) FROM STDIN".format(model._meta.db_table, ", ".join(field.column for field in fields)), buffer)
+
+
 class BaseImportModule(object):
+    def copy_to_load_staging(self, cursor, rows):
+        """
+        Writes rows into the load_staging table with a single COPY statement
+
+        Arguments:
+        cursor -- a database cursor
+        rows -- a list of dictionaries keyed by load_staging column name (missing columns are written as null)
+
+        """
+
+        if len(rows) == 0:
+            return
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(copy_value(row.get(column)) for column in LOAD_STAGING_COLUMNS))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert("COPY load_staging ({0}) FROM STDIN".format(", ".join(LOAD_STAGING_COLUMNS)), buffer)
+
+    def index_load(self, loadid):
+        """
+        Indexes the resources created by a load
+
+        If a celery worker is available the resources are split into chunks of settings.BULK_IMPORT_BATCH_SIZE
+        and indexed in parallel by the workers, leaving the load_event status as "indexing" until the last
+        chunk completes. Otherwise the resources are indexed in this process.
+        The load_event status is set to "failed" if any of the resources couldn't be indexed.
+        Progress (indexed count, rate and eta) is written to load_event.load_details["indexing"] as chunks complete.
+
+        """
+
+        resourceids = [str(resourceid) for resourceid in get_resourceids_by_transaction(loadid)]
+        self.start_indexing_progress(loadid, len(resourceids))
+        chunk_size = settings.BULK_IMPORT_BATCH_SIZE
+
+        if len(resourceids) > chunk_size and task_management.check_if_celery_available():
+            from celery import chord
+
+            with connection.cursor() as cursor:
+                cursor.execute("""UPDATE load_event SET status = %s WHERE loadid = %s""", ("indexing", loadid))
+            chunks = [resourceids[i : i + chunk_size] for i in range(0, len(resourceids), chunk_size)]
+            chord([tasks.index_load_chunk.s(str(loadid), chunk) for chunk in chunks])(
+                tasks.index_load_complete.si(str(loadid)).on_error(tasks.index_load_error.si(str(loadid)))
+            )
+        else:
+            stats = index_resources_by_transaction(
+                loadid,
+                quiet=True,
+                use_multiprocessing=False,
+                resourceids=resourceids,
+                callback=lambda indexed: self.update_indexing_progress(loadid, indexed),
+            )
+            if len(stats.failures) > 0:
+                tasks.index_load_error(str(loadid))
+            else:
+                self.complete_indexing(loadid)
+
+    def start_indexing_progress(self, loadid, total):
+        progress = {"total": total, "indexed": 0, "rate": None, "eta": None, "started": time.time()}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """UPDATE load_event SET load_details = coalesce(load_details::jsonb, '{}'::jsonb) || jsonb_build_object('indexing', %s::jsonb) WHERE loadid = %s""",
+                (json.dumps(progress), loadid),
+            )
+
+    def update_indexing_progress(self, loadid, indexed):
+        """
+        Adds to the count of indexed resources of a load and recalculates the indexing rate (resources per second)
+        and estimated time remaining (seconds). Safe to call concurrently from several workers.
+
+        Arguments:
+        loadid -- the id of the load
+        indexed -- the number of resources indexed since the last update
+
+        """
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("""SELECT load_details->'indexing' FROM load_event WHERE loadid = %s FOR UPDATE""", [loadid])
+                row = cursor.fetchone()
+                progress = row[0] if row is not None and row[0] is not None else {}
+                if isinstance(progress, str):
+                    progress = json.loads(progress)
+                progress["indexed"] = progress.get("indexed", 0) + indexed
+                elapsed = time.time() - progress.get("started", time.time())
+                if elapsed > 0:
+                    progress["rate"] = round(progress["indexed"] / elapsed, 2)
+                    remaining = max(progress.get("total", 0) - progress["indexed"], 0)
+                    progress["eta"] = round(remaining / progress["rate"]) if progress["rate"] else None
+                cursor.execute(
+                    """UPDATE load_event SET load_details = coalesce(load_details::jsonb, '{}'::jsonb) || jsonb_build_object('indexing', %s::jsonb) WHERE loadid = %s""",
+                    (json.dumps(progress), loadid),
+                )
+
+    def complete_indexing(self, loadid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """UPDATE load_event SET (status, indexed_time, complete, successful) = (%s, %s, %s, %s) WHERE loadid = %s""",
+                ("indexed", datetime.now(), True, True, loadid),
+            )
+
     def reverse_load(self, loadid):
         with connection.cursor() as cursor:
             cursor.execute(
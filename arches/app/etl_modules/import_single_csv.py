@@ -17,7 +17,6 @@ from arches.app.models.system_settings import settings
 import arches.app.tasks as tasks
 from arches.app.utils.betterJSONSerializer import JSONSerializer
 from arches.app.utils.file_validator import FileValidator
-from arches.app.utils.index_database import index_resources_by_transaction
 from arches.app.etl_modules.base_import_module import BaseImportModule
 import arches.app.utils.task_management as task_management
 
@@ -214,12 +213,7 @@ class ImportSingleCsv(BaseImportModule):
                     """UPDATE load_event SET (status, load_end_time) = (%s, %s) WHERE loadid = %s""",
                     ("completed", datetime.now(), loadid),
                 )
-            index_resources_by_transaction(loadid, quiet=True, use_multiprocessing=False)
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    """UPDATE load_event SET (status, indexed_time, complete, successful) = (%s, %s, %s, %s) WHERE loadid = %s""",
-                    ("indexed", datetime.now(), True, True, loadid),
-                )
+            self.index_load(loadid)
             return {"success": True, "data": "success"}
         else:
             with connection.cursor() as cursor:
@@ -242,9 +236,14 @@ class ImportSingleCsv(BaseImportModule):
         return {"success": True, "data": message}
 
     def populate_staging_table(self, loadid, graphid, has_headers, fieldnames, csv_file_name, id_label):
+        """
+        Transforms and validates the csv rows and writes them to the load_staging table in chunks
+        of settings.BULK_IMPORT_BATCH_SIZE rows, each chunk with a single COPY statement
+        """
 
         temp_dir = os.path.join("uploadedfiles", "tmp", loadid)
         csv_file_path = os.path.join(temp_dir, csv_file_name)
+        column_lookup = self.get_column_lookup(graphid, fieldnames, id_label, temp_dir)
 
         with default_storage.open(csv_file_path, mode="r") as csvfile:
             reader = csv.DictReader(csvfile, fieldnames=fieldnames)
@@ -253,108 +252,13 @@ class ImportSingleCsv(BaseImportModule):
                 next(reader)
 
             with connection.cursor() as cursor:
+                staging_rows = []
                 for row in reader:
-                    if id_label in row:
-                        try:
-                            resourceid = uuid.UUID(row[id_label])
-                            legacyid = None
-                        except (AttributeError, ValueError):
-                            resourceid = uuid.uuid4()
-                            legacyid = row[id_label]
-                    else:
-                        resourceid = uuid.uuid4()
-                        legacyid = None
-
-                    dict_by_nodegroup = {}
-
-                    for key in row:
-                        if key != "" and key != id_label:
-                            current_node = self.get_node_lookup(graphid).get(alias=key)
-                            nodegroupid = str(current_node.nodegroup_id)
-                            node = str(current_node.nodeid)
-                            datatype = self.node_lookup[graphid].get(nodeid=node).datatype
-                            datatype_instance = self.datatype_factory.get_instance(datatype)
-                            source_value = row[key]
-                            if datatype == "file-list":
-                                config = current_node.config
-                                config["path"] = temp_dir
-                                value = (
-                                    datatype_instance.transform_value_for_tile(source_value, **config) if source_value is not None else None
-                                )
-                                errors = datatype_instance.validate(value, nodeid=node, path=temp_dir)
-                            else:
-                                value = datatype_instance.transform_value_for_tile(source_value) if source_value is not None else None
-                                errors = datatype_instance.validate(value)
-                            valid = True if len(errors) == 0 else False
-                            error_message = ""
-                            for error in errors:
-                                error_message = (
-                                    "{0}|{1}".format(error_message, error["message"]) if error_message != "" else error["message"]
-                                )
-
-                            if nodegroupid in dict_by_nodegroup:
-                                dict_by_nodegroup[nodegroupid].append(
-                                    {
-                                        node: {
-                                            "value": value,
-                                            "valid": valid,
-                                            "source": source_value,
-                                            "notes": error_message,
-                                            "datatype": datatype,
-                                        }
-                                    }
-                                )
-                            else:
-                                dict_by_nodegroup[nodegroupid] = [
-                                    {
-                                        node: {
-                                            "value": value,
-                                            "valid": valid,
-                                            "source": source_value,
-                                            "notes": error_message,
-                                            "datatype": datatype,
-                                        }
-                                    }
-                                ]
-
-                    for nodegroup in dict_by_nodegroup:
-                        tile_data = self.get_blank_tile_lookup(nodegroup)
-                        passes_validation = True
-                        for node in dict_by_nodegroup[nodegroup]:
-                            for key in node:
-                                tile_data[key] = node[key]
-                                if node[key]["valid"] is False:
-                                    passes_validation = False
-
-                        tileid = uuid.uuid4()
-                        tile_value_json = JSONSerializer().serialize(tile_data)
-                        node_depth = 0
-
-                        cursor.execute(
-                            """
-                            INSERT INTO load_staging (
-                                nodegroupid,
-                                legacyid,
-                                resourceid,
-                                tileid,
-                                value,
-                                loadid,
-                                nodegroup_depth,
-                                source_description,
-                                passes_validation
-                            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-                            (
-                                nodegroup,
-                                legacyid,
-                                resourceid,
-                                tileid,
-                                tile_value_json,
-                                loadid,
-                                node_depth,
-                                csv_file_name,
-                                passes_validation,
-                            ),
-                        )
+                    staging_rows.extend(self.get_staging_rows(row, column_lookup, loadid, csv_file_name, id_label))
+                    if len(staging_rows) >= settings.BULK_IMPORT_BATCH_SIZE:
+                        self.copy_to_load_staging(cursor, staging_rows)
+                        staging_rows = []
+                self.copy_to_load_staging(cursor, staging_rows)
 
                 cursor.execute("""CALL __arches_check_tile_cardinality_violation_for_load(%s)""", [loadid])
 
@@ -363,6 +267,104 @@ class ImportSingleCsv(BaseImportModule):
         message = "staging table populated"
         return {"success": True, "data": message}
 
+    def get_column_lookup(self, graphid, fieldnames, id_label, temp_dir):
+        """
+        Resolves each csv column (node alias) to its node, nodegroup and datatype once per load
+        """
+
+        nodes_by_alias = {node.alias: node for node in self.get_node_lookup(graphid)}
+        column_lookup = {}
+        for key in fieldnames:
+            if key != "" and key != id_label:
+                node = nodes_by_alias[key]
+                config = node.config
+                if node.datatype == "file-list":
+                    config = dict(config or {}, path=temp_dir)
+                column_lookup[key] = {
+                    "nodeid": str(node.nodeid),
+                    "nodegroupid": str(node.nodegroup_id),
+                    "datatype": node.datatype,
+                    "datatype_instance": self.datatype_factory.get_instance(node.datatype),
+                    "config": config,
+                    "path": temp_dir,
+                }
+        return column_lookup
+
+    def get_staging_rows(self, row, column_lookup, loadid, csv_file_name, id_label):
+        """
+        Transforms and validates a single csv row and returns a load_staging row for each nodegroup in it
+        """
+
+        if id_label in row:
+            try:
+                resourceid = uuid.UUID(row[id_label])
+                legacyid = None
+            except (AttributeError, ValueError):
+                resourceid = uuid.uuid4()
+                legacyid = row[id_label]
+        else:
+            resourceid = uuid.uuid4()
+            legacyid = None
+
+        dict_by_nodegroup = {}
+
+        for key in row:
+            if key != "" and key != id_label:
+                column = column_lookup[key]
+                node = column["nodeid"]
+                datatype = column["datatype"]
+                datatype_instance = column["datatype_instance"]
+                source_value = row[key]
+                if datatype == "file-list":
+                    value = (
+                        datatype_instance.transform_value_for_tile(source_value, **column["config"]) if source_value is not None else None
+                    )
+                    errors = datatype_instance.validate(value, nodeid=node, path=column["path"])
+                else:
+                    value = datatype_instance.transform_value_for_tile(source_value) if source_value is not None else None
+                    errors = datatype_instance.validate(value)
+                valid = True if len(errors) == 0 else False
+                error_message = ""
+                for error in errors:
+                    error_message = "{0}|{1}".format(error_message, error["message"]) if error_message != "" else error["message"]
+
+                dict_by_nodegroup.setdefault(column["nodegroupid"], []).append(
+                    {
+                        node: {
+                            "value": value,
+                            "valid": valid,
+                            "source": source_value,
+                            "notes": error_message,
+                            "datatype": datatype,
+                        }
+                    }
+                )
+
+        staging_rows = []
+        for nodegroup in dict_by_nodegroup:
+            tile_data = dict(self.get_blank_tile_lookup(nodegroup))
+            passes_validation = True
+            for node in dict_by_nodegroup[nodegroup]:
+                for key in node:
+                    tile_data[key] = node[key]
+                    if node[key]["valid"] is False:
+                        passes_validation = False
+
+            staging_rows.append(
+                {
+                    "nodegroupid": nodegroup,
+                    "legacyid": legacyid,
+                    "resourceid": resourceid,
+                    "tileid": uuid.uuid4(),
+                    "value": JSONSerializer().serialize(tile_data),
+                    "loadid": loadid,
+                    "nodegroup_depth": 0,
+                    "source_description": csv_file_name,
+                    "passes_validation": passes_validation,
+                }
+            )
+        return staging_rows
+
     def delete_from_default_storage(self, directory):
         dirs, files = default_storage.listdir(directory)
         for dir in dirs:
@@ -1,3 +1,4 @@
+import copy
 import logging
 import uuid
 from arches.app.functions.base import BaseFunction
@@ -21,6 +22,27 @@ class AbstractPrimaryDescriptorsFunction(BaseFunction):
 
         pass
 
+    def get_primary_descriptors_from_nodes__bulk(self, resources, descriptor_types, context=None):
+        """
+        Returns a dictionary of descriptors keyed to resource instance id for a list of resources
+        eg: {"<resourceinstanceid>": {"name": "...", "description": "...", "map_popup": "..."}}
+
+        Arguments:
+        resources -- a list of resource instances to which the primary decriptors will be assigned
+        descriptor_types -- a dictionary of descriptor configs keyed to descriptor name (eg: "name", "description", "map_popup")
+
+        Keyword Arguments:
+        context -- string such as "copy" to indicate conditions under which a resource participates in a function.
+        """
+
+        ret = {}
+        for resource in resources:
+            ret[str(resource.resourceinstanceid)] = {
+                descriptor: self.get_primary_descriptor_from_nodes(resource, copy.deepcopy(config), context)
+                for descriptor, config in descriptor_types.items()
+            }
+        return ret
+
 
 class PrimaryDescriptorsFunction(AbstractPrimaryDescriptorsFunction):
     def get_primary_descriptor_from_nodes(self, resource, config, context=None):
@@ -33,43 +55,131 @@ class PrimaryDescriptorsFunction(AbstractPrimaryDescriptorsFunction):
         context -- string such as "copy" to indicate conditions under which a resource participates in a function.
         """
 
-        datatype_factory = None
         try:
-            if (
-                "nodegroup_id" in config
-                and config["nodegroup_id"] != ""
-                and config["nodegroup_id"] is not None
-            ):
-                tiles = models.TileModel.objects.filter(
-                    nodegroup_id=uuid.UUID(config["nodegroup_id"]), sortorder=0
-                ).filter(resourceinstance_id=resource.resourceinstanceid)
+            if "nodegroup_id" in config and config["nodegroup_id"] != "" and config["nodegroup_id"] is not None:
+                tiles = models.TileModel.objects.filter(nodegroup_id=uuid.UUID(config["nodegroup_id"]), sortorder=0).filter(
+                    resourceinstance_id=resource.resourceinstanceid
+                )
                 if len(tiles) == 0:
-                    tiles = models.TileModel.objects.filter(
-                        nodegroup_id=uuid.UUID(config["nodegroup_id"])
-                    ).filter(resourceinstance_id=resource.resourceinstanceid)
-                for tile in tiles:
-                    for node in models.Node.objects.filter(
-                        nodegroup_id=uuid.UUID(config["nodegroup_id"])
-                    ):
-                        data = {}
-                        if len(list(tile.data.keys())) > 0:
-                            data = tile.data
-                        elif (
-                            tile.provisionaledits is not None
-                            and len(list(tile.provisionaledits.keys())) == 1
-                        ):
-                            userid = list(tile.provisionaledits.keys())[0]
-                            data = tile.provisionaledits[userid]["value"]
-                        if str(node.nodeid) in data:
-                            if not datatype_factory:
-                                datatype_factory = DataTypeFactory()
-                            datatype = datatype_factory.get_instance(node.datatype)
-                            value = datatype.get_display_value(tile, node)
-                            if value is None:
-                                value = ""
-                            config["string_template"] = config["string_template"].replace("<%s>" % node.name, str(value))
+                    tiles = models.TileModel.objects.filter(nodegroup_id=uuid.UUID(config["nodegroup_id"])).filter(
+                        resourceinstance_id=resource.resourceinstanceid
+                    )
+                nodes = models.Node.objects.filter(nodegroup_id=uuid.UUID(config["nodegroup_id"]))
+                config["string_template"] = self.format_descriptor(config["string_template"], tiles, nodes)
         except ValueError:
             logger.error(_("Invalid nodegroupid, {0}, participating in descriptor function.").format(config["nodegroup_id"]))
         if config["string_template"].strip() == "":
             config["string_template"] = _("Undefined")
         return config["string_template"]
+
+    def get_primary_descriptors_from_nodes__bulk(self, resources, descriptor_types, context=None):
+        """
+        Returns a dictionary of descriptors keyed to resource instance id for a list of resources
+        eg: {"<resourceinstanceid>": {"name": "...", "description": "...", "map_popup": "..."}}
+
+        The tiles and nodes needed by all the descriptors are fetched with a single query each
+
+        Arguments:
+        resources -- a list of resource instances to which the primary decriptors will be assigned
+        descriptor_types -- a dictionary of descriptor configs keyed to descriptor name (eg: "name", "description", "map_popup")
+
+        Keyword Arguments:
+        context -- string such as "copy" to indicate conditions under which a resource participates in a function.
+        """
+
+        nodegroupids = {}
+        for descriptor, config in descriptor_types.items():
+            if "nodegroup_id" in config and config["nodegroup_id"] != "" and config["nodegroup_id"] is not None:
+                try:
+                    nodegroupids[descriptor] = uuid.UUID(config["nodegroup_id"])
+                except ValueError:
+                    logger.error(_("Invalid nodegroupid, {0}, participating in descriptor function.").format(config["nodegroup_id"]))
+
+        resourceids = [resource.resourceinstanceid for resource in resources]
+        tiles_by_resource_and_nodegroup = {}
+        nodes_by_nodegroup = {}
+        if len(nodegroupids) > 0 and len(resourceids) > 0:
+            for tile in models.TileModel.objects.filter(resourceinstance_id__in=resourceids, nodegroup_id__in=set(nodegroupids.values())):
+                key = (str(tile.resourceinstance_id), str(tile.nodegroup_id))
+                tiles_by_resource_and_nodegroup.setdefault(key, []).append(tile)
+            for node in models.Node.objects.filter(nodegroup_id__in=set(nodegroupids.values())):
+                nodes_by_nodegroup.setdefault(str(node.nodegroup_id), []).append(node)
+        display_values = self.get_display_values__bulk(tiles_by_resource_and_nodegroup, nodes_by_nodegroup)
+
+        ret = {}
+        for resourceid in resourceids:
+            descriptors = {}
+            for descriptor, config in descriptor_types.items():
+                string_template = config["string_template"]
+                if descriptor in nodegroupids:
+                    nodegroupid = str(nodegroupids[descriptor])
+                    tiles = tiles_by_resource_and_nodegroup.get((str(resourceid), nodegroupid), [])
+                    first_tiles = [tile for tile in tiles if tile.sortorder == 0]
+                    if len(first_tiles) > 0:
+                        tiles = first_tiles
+                    string_template = self.format_descriptor(
+                        string_template, tiles, nodes_by_nodegroup.get(nodegroupid, []), display_values=display_values
+                    )
+                if string_template.strip() == "":
+                    string_template = _("Undefined")
+                descriptors[descriptor] = string_template
+            ret[str(resourceid)] = descriptors
+        return ret
+
+    def get_display_values__bulk(self, tiles_by_resource_and_nodegroup, nodes_by_nodegroup):
+        """
+        Returns a dictionary of display values keyed to (tileid, nodeid), resolving the values of each node
+        for the tiles of all the resources at once
+
+        """
+
+        tiles_by_nodegroup = {}
+        for (resourceid, nodegroupid), tiles in tiles_by_resource_and_nodegroup.items():
+            tiles_by_nodegroup.setdefault(nodegroupid, []).extend(tile for tile in tiles if len(list(tile.data.keys())) > 0)
+
+        datatype_factory = DataTypeFactory()
+        display_values = {}
+        for nodegroupid, tiles in tiles_by_nodegroup.items():
+            for node in nodes_by_nodegroup.get(nodegroupid, []):
+                node_tiles = [tile for tile in tiles if str(node.nodeid) in tile.data]
+                if len(node_tiles) > 0:
+                    datatype = datatype_factory.get_instance(node.datatype)
+                    for tile, value in zip(node_tiles, datatype.get_display_values__bulk(node_tiles, node)):
+                        display_values[(str(tile.tileid), str(node.nodeid))] = value
+        return display_values
+
+    def format_descriptor(self, string_template, tiles, nodes, display_values=None):
+        """
+        Replaces the <node name> placeholders in the string template with the display values found in the tiles
+
+        Arguments:
+        string_template -- the descriptor template eg: "<Name> (<Type>)"
+        tiles -- the tiles of the descriptor's nodegroup
+        nodes -- the nodes of the descriptor's nodegroup
+
+        Keyword Arguments:
+        display_values -- a dictionary of display values already resolved for the tiles keyed to (tileid, nodeid)
+
+        """
+
+        datatype_factory = None
+        for tile in tiles:
+            for node in nodes:
+                data = {}
+                if len(list(tile.data.keys())) > 0:
+                    data = tile.data
+                elif tile.provisionaledits is not None and len(list(tile.provisionaledits.keys())) == 1:
+                    userid = list(tile.provisionaledits.keys())[0]
+                    data = tile.provisionaledits[userid]["value"]
+                if str(node.nodeid) in data:
+                    if display_values is not None and (str(tile.tileid), str(node.nodeid)) in display_values:
+                        value = display_values[(str(tile.tileid), str(node.nodeid))]
+                    else:
+                        if not datatype_factory:
+                            datatype_factory = DataTypeFactory()
+                        datatype = datatype_factory.get_instance(node.datatype)
+                        value = datatype.get_display_value(tile, node)
+                    if value is None:
+                        value = ""
+                    string_template = string_template.replace("<%s>" % node.name, str(value))
+        return string_template
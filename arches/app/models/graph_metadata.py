@@ -0,0 +1,225 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import threading
+import uuid
+from django.core.cache import caches
+from arches.app.models import models
+from arches.app.models.system_settings import settings
+
+
+class GraphMetadata(object):
+    """
+    A process wide cache of the graph metadata needed to save and index resources
+    (node datatypes, node nodegroups, root ontology classes and functions applied to graphs)
+
+    The cached values are stamped with a version token kept in the cache named by
+    settings.GRAPH_METADATA_CACHE so that a graph or node saved in one process
+    invalidates the metadata held by every other process
+
+    To use, import the shared instance:
+
+        from arches.app.models.graph_metadata import graph_metadata
+        ....
+        graph_metadata.get_node_datatypes()
+
+    """
+
+    VERSION_KEY = "graph_metadata_version"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._store = {}
+
+    def _get_shared_cache(self):
+        return caches[settings.GRAPH_METADATA_CACHE]
+
+    def _get_current_version(self):
+        shared_cache = self._get_shared_cache()
+        version = shared_cache.get(self.VERSION_KEY)
+        if version is None:
+            shared_cache.add(self.VERSION_KEY, str(uuid.uuid4()), None)
+            version = shared_cache.get(self.VERSION_KEY)
+        return version
+
+    def _get(self, key, loader):
+        version = self._get_current_version()
+        if version is None:
+            # the configured cache can't share a version (eg: a dummy cache) so nothing is cached
+            return loader()
+
+        with self._lock:
+            if version != self._version:
+                self._store = {}
+                self._version = version
+            if key not in self._store:
+                self._store[key] = loader()
+            return self._store[key]
+
+    def invalidate(self):
+        """
+        Drops the metadata cached in this process and bumps the shared version
+        so that other processes reload their metadata on next use
+
+        """
+
+        with self._lock:
+            self._store = {}
+            self._version = None
+        self._get_shared_cache().set(self.VERSION_KEY, str(uuid.uuid4()), None)
+
+    def get_node_datatypes(self):
+        """
+        Returns a dictionary of datatypes keyed to node ids
+
+        """
+
+        def load():
+            return {str(nodeid): datatype for nodeid, datatype in models.Node.objects.values_list("nodeid", "datatype")}
+
+        return self._get("node_datatypes", load)
+
+    def get_node_nodegroups(self):
+        """
+        Returns a dictionary of nodegroup ids keyed to node ids
+
+        """
+
+        def load():
+            return {
+                str(nodeid): str(nodegroupid) if nodegroupid is not None else None
+                for nodeid, nodegroupid in models.Node.objects.values_list("nodeid", "nodegroup_id")
+            }
+
+        return self._get("node_nodegroups", load)
+
+    def get_root_ontology_class(self, graphid):
+        """
+        Returns the ontology class of the top node of the graph with the given id
+
+        """
+
+        def load():
+            return {
+                str(graph_id): ontologyclass
+                for graph_id, ontologyclass in models.Node.objects.filter(istopnode=True).values_list("graph_id", "ontologyclass")
+            }
+
+        return self._get("root_ontology_classes", load).get(str(graphid))
+
+    def get_functions_x_graph(self, graphid):
+        """
+        Returns a list of the FunctionXGraph records (with their function) applied to the graph with the given id
+
+        """
+
+        def load():
+            functions_x_graphs = {}
+            for function_x_graph in models.FunctionXGraph.objects.select_related("function"):
+                functions_x_graphs.setdefault(str(function_x_graph.graph_id), []).append(function_x_graph)
+            return functions_x_graphs
+
+        return self._get("functions_x_graphs", load).get(str(graphid), [])
+
+    def get_primary_descriptors_function(self, graphid):
+        """
+        Returns a tuple of the primary descriptors function class and a copy of its config for the
+        graph with the given id, or (None, None) if the graph doesn't have exactly one
+
+        """
+
+        primary_descriptors = [
+            function_x_graph
+            for function_x_graph in self.get_functions_x_graph(graphid)
+            if function_x_graph.function.functiontype == "primarydescriptors"
+        ]
+        if len(primary_descriptors) == 1:
+            return primary_descriptors[0].function.get_class_module(), copy.deepcopy(primary_descriptors[0].config)
+        return None, None
+
+    def get_graph_edge_tree(self, graphid):
+        """
+        Returns the nodes and edges of the graph with the given id along with its edges
+        grouped by the nodegroup they belong to, as used to read and write resources as rdf
+
+            {
+                "nodes": {nodeid: Node},
+                "edges": [Edge],
+                "rootedges": [the edges between the nodes of the root that don't belong to a nodegroup],
+                "subgraphs": {
+                    nodegroupid: {
+                        "edges": [the edges between the nodes of the nodegroup],
+                        "inedge": the edge into the nodegroup's collector node,
+                        "parentnode_nodegroup": the nodegroupid of the domain node of the in edge (or None),
+                    }
+                },
+                "nodedatatypes": {nodeid: datatype},
+                "child_nodes": {nodeid: [the nodes exactly one level below the node]},
+            }
+
+        The returned structure is shared by every caller in the process, so don't modify it
+
+        """
+
+        def load():
+            nodes = {str(node.nodeid): node for node in models.Node.objects.filter(graph_id=graphid).select_related("nodegroup")}
+            edges = list(models.Edge.objects.filter(domainnode__graph_id=graphid))
+            edges_by_domainnode = {}
+            child_nodes = {}
+            inedges = {}
+            for edge in edges:
+                edge.domainnode = nodes[str(edge.domainnode_id)]
+                edge.rangenode = nodes[str(edge.rangenode_id)]
+                edges_by_domainnode.setdefault(str(edge.domainnode_id), []).append(edge)
+                child_nodes.setdefault(str(edge.domainnode_id), []).append(edge.rangenode)
+                inedges[str(edge.rangenode_id)] = edge
+
+            def get_nodegroup_edges_by_collector_node(node):
+                nodegroup_edges = []
+
+                def getchildedges(nodeid):
+                    for edge in edges_by_domainnode.get(nodeid, []):
+                        if node.nodegroup_id == edge.rangenode.nodegroup_id:
+                            nodegroup_edges.append(edge)
+                            getchildedges(str(edge.rangenode_id))
+
+                getchildedges(str(node.nodeid))
+                return nodegroup_edges
+
+            edge_tree = {"nodes": nodes, "edges": edges, "rootedges": [], "subgraphs": {}, "nodedatatypes": {}, "child_nodes": child_nodes}
+            for nodeid, node in nodes.items():
+                edge_tree["nodedatatypes"][nodeid] = node.datatype
+                if node.istopnode:
+                    for edge in get_nodegroup_edges_by_collector_node(node):
+                        if edge.rangenode.nodegroup_id is None:
+                            edge_tree["rootedges"].append(edge)
+                if node.nodegroup_id is not None and str(node.nodegroup_id) == nodeid:
+                    inedge = inedges[nodeid]
+                    edge_tree["subgraphs"][nodeid] = {
+                        "edges": get_nodegroup_edges_by_collector_node(node),
+                        "inedge": inedge,
+                        "parentnode_nodegroup": str(inedge.domainnode.nodegroup_id) if inedge.domainnode.nodegroup_id else None,
+                    }
+            return edge_tree
+
+        return self._get("graph_edge_tree_%s" % graphid, load)
+
+
+graph_metadata = GraphMetadata()
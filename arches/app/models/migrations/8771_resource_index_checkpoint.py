@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models", "8770_bulk_index_queue_insert"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResourceIndexCheckpoint",
+            fields=[
+                ("name", models.TextField(primary_key=True, serialize=False)),
+                ("timestamp", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "resource_index_checkpoints",
+                "managed": True,
+            },
+        ),
+        migrations.RunSQL(
+            "create index if not exists edit_log_timestamp_idx on edit_log (timestamp);",
+            "drop index if exists edit_log_timestamp_idx;",
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("models", "8771_resource_index_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mobilesynclog",
+            name="couchsequence",
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -13,13 +13,11 @@ You should have received a copy of the GNU Affero General Public License
 along with this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
-import io
 import uuid
 import json
 import urllib.parse
 import logging
 import traceback
-from PIL import Image
 from datetime import datetime
 from datetime import timedelta
 from copy import copy, deepcopy
@@ -39,6 +37,7 @@ from arches.app.models.resource import Resource
 from arches.app.models.system_settings import settings
 from arches.app.utils.geo_utils import GeoUtils
 from arches.app.utils.couch import Couch
+from arches.app.utils.thumbnails import get_thumbnail
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from arches.app.utils.permission_backend import user_is_resource_reviewer
 from arches.app.search.search_engine_factory import SearchEngineFactory
@@ -254,21 +253,25 @@ class MobileSurvey(models.MobileSurveyModel):
         ordered_card_ids = [str(mpc.card_id) for mpc in ordered_cards]
         return ordered_card_ids
 
-    def handle_reviewer_edits(self, user, tile):
+    def handle_reviewer_edits(self, user, tile, is_reviewer=None):
         if hasattr(user, "userprofile") is not True:
             models.UserProfile.objects.create(user=user)
-        if user_is_resource_reviewer(user):
+        if is_reviewer is None:
+            is_reviewer = user_is_resource_reviewer(user)
+        if is_reviewer:
             user_id = str(user.id)
             if tile.provisionaledits:
                 tile.provisionaledits.pop(user_id, None)
 
-    def get_provisional_edit(self, doc, tile, sync_user_id, db):
+    def get_provisional_edit(self, doc, tile, sync_user_id, db, nodes=None):
         if doc["provisionaledits"] != "":
             if sync_user_id in doc["provisionaledits"]:
                 user_edit = doc["provisionaledits"][sync_user_id]
                 for nodeid, value in iter(list(user_edit["value"].items())):
                     datatype_factory = DataTypeFactory()
-                    node = models.Node.objects.get(nodeid=nodeid)
+                    node = nodes.get(str(nodeid)) if nodes is not None else None
+                    if node is None:
+                        node = models.Node.objects.get(nodeid=nodeid)
                     datatype = datatype_factory.get_instance(node.datatype)
                     newvalue = datatype.process_mobile_data(tile, node, db, doc, value)
                     if newvalue is not None:
@@ -285,7 +288,7 @@ class MobileSurvey(models.MobileSurveyModel):
             res = models.TileRevisionLog.objects.filter(revisionid=doc["_rev"]).exists()
         return res
 
-    def save_revision_log(self, doc, synclog, action):
+    def get_revision_log(self, doc, synclog, action):
         if doc["type"] == "resource":
             revisionlog = models.ResourceRevisionLog(resourceid=doc["resourceinstanceid"])
         elif doc["type"] == "tile":
@@ -294,7 +297,10 @@ class MobileSurvey(models.MobileSurveyModel):
         revisionlog.revisionid = doc["_rev"]
         revisionlog.synclog = synclog
         revisionlog.action = action
-        revisionlog.save()
+        return revisionlog
+
+    def save_revision_log(self, doc, synclog, action):
+        self.get_revision_log(doc, synclog, action).save()
 
     def check_if_resource_deleted(self, doc):
         return models.EditLog.objects.filter(resourceinstanceid=doc["resourceinstanceid"], edittype="delete").exists()
@@ -349,76 +355,134 @@ class MobileSurvey(models.MobileSurveyModel):
         synclog.save()
 
     def push_edits_to_db(self, synclog, userid=None):
-        # read all docs that have changes
-        # save back to postgres db
+        # read the docs changed since the last successful sync from couch's _changes feed
+        # and save them back to the postgres db in bulk
         synclog.message = _("Pushing Edits to Arches")
         synclog.save()
         db = self.couch.create_db("project_" + str(self.id))
-        user_lookup = {}
-        is_reviewer = False
         sync_user = None
         sync_user_id = None
+        sync_user_is_reviewer = None
         if userid is not None:
             sync_user = User.objects.get(pk=userid)
             sync_user_id = str(sync_user.id)
+            sync_user_is_reviewer = user_is_resource_reviewer(sync_user)
+
+        # each sync only applies the syncing user's provisional edits, so the
+        # changes feed is read from the last sync of this user rather than of the survey
+        last_synclog = (
+            MobileSyncLog.objects.filter(survey=self, userid=userid, status="FINISHED")
+            .exclude(couchsequence=None)
+            .order_by("-finished")
+            .first()
+        )
+        docs, last_sequence = self.couch.changed_docs(db, since=None if last_synclog is None else last_synclog.couchsequence)
+        resource_docs = [doc for doc in docs if doc.get("type") == "resource"]
+        tile_docs = [doc for doc in docs if doc.get("type") == "tile"]
+        resource_revision_logs = []
+        tile_revision_logs = []
 
         with transaction.atomic():
-            couch_docs = self.couch.all_docs(db)
-            for row in couch_docs:
-                if row.doc["type"] == "resource":
-                    if self.check_if_revision_exists(row.doc) is False and self.check_if_resource_deleted(row.doc) is False:
-                        if "provisional_resource" in row.doc and row.doc["provisional_resource"] == "true":
-                            resourceinstance, created = ResourceInstance.objects.update_or_create(
-                                resourceinstanceid=uuid.UUID(str(row.doc["resourceinstanceid"])),
-                                defaults=dict(graph_id=uuid.UUID(str(row.doc["graph_id"]))),
-                            )
-                            if created is True:
-                                print(f"ResourceInstance created: {resourceinstance.pk}")
-                                self.save_revision_log(row.doc, synclog, "create")
-                            else:
-                                print(f"ResourceInstance updated: {resourceinstance.pk}")
-                                self.save_revision_log(row.doc, synclog, "update")
-
-                            print("Resource {0} Saved".format(row.doc["resourceinstanceid"]))
-                    else:
-                        print("{0}: already saved".format(row.doc["_rev"]))
-
-            for row in couch_docs:
+            saved_revisions = set(
+                models.ResourceRevisionLog.objects.filter(revisionid__in=[doc["_rev"] for doc in resource_docs]).values_list(
+                    "revisionid", flat=True
+                )
+            )
+            deleted_resourceids = set(
+                models.EditLog.objects.filter(
+                    edittype="delete", resourceinstanceid__in=[str(doc["resourceinstanceid"]) for doc in resource_docs]
+                ).values_list("resourceinstanceid", flat=True)
+            )
+            for doc in resource_docs:
+                if doc["_rev"] not in saved_revisions and str(doc["resourceinstanceid"]) not in deleted_resourceids:
+                    if "provisional_resource" in doc and doc["provisional_resource"] == "true":
+                        resourceinstance, created = ResourceInstance.objects.update_or_create(
+                            resourceinstanceid=uuid.UUID(str(doc["resourceinstanceid"])),
+                            defaults=dict(graph_id=uuid.UUID(str(doc["graph_id"]))),
+                        )
+                        if created is True:
+                            print(f"ResourceInstance created: {resourceinstance.pk}")
+                            resource_revision_logs.append(self.get_revision_log(doc, synclog, "create"))
+                        else:
+                            print(f"ResourceInstance updated: {resourceinstance.pk}")
+                            resource_revision_logs.append(self.get_revision_log(doc, synclog, "update"))
+
+                        print("Resource {0} Saved".format(doc["resourceinstanceid"]))
+                else:
+                    print("{0}: already saved".format(doc["_rev"]))
+
+            # prefetch everything needed to apply the tile edits
+            existing_resourceids = {
+                str(resourceid)
+                for resourceid in ResourceInstance.objects.filter(
+                    pk__in={str(doc["resourceinstance_id"]) for doc in tile_docs}
+                ).values_list("resourceinstanceid", flat=True)
+            }
+            tile_docs = [doc for doc in tile_docs if str(doc["resourceinstance_id"]) in existing_resourceids]
+            saved_revisions = set(
+                models.TileRevisionLog.objects.filter(revisionid__in=[doc["_rev"] for doc in tile_docs]).values_list(
+                    "revisionid", flat=True
+                )
+            )
+            deleted_tileids = set(
+                models.EditLog.objects.filter(
+                    edittype="tile delete", tileinstanceid__in=[str(doc["tileid"]) for doc in tile_docs]
+                ).values_list("tileinstanceid", flat=True)
+            )
+            existing_tiles = {str(tile.tileid): tile for tile in Tile.objects.filter(pk__in=[doc["tileid"] for doc in tile_docs])}
+            nodeids = {
+                nodeid
+                for doc in tile_docs
+                if isinstance(doc.get("provisionaledits"), dict) and sync_user_id in doc["provisionaledits"]
+                for nodeid in doc["provisionaledits"][sync_user_id]["value"]
+            }
+            nodes = {str(node.nodeid): node for node in models.Node.objects.filter(nodeid__in=nodeids)}
+
+            tiles_to_save = []
+            for doc in tile_docs:
                 tile_data = None
-                if row.doc["type"] == "tile" and ResourceInstance.objects.filter(pk=row.doc["resourceinstance_id"]).exists():
-                    if self.check_if_revision_exists(row.doc) is False and self.check_if_tile_deleted(row.doc) is False:
-                        if "provisionaledits" in row.doc and row.doc["provisionaledits"] is not None:
+                if doc["_rev"] not in saved_revisions and str(doc["tileid"]) not in deleted_tileids:
+                    if "provisionaledits" in doc and doc["provisionaledits"] is not None:
+                        tile = existing_tiles.get(str(doc["tileid"]))
+                        if tile is not None:
                             action = "update"
-                            try:
-                                tile = Tile.objects.get(tileid=row.doc["tileid"])
-                                tile_data = tile.data
-                                prov_edit = self.get_provisional_edit(row.doc, tile, sync_user_id, db)
-                                if prov_edit is not None:
-                                    tile.data = prov_edit
-
-                                # If there are conflicting documents, lets clear those out
-                                if "_conflicts" in row.doc:
-                                    for conflict_rev in row.doc["_conflicts"]:
-                                        conflict_data = db.get(row.id, rev=conflict_rev)
-                                        if conflict_data["provisionaledits"] != "" and conflict_data["provisionaledits"] is not None:
-                                            if sync_user_id in conflict_data["provisionaledits"]:
-                                                tile.data = conflict_data["provisionaledits"][sync_user_id]["value"]
-                                        # Remove conflicted revision from couch
-                                        db.delete(conflict_data)
-
-                            except Tile.DoesNotExist:
-                                action = "create"
-                                tile = Tile(row.doc)
-                                prov_edit = self.get_provisional_edit(row.doc, tile, sync_user_id, db)
-                                if prov_edit is not None:
-                                    tile.data = prov_edit
-
-                            self.handle_reviewer_edits(sync_user, tile)
-                            if tile.data != tile_data:
-                                tile.save(user=sync_user)
-                                self.save_revision_log(row.doc, synclog, action)
-                                logger.info("Tile {0} Saved".format(row.doc["tileid"]))
-                            db.compact()
+                            tile_data = tile.data
+                            prov_edit = self.get_provisional_edit(doc, tile, sync_user_id, db, nodes=nodes)
+                            if prov_edit is not None:
+                                tile.data = prov_edit
+
+                            # If there are conflicting documents, lets clear those out
+                            if "_conflicts" in doc:
+                                for conflict_rev in doc["_conflicts"]:
+                                    conflict_data = db.get(doc["_id"], rev=conflict_rev)
+                                    if conflict_data["provisionaledits"] != "" and conflict_data["provisionaledits"] is not None:
+                                        if sync_user_id in conflict_data["provisionaledits"]:
+                                            tile.data = conflict_data["provisionaledits"][sync_user_id]["value"]
+                                    # Remove conflicted revision from couch
+                                    db.delete(conflict_data)
+                        else:
+                            action = "create"
+                            tile = Tile(doc)
+                            prov_edit = self.get_provisional_edit(doc, tile, sync_user_id, db, nodes=nodes)
+                            if prov_edit is not None:
+                                tile.data = prov_edit
+
+                        self.handle_reviewer_edits(sync_user, tile, sync_user_is_reviewer)
+                        if tile.data != tile_data:
+                            tiles_to_save.append(tile)
+                            tile_revision_logs.append(self.get_revision_log(doc, synclog, action))
+
+            # the tiles are saved together and each edited resource is indexed once
+            Tile.bulk_save(tiles_to_save, user=sync_user)
+            for tile in tiles_to_save:
+                logger.info("Tile {0} Saved".format(tile.tileid))
+            models.ResourceRevisionLog.objects.bulk_create(resource_revision_logs)
+            models.TileRevisionLog.objects.bulk_create(tile_revision_logs)
+
+        # compaction runs in the background in couch, so it only needs to be requested once per sync
+        if len(tile_docs) > 0:
+            db.compact()
+        synclog.couchsequence = str(last_sequence)
 
     def append_to_instances(self, request, instances, resource_type_id):
         search_res_json = search.search_results(request)
@@ -511,50 +575,82 @@ class MobileSurvey(models.MobileSurveyModel):
                         all_instances[result["_id"]] = result["_source"]
         return all_instances
 
-    def load_tiles_into_couch(self, instances, nodegroup):
+    def get_nodegroup_ids_for_couch(self, nodegroupids):
         """
-        Takes a mobile survey object, a couch database instance, and a dictionary
-        of resource instances to identify eligible tiles and load them into the
-        database instance
+        Returns the given nodegroup ids and the ids of all of their descendant nodegroups
+
+        """
+
+        child_nodegroupids = {}
+        for nodegroupid, parentnodegroupid in models.NodeGroup.objects.exclude(parentnodegroup=None).values_list(
+            "nodegroupid", "parentnodegroup_id"
+        ):
+            child_nodegroupids.setdefault(str(parentnodegroupid), []).append(str(nodegroupid))
+
+        ret = set()
+        nodegroupids = [str(nodegroupid) for nodegroupid in nodegroupids]
+        while len(nodegroupids) > 0:
+            nodegroupid = nodegroupids.pop()
+            if nodegroupid not in ret:
+                ret.add(nodegroupid)
+                nodegroupids += child_nodegroupids.get(nodegroupid, [])
+        return ret
+
+    def load_tiles_into_couch(self, instances, nodegroups):
+        """
+        Takes a mobile survey object, a dictionary of resource instances and a list of nodegroups
+        and loads the tiles of those instances in those nodegroups (and their child nodegroups)
+        into the survey's couch database. Only new or changed tiles are written.
         """
         db = self.couch.create_db("project_" + str(self.id))
-        tiles = models.TileModel.objects.filter(nodegroup=nodegroup)
+        nodegroupids = self.get_nodegroup_ids_for_couch([getattr(nodegroup, "pk", nodegroup) for nodegroup in nodegroups])
+        tiles = models.TileModel.objects.filter(nodegroup_id__in=nodegroupids, resourceinstance_id__in=list(instances.keys()))
         tiles_serialized = json.loads(JSONSerializer().serialize(tiles))
         for tile in tiles_serialized:
-            if str(tile["resourceinstance_id"]) in instances:
+            tile["_id"] = tile["tileid"]
+            tile["type"] = "tile"
+
+        try:
+            docs = self.couch.bulk_update_docs(db, tiles_serialized)
+        except Exception as e:
+            logger.exception(e)
+            return
+
+        files = {}
+        for file in models.File.objects.filter(tile_id__in=[doc["_id"] for doc in docs]):
+            files.setdefault(str(file.tile_id), []).append(file)
+        for doc in docs:
+            if doc["_id"] in files:
                 try:
-                    tile["type"] = "tile"
-                    doc = self.couch.update_doc(db, tile, tile["tileid"])
-                    self.add_attachments(db, doc)
+                    self.add_attachments(db, doc, files[doc["_id"]])
                 except Exception as e:
                     print("error on load_tiles_into_couch")
-                    print(e, tile)
-        nodegroups = models.NodeGroup.objects.filter(parentnodegroup=nodegroup)
-        for nodegroup in nodegroups:
-            self.load_tiles_into_couch(instances, nodegroup)
+                    print(e, doc)
 
-    def add_attachments(self, db, tile):
-        files = models.File.objects.filter(tile_id=tile["tileid"])
+    def add_attachments(self, db, tile, files=None):
+        if files is None:
+            files = models.File.objects.filter(tile_id=tile["tileid"])
         for file in files:
-            with Image.open(file.path.file).copy() as image:
-                image = image.convert("RGB")
-                image.thumbnail((settings.MOBILE_IMAGE_SIZE_LIMITS["thumb"], settings.MOBILE_IMAGE_SIZE_LIMITS["thumb"]))
-                b = io.BytesIO()
-                image.save(b, "JPEG")
-                db.put_attachment(tile, b.getvalue(), filename=str(file.fileid), content_type="image/jpeg")
+            thumbnail = get_thumbnail(file, settings.MOBILE_IMAGE_SIZE_LIMITS["thumb"])
+            if thumbnail is not None:
+                db.put_attachment(tile, thumbnail, filename=str(file.fileid), content_type="image/jpeg")
 
     def load_instances_into_couch(self, instances):
         """
         Takes a mobile survey object, a couch database instance, and a dictionary
         of resource instances and loads them into the database instance.
+        Only new or changed instances are written.
         """
         db = self.couch.create_db("project_" + str(self.id))
+        docs = []
         for instanceid, instance in instances.items():
-            try:
-                instance["type"] = "resource"
-                self.couch.update_doc(db, instance, instanceid)
-            except Exception as e:
-                print(e, instance)
+            instance["_id"] = instanceid
+            instance["type"] = "resource"
+            docs.append(instance)
+        try:
+            self.couch.bulk_update_docs(db, docs)
+        except Exception as e:
+            logger.exception(e)
 
     def _delete_items_from_couch(self, key, items_to_delete):
         db = self.couch.create_db("project_" + str(self.id))
@@ -600,7 +696,6 @@ class MobileSurvey(models.MobileSurveyModel):
             self.delete_tiles_from_couch()
 
         instances = self.collect_resource_instances_for_couch()
-        cards = self.cards.all()
-        for card in cards:
-            self.load_tiles_into_couch(instances, card.nodegroup)
+        nodegroupids = [card.nodegroup_id for card in self.cards.all()]
+        self.load_tiles_into_couch(instances, nodegroupids)
         self.load_instances_into_couch(instances)
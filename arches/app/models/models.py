@@ -16,6 +16,7 @@ import datetime
 import logging
 from datetime import timedelta
 from arches.app.utils.module_importer import get_class_from_modulename
+from arches.app.utils.thumbnails import delete_thumbnails
 from django.forms.models import model_to_dict
 from django.contrib.gis.db import models
 from django.db.models import JSONField
@@ -25,14 +26,14 @@ from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import get_template, render_to_string
 from django.core.validators import RegexValidator
 from django.db.models import Q, Max
-from django.db.models.signals import post_delete, pre_save, post_save
+from django.db.models.signals import post_delete, pre_save, post_save, m2m_changed
 from django.dispatch import receiver
 from django.utils.translation import ugettext as _
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import validate_slug
-from guardian.models import GroupObjectPermission
+from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.shortcuts import assign_perm
 
 # can't use "arches.app.models.system_settings.SystemSettings" because of circular refernce issue
@@ -49,6 +50,21 @@ class BulkIndexQueue(models.Model):
         db_table = "bulk_index_queue"
 
 
+class ResourceIndexCheckpoint(models.Model):
+    """
+    Records when resources were last indexed so that later runs only need to
+    index the resources edited since then (see index_database.index_changed_resources)
+
+    """
+
+    name = models.TextField(primary_key=True)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        managed = True
+        db_table = "resource_index_checkpoints"
+
+
 class CardModel(models.Model):
     cardid = models.UUIDField(primary_key=True)
     name = models.TextField(blank=True, null=True)
@@ -300,6 +316,7 @@ class MobileSyncLog(models.Model):
     finished = models.DateTimeField(auto_now=True, null=True)
     message = models.TextField(blank=True, null=True)
     status = models.TextField(blank=True, null=True)
+    couchsequence = models.TextField(blank=True, null=True)  # the couch update sequence this sync read changes up to
 
     def __init__(self, *args, **kwargs):
         super(MobileSyncLog, self).__init__(*args, **kwargs)
@@ -374,6 +391,7 @@ def delete_file_on_delete(sender, instance, **kwargs):
     """
 
     if instance.path:
+        delete_thumbnails(instance)
         try:
             if os.path.isfile(instance.path.path):
                 os.remove(instance.path.path)
@@ -400,6 +418,7 @@ def delete_file_on_change(sender, instance, **kwargs):
 
     new_file = instance.path
     if not old_file == new_file:
+        delete_thumbnails(instance)
         try:
             if os.path.isfile(old_file.path):
                 os.remove(old_file.path)
@@ -640,12 +659,93 @@ class Node(models.Model):
         ]
 
 
-@receiver(post_save, sender=Node)
-def clear_user_permission_cache(sender, instance, **kwargs):
+def delete_cached_user_permissions(userids=None):
+    """
+    Drops the permissions cached for each of the given users (or for every user if no users are given)
+    leaving anything else in the user_permission cache (eg: the graph metadata version and time wheels) in place
+
+    """
+
     user_permission_cache = caches["user_permission"]
 
     if user_permission_cache:
-        user_permission_cache.clear()
+        if userids is None:
+            userids = User.objects.values_list("pk", flat=True)
+        user_permission_cache.delete_many([str(userid) for userid in userids])
+
+
+def is_nodegroup_permission(permission):
+    return permission.content_type_id == ContentType.objects.get_for_model(NodeGroup).pk
+
+
+@receiver(post_save, sender=Node)
+@receiver(post_delete, sender=Node)
+@receiver(post_save, sender=NodeGroup)
+@receiver(post_delete, sender=NodeGroup)
+@receiver(post_save, sender=GraphModel)
+@receiver(post_delete, sender=GraphModel)
+def clear_user_permission_cache(sender, instance, **kwargs):
+    delete_cached_user_permissions()
+
+
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def clear_user_permission_cache_for_group(sender, instance, **kwargs):
+    if is_nodegroup_permission(instance):
+        delete_cached_user_permissions(instance.group.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def clear_user_permission_cache_for_user(sender, instance, **kwargs):
+    if is_nodegroup_permission(instance):
+        delete_cached_user_permissions([instance.user_id])
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def invalidate_restricted_instances(sender, instance, **kwargs):
+    if instance.permission.codename == "no_access_to_resourceinstance":
+        # need this here to prevent a circular import error
+        from arches.app.utils.permission_backend import invalidate_restricted_instances_key
+
+        invalidate_restricted_instances_key()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def clear_user_permission_cache_on_membership_change(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if isinstance(instance, User):
+        delete_cached_user_permissions([instance.pk])
+    elif sender is User.groups.through and action != "post_clear":
+        # users were added to or removed from the group
+        delete_cached_user_permissions(kwargs.get("pk_set") or [])
+    elif sender is Group.permissions.through and isinstance(instance, Group):
+        delete_cached_user_permissions(instance.user_set.values_list("pk", flat=True))
+    else:
+        delete_cached_user_permissions()
+
+
+@receiver(post_save, sender=Node)
+@receiver(post_delete, sender=Node)
+@receiver(post_save, sender=GraphModel)
+@receiver(post_delete, sender=GraphModel)
+@receiver(post_save, sender=FunctionXGraph)
+@receiver(post_delete, sender=FunctionXGraph)
+@receiver(post_save, sender=Edge)
+@receiver(post_delete, sender=Edge)
+@receiver(post_save, sender=NodeGroup)
+@receiver(post_delete, sender=NodeGroup)
+def clear_graph_metadata_cache(sender, instance, **kwargs):
+    # need this here to prevent a circular import error
+    from arches.app.models.graph_metadata import graph_metadata
+
+    graph_metadata.invalidate()
 
 
 class Ontology(models.Model):
@@ -1071,6 +1171,15 @@ class Value(models.Model):
         db_table = "values"
 
 
+@receiver(post_save, sender=Value)
+@receiver(post_delete, sender=Value)
+def clear_concept_value_cache(sender, instance, **kwargs):
+    # need this here to prevent a circular import error
+    from arches.app.datatypes.concept_types import concept_value_cache
+
+    concept_value_cache.pop(str(instance.pk))
+
+
 class FileValue(models.Model):
     valueid = models.UUIDField(primary_key=True)
     concept = models.ForeignKey("Concept", db_column="conceptid", on_delete=models.CASCADE)
@@ -1294,6 +1403,11 @@ def create_permissions_for_new_users(sender, instance, created, **kwargs):
             resourceInstanceId = uuid.UUID(resourceInstanceId)
         resources = ResourceInstance.objects.filter(pk__in=resourceInstanceIds)
         assign_perm("no_access_to_resourceinstance", instance, resources)
+        if len(resources) > 0:
+            # assigning permissions for a queryset bulk creates them without sending post_save
+            from arches.app.utils.permission_backend import invalidate_restricted_instances_key
+
+            invalidate_restricted_instances_key()
         for resource_instance in resources:
             resource = Resource(resource_instance.resourceinstanceid)
             resource.graph_id = resource_instance.graph_id
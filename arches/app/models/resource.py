@@ -31,11 +31,13 @@ from django.utils.translation import ugettext as _
 from arches.app.models import models
 from arches.app.models.models import EditLog
 from arches.app.models.models import TileModel
+from arches.app.models.graph_metadata import graph_metadata
 from arches.app.models.concept import get_preflabel_from_valueid
 from arches.app.models.system_settings import settings
 from arches.app.search.search_engine_factory import SearchEngineInstance as se
 from arches.app.search.mappings import TERMS_INDEX, RESOURCES_INDEX
 from arches.app.search.elasticsearch_dsl_builder import Query, Bool, Terms, Nested
+from arches.app.search.time_wheel import TimeWheel
 from arches.app.tasks import index_resource
 from arches.app.utils import import_class_from_string, task_management
 from arches.app.utils.label_based_graph import LabelBasedGraph
@@ -51,7 +53,9 @@ from arches.app.utils.permission_backend import (
     user_is_resource_reviewer,
     get_users_for_object,
     get_restricted_users,
+    get_restricted_users__bulk,
     get_restricted_instances,
+    get_nodegroups_by_perm,
 )
 from arches.app.datatypes.datatypes import DataTypeFactory
 
@@ -72,24 +76,52 @@ class Resource(models.ResourceInstance):
         self.tiles = []
 
     def get_descriptor(self, descriptor, context):
-        graph_function = models.FunctionXGraph.objects.filter(
-            graph_id=self.graph_id, function__functiontype="primarydescriptors"
-        ).select_related("function")
+        function_class, config = graph_metadata.get_primary_descriptors_function(self.graph_id)
 
         if self.descriptors is None:
             self.descriptors = {}
 
-        if len(graph_function) == 1:
-            module = graph_function[0].function.get_class_module()()
+        if function_class is not None:
+            module = function_class()
 
-            self.descriptors[descriptor] = module.get_primary_descriptor_from_nodes(
-                self, graph_function[0].config["descriptor_types"][descriptor], context
-            )
+            self.descriptors[descriptor] = module.get_primary_descriptor_from_nodes(self, config["descriptor_types"][descriptor], context)
         else:
             self.descriptors[descriptor] = "undefined"
 
         return self.descriptors[descriptor]
 
+    @staticmethod
+    def get_descriptors__bulk(resources, context=None):
+        """
+        Calculates the name, description and map popup descriptors for a list of resources
+        and assigns them to each resource's descriptors (and name) attribute
+
+        Arguments:
+        resources -- a list of resource models
+
+        Keyword Arguments:
+        context -- a string such as "copy" to indicate conditions under which the descriptors are calculated
+
+        """
+
+        resources_by_graph = {}
+        for resource in resources:
+            resources_by_graph.setdefault(str(resource.graph_id), []).append(resource)
+
+        for graphid, graph_resources in resources_by_graph.items():
+            function_class, config = graph_metadata.get_primary_descriptors_function(graphid)
+            if function_class is not None:
+                function = function_class()
+                descriptors = function.get_primary_descriptors_from_nodes__bulk(graph_resources, config["descriptor_types"], context)
+            else:
+                descriptors = {}
+
+            for resource in graph_resources:
+                resource.descriptors = descriptors.get(
+                    str(resource.resourceinstanceid), {"name": "undefined", "description": "undefined", "map_popup": "undefined"}
+                )
+                resource.name = resource.descriptors.get("name")
+
     def displaydescription(self, context=None):
         return self.get_descriptor("description", context)
 
@@ -161,12 +193,7 @@ class Resource(models.ResourceInstance):
         Finds and returns the ontology class of the instance's root node
 
         """
-        root_ontology_class = None
-        graph_nodes = models.Node.objects.filter(graph_id=self.graph_id).filter(istopnode=True)
-        if len(graph_nodes) > 0:
-            root_ontology_class = graph_nodes[0].ontologyclass
-
-        return root_ontology_class
+        return graph_metadata.get_root_ontology_class(self.graph_id)
 
     def load_tiles(self, user=None, perm=None):
         """
@@ -178,6 +205,28 @@ class Resource(models.ResourceInstance):
         if user:
             self.tiles = [tile for tile in self.tiles if tile.nodegroup_id is not None and user.has_perm(perm, tile.nodegroup)]
 
+    @staticmethod
+    def load_tiles__bulk(resources, user=None, perm=None):
+        """
+        Loads the tiles arrays of a list of resources with a single query
+
+        Keyword Arguments:
+        user -- if supplied only the tiles of nodegroups the user has the given permission on are loaded
+        perm -- the nodegroup permission to check eg: "read_nodegroup"
+
+        """
+
+        if len(resources) == 0:
+            return
+        tiles = models.TileModel.objects.filter(resourceinstance_id__in=[resource.pk for resource in resources])
+        if user:
+            tiles = tiles.filter(nodegroup_id__in=[nodegroup.pk for nodegroup in get_nodegroups_by_perm(user, perm)])
+        tiles_by_resource = {}
+        for tile in tiles:
+            tiles_by_resource.setdefault(str(tile.resourceinstance_id), []).append(tile)
+        for resource in resources:
+            resource.tiles = tiles_by_resource.get(str(resource.pk), [])
+
     # # flatten out the nested tiles into a single array
     def get_flattened_tiles(self):
         tiles = []
@@ -199,7 +248,7 @@ class Resource(models.ResourceInstance):
         """
 
         datatype_factory = DataTypeFactory()
-        node_datatypes = {str(nodeid): datatype for nodeid, datatype in models.Node.objects.values_list("nodeid", "datatype")}
+        node_datatypes = graph_metadata.get_node_datatypes()
         tiles = []
         documents = []
         term_list = []
@@ -225,10 +274,17 @@ class Resource(models.ResourceInstance):
 
         print("Time to save resource edits: %s" % datetime.timedelta(seconds=time() - start))
 
+        Resource.get_descriptors__bulk(resources)
+        restricted_users = get_restricted_users__bulk(resources)
+
         for resource in resources:
             start = time()
             document, terms = resource.get_documents_to_index(
-                fetchTiles=False, datatype_factory=datatype_factory, node_datatypes=node_datatypes
+                fetchTiles=False,
+                datatype_factory=datatype_factory,
+                node_datatypes=node_datatypes,
+                fetchDescriptors=False,
+                restrictions=restricted_users[str(resource.pk)],
             )
 
             documents.append(se.create_bulk_item(index=RESOURCES_INDEX, id=document["resourceinstanceid"], data=document))
@@ -236,8 +292,10 @@ class Resource(models.ResourceInstance):
             for term in terms:
                 term_list.append(se.create_bulk_item(index=TERMS_INDEX, id=term["_id"], data=term["_source"]))
 
-        se.bulk_index(documents)
         se.bulk_index(term_list)
+        # wait for the documents to be searchable so that the time wheels aren't rebuilt from the stale index
+        se.bulk_index(documents, refresh="wait_for")
+        TimeWheel.invalidate()
 
     def index(self, context=None):
         """
@@ -250,39 +308,58 @@ class Resource(models.ResourceInstance):
 
         if str(self.graph_id) != str(settings.SYSTEM_SETTINGS_RESOURCE_MODEL_ID):
             datatype_factory = DataTypeFactory()
-            node_datatypes = {str(nodeid): datatype for nodeid, datatype in models.Node.objects.values_list("nodeid", "datatype")}
+            node_datatypes = graph_metadata.get_node_datatypes()
             document, terms = self.get_documents_to_index(datatype_factory=datatype_factory, node_datatypes=node_datatypes, context=context)
-            document["root_ontology_class"] = self.get_root_ontology()
             doc = JSONSerializer().serializeToPython(document)
-            se.index_data(index=RESOURCES_INDEX, body=doc, id=self.pk)
-            for term in terms:
-                se.index_data("terms", body=term["_source"], id=term["_id"])
-
-            celery_worker_running = task_management.check_if_celery_available()
 
-            for index in settings.ELASTICSEARCH_CUSTOM_INDEXES:
-                if celery_worker_running and index.get("should_update_asynchronously"):
-                    index_resource.apply_async([index["module"], index["name"], self.pk, [tile.pk for tile in document["tiles"]]])
-                else:
-                    es_index = import_class_from_string(index["module"])(index["name"])
-                    doc, doc_id = es_index.get_documents_to_index(self, document["tiles"])
-                    es_index.index_document(document=doc, id=doc_id)
+            # send the resource document, its terms, the deletion of its stale terms
+            # and its custom index documents to elasticsearch in one bulk request
+            # wait for the documents to be searchable so that the time wheels aren't rebuilt from the stale index
+            with se.IndexUnitOfWork(refresh="wait_for") as unit_of_work:
+                unit_of_work.add(index=RESOURCES_INDEX, id=self.pk, data=doc)
+                term_ids = set()
+                for term in terms:
+                    unit_of_work.add(index=TERMS_INDEX, id=term["_id"], data=term["_source"])
+                    term_ids.add(term["_id"])
+                indexed_term_ids = se.get_ids(index=TERMS_INDEX, body={"query": {"term": {"resourceinstanceid": str(self.pk)}}})
+                for term_id in set(indexed_term_ids) - term_ids:
+                    unit_of_work.delete(index=TERMS_INDEX, id=term_id)
+
+                celery_worker_running = task_management.check_if_celery_available()
+
+                for index in settings.ELASTICSEARCH_CUSTOM_INDEXES:
+                    if celery_worker_running and index.get("should_update_asynchronously"):
+                        index_resource.apply_async([index["module"], index["name"], self.pk, [tile.pk for tile in document["tiles"]]])
+                    else:
+                        es_index = import_class_from_string(index["module"])(index["name"])
+                        doc, doc_id = es_index.get_documents_to_index(self, document["tiles"])
+                        es_index.add_document(unit_of_work, document=doc, id=doc_id)
+            TimeWheel.invalidate()
 
             super(Resource, self).save()
 
-    def get_documents_to_index(self, fetchTiles=True, datatype_factory=None, node_datatypes=None, context=None):
+    def get_documents_to_index(
+        self, fetchTiles=True, datatype_factory=None, node_datatypes=None, context=None, fetchDescriptors=True, restrictions=None
+    ):
         """
         Gets all the documents nessesary to index a single resource
         returns a tuple of a document and list of terms
 
         Keyword Arguments:
         fetchTiles -- instead of fetching the tiles from the database get them off the model itself
+        fetchDescriptors -- False to use the descriptors already calculated on the model (see get_descriptors__bulk)
         datatype_factory -- refernce to the DataTypeFactory instance
         node_datatypes -- a dictionary of datatypes keyed to node ids
         context -- a string such as "copy" to indicate conditions under which a document is indexed
+        restrictions -- the users restricted from this resource if already known (see get_restricted_users__bulk)
 
         """
 
+        if node_datatypes is None:
+            node_datatypes = graph_metadata.get_node_datatypes()
+        if datatype_factory is None:
+            datatype_factory = DataTypeFactory()
+
         document = {}
         document["displaydescription"] = None
         document["resourceinstanceid"] = str(self.resourceinstanceid)
@@ -291,13 +368,19 @@ class Resource(models.ResourceInstance):
         document["displayname"] = None
         document["root_ontology_class"] = self.get_root_ontology()
         document["legacyid"] = self.legacyid
-        document["displayname"] = self.displayname(context)
-        document["displaydescription"] = self.displaydescription(context)
-        document["map_popup"] = self.map_popup(context)
+        if fetchDescriptors or self.descriptors is None:
+            document["displayname"] = self.displayname(context)
+            document["displaydescription"] = self.displaydescription(context)
+            document["map_popup"] = self.map_popup(context)
+        else:
+            document["displayname"] = self.descriptors.get("name")
+            document["displaydescription"] = self.descriptors.get("description")
+            document["map_popup"] = self.descriptors.get("map_popup")
 
         tiles = list(models.TileModel.objects.filter(resourceinstance=self)) if fetchTiles else self.tiles
 
-        restrictions = get_restricted_users(self)
+        if restrictions is None:
+            restrictions = get_restricted_users(self)
         document["tiles"] = tiles
         document["permissions"] = {"users_without_read_perm": restrictions["cannot_read"]}
         document["permissions"]["users_without_edit_perm"] = restrictions["cannot_write"]
@@ -445,13 +528,15 @@ class Resource(models.ResourceInstance):
                 pass
 
         # delete resource index
-        se.delete(index=RESOURCES_INDEX, id=resourceinstanceid)
+        se.delete(index=RESOURCES_INDEX, id=resourceinstanceid, refresh="wait_for")
 
         # delete resources from custom indexes
         for index in settings.ELASTICSEARCH_CUSTOM_INDEXES:
             es_index = import_class_from_string(index["module"])(index["name"])
             es_index.delete_resources(resources=self)
 
+        TimeWheel.invalidate()
+
     def validate(self, verbose=False, strict=False):
         """
         Keyword Arguments:
@@ -16,6 +16,7 @@ You should have received a copy of the GNU Affero General Public License
 along with this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
+import copy
 import uuid
 import importlib
 import datetime
@@ -26,13 +27,14 @@ from django.db import IntegrityError
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Q, Max
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 from arches.app.models import models
 from arches.app.models.resource import Resource
 from arches.app.models.resource import EditLog
+from arches.app.models.graph_metadata import graph_metadata
 from arches.app.models.system_settings import settings
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from arches.app.utils.permission_backend import user_is_resource_reviewer
@@ -278,13 +280,18 @@ class Tile(models.TileModel):
                             )
                             raise TileValidationError(message + (", ").join(duplicate_values))
 
-    def check_for_missing_nodes(self):
+    def check_for_missing_nodes(self, nodes=None):
+        """
+        Keyword Arguments:
+        nodes -- an optional dictionary of the tile's nodes keyed to node id, to avoid looking each node up
+        """
+
         if settings.BYPASS_REQUIRED_VALUE_TILE_VALIDATION:
             return
         missing_nodes = []
         for nodeid, value in self.data.items():
             try:
-                node = models.Node.objects.get(nodeid=nodeid)
+                node = nodes[str(nodeid)] if nodes is not None else models.Node.objects.get(nodeid=nodeid)
                 datatype = self.datatype_factory.get_instance(node.datatype)
                 datatype.clean(self, nodeid)
                 if self.data[nodeid] is None and node.isrequired is True:
@@ -303,7 +310,7 @@ class Tile(models.TileModel):
             message += (", ").join(missing_nodes)
             raise TileValidationError(message)
 
-    def validate(self, errors=None, raise_early=True, strict=False, request=None):
+    def validate(self, errors=None, raise_early=True, strict=False, request=None, nodes=None):
         """
         Keyword Arguments:
         errors -- supply and list to have errors appened on to
@@ -311,12 +318,15 @@ class Tile(models.TileModel):
             otherwise throw an error only after all nodes in a tile have been validated
         strict -- False(default), True to use a more complete check on the datatype
             (eg: check for the existance of a referenced resoure on the resource-instance datatype)
+        nodes -- an optional dictionary of the tile's nodes keyed to node id, to avoid looking each node up
         """
 
         tile_errors = []
 
         for nodeid, value in self.data.items():
-            node = models.Node.objects.get(nodeid=nodeid)
+            node = nodes.get(str(nodeid)) if nodes is not None else None
+            if node is None:
+                node = models.Node.objects.get(nodeid=nodeid)
             datatype = self.datatype_factory.get_instance(node.datatype)
             error = datatype.validate(value, node=node, strict=strict, request=request)
             tile_errors += error
@@ -356,9 +366,9 @@ class Tile(models.TileModel):
             userid = None
 
         tile_data = self.get_tile_data(userid)
+        node_datatypes = graph_metadata.get_node_datatypes()
         for nodeid in tile_data.keys():
-            node = models.Node.objects.get(nodeid=nodeid)
-            datatype = self.datatype_factory.get_instance(node.datatype)
+            datatype = self.datatype_factory.get_instance(node_datatypes[str(nodeid)])
             datatype.post_tile_save(self, nodeid, request)
 
     def save(self, *args, **kwargs):
@@ -382,9 +392,9 @@ class Tile(models.TileModel):
             user = None
 
         with transaction.atomic():
+            node_datatypes = graph_metadata.get_node_datatypes()
             for nodeid in self.data.keys():
-                node = models.Node.objects.get(nodeid=nodeid)
-                datatype = self.datatype_factory.get_instance(node.datatype)
+                datatype = self.datatype_factory.get_instance(node_datatypes[str(nodeid)])
                 datatype.pre_tile_save(self, nodeid)
             self.__preSave(request, context=context)
             self.check_for_missing_nodes()
@@ -464,6 +474,173 @@ class Tile(models.TileModel):
                 tile.parenttile = self
                 tile.save(*args, request=request, index=index, **kwargs)
 
+    @staticmethod
+    def bulk_save(tiles, request=None, user=None, index=True, context=None, transaction_id=None):
+        """
+        Saves a list of tiles (and their child tiles), running the same datatype hooks, functions and
+        validation as Tile.save, but inserting, updating and edit logging the tiles in bulk and
+        indexing each affected resource once after all the tiles are saved
+
+        Tiles saved by a user that isn't a resource reviewer are stored as provisional edits,
+        which depend on each tile's saved state, so these are saved one at a time
+
+        Arguments:
+        tiles -- a list of Tile objects
+
+        Keyword Arguments:
+        request -- request object passed from the view to the model
+        user -- the user saving the tiles, defaults to the request user
+        index -- True(default) to index the resources of the saved tiles
+        context -- string e.g. "copy" indicating conditions under which the tiles are saved and how functions should behave
+        transaction_id -- a uuid identifing the save of these tiles as belonging to a collective load or process
+
+        """
+
+        user_is_reviewer = False
+        try:
+            if user is None and request is not None:
+                user = request.user
+            user_is_reviewer = user_is_resource_reviewer(user)
+        except AttributeError:  # no user - probably importing data
+            user = None
+
+        all_tiles = []
+
+        def flatten_tiles(tile):
+            all_tiles.append(tile)
+            for child_tile in tile.tiles:
+                child_tile.resourceinstance_id = tile.resourceinstance_id
+                child_tile.parenttile = tile
+                flatten_tiles(child_tile)
+
+        for tile in tiles:
+            flatten_tiles(tile)
+
+        resourceids = {str(tile.resourceinstance_id) for tile in all_tiles}
+
+        with transaction.atomic():
+            if user is not None and user_is_reviewer is False:
+                for tile in tiles:
+                    tile.save(request=request, user=user, index=False, context=context, transaction_id=transaction_id)
+            else:
+                Tile._bulk_save_authoritative(all_tiles, request, user, context, transaction_id)
+
+        if index:
+            for resource in Resource.objects.filter(pk__in=resourceids):
+                resource.index()
+
+        return all_tiles
+
+    @staticmethod
+    def _bulk_save_authoritative(tiles, request, user, context, transaction_id):
+        datatype_factory = DataTypeFactory()
+        node_datatypes = graph_metadata.get_node_datatypes()
+        resource_graphs = {
+            str(resourceid): graphid
+            for resourceid, graphid in models.ResourceInstance.objects.filter(
+                pk__in={tile.resourceinstance_id for tile in tiles}
+            ).values_list("resourceinstanceid", "graph_id")
+        }
+        nodegroupids = {tile.nodegroup_id for tile in tiles}
+        nodeids = {nodeid for tile in tiles for nodeid in tile.data.keys()}
+        nodes = {
+            str(node.nodeid): node
+            for node in models.Node.objects.filter(Q(nodegroup_id__in=nodegroupids) | Q(nodeid__in=nodeids)).prefetch_related(
+                "cardxnodexwidget_set"
+            )
+        }
+        existing_models = {str(tile.tileid): tile for tile in models.TileModel.objects.filter(pk__in=[tile.tileid for tile in tiles])}
+
+        new_tiles = []
+        updated_tiles = []
+        for tile in tiles:
+            graph_id = resource_graphs.get(str(tile.resourceinstance_id))
+            for nodeid in tile.data.keys():
+                datatype = datatype_factory.get_instance(node_datatypes[str(nodeid)])
+                datatype.pre_tile_save(tile, nodeid)
+            tile.__preSave(request, context=context, graph_id=graph_id)
+            tile.check_for_missing_nodes(nodes=nodes)
+            tile.check_for_constraint_violation()
+
+            if str(tile.tileid) in existing_models:
+                updated_tiles.append(tile)
+            else:
+                if len(tile.data) > 0:  # see populate_missing_nodes
+                    data = {
+                        nodeid: None
+                        for nodeid, node in nodes.items()
+                        if str(node.nodegroup_id) == str(tile.nodegroup_id) and node.datatype != "semantic"
+                    }
+                    data.update(tile.data)
+                    tile.data = data
+                new_tiles.append(tile)
+
+            if user is not None:
+                tile.validate([], request=request, nodes=nodes)
+
+        Tile._set_missing_sortorders(new_tiles + updated_tiles)
+        Tile.objects.bulk_create(new_tiles)
+        Tile.objects.bulk_update(updated_tiles, ["resourceinstance", "parenttile", "data", "nodegroup", "sortorder", "provisionaledits"])
+
+        if len(tiles) > 0:
+            tiles[0].ensure_userprofile_exists(request)
+        for tile in tiles:
+            tile.datatype_post_save_actions(request)
+            tile.__postSave(request, context=context, graph_id=resource_graphs.get(str(tile.resourceinstance_id)))
+
+        # the edit log records the resource's display name after the tiles are saved
+        resources = list(Resource.objects.filter(pk__in=resource_graphs.keys()))
+        Resource.get_descriptors__bulk(resources)
+        resource_names = {str(resource.pk): resource.name for resource in resources}
+        user = {} if user is None else user
+        timestamp = datetime.datetime.now()
+        edits = []
+        for tile in tiles:
+            existing_model = existing_models.get(str(tile.tileid))
+            edit = EditLog()
+            edit.resourceclassid = resource_graphs.get(str(tile.resourceinstance_id))
+            edit.resourceinstanceid = tile.resourceinstance_id
+            edit.nodegroupid = tile.nodegroup_id
+            edit.tileinstanceid = tile.tileid
+            edit.userid = getattr(user, "id", "")
+            edit.user_email = getattr(user, "email", "")
+            edit.user_firstname = getattr(user, "first_name", "")
+            edit.user_lastname = getattr(user, "last_name", "")
+            edit.user_username = getattr(user, "username", "")
+            edit.resourcedisplayname = resource_names.get(str(tile.resourceinstance_id))
+            edit.oldvalue = {} if existing_model is None else existing_model.data
+            edit.newvalue = tile.data
+            edit.timestamp = timestamp
+            edit.edittype = "tile create" if existing_model is None else "tile edit"
+            if transaction_id is not None:
+                edit.transactionid = transaction_id
+            edits.append(edit)
+        EditLog.objects.bulk_create(edits)
+
+    @staticmethod
+    def _set_missing_sortorders(tiles):
+        """
+        Gives tiles without a sortorder the next sortorder of their nodegroup in their resource (see TileModel.save)
+
+        """
+
+        tiles = [tile for tile in tiles if tile.sortorder is None]
+        if len(tiles) == 0:
+            return
+
+        sortorder_max = {
+            (str(nodegroupid), str(resourceid)): sortorder
+            for nodegroupid, resourceid, sortorder in models.TileModel.objects.filter(
+                nodegroup_id__in={tile.nodegroup_id for tile in tiles}, resourceinstance_id__in={tile.resourceinstance_id for tile in tiles}
+            )
+            .values_list("nodegroup_id", "resourceinstance_id")
+            .annotate(Max("sortorder"))
+        }
+        for tile in tiles:
+            key = (str(tile.nodegroup_id), str(tile.resourceinstance_id))
+            tile.sortorder = sortorder_max[key] + 1 if sortorder_max.get(key) is not None else 0
+            sortorder_max[key] = tile.sortorder
+
     def populate_missing_nodes(self):
         first_node = next(iter(self.data.items()), None)
         if first_node is not None:
@@ -630,15 +807,16 @@ class Tile(models.TileModel):
         tile.after_update_all()
         return tile
 
-    def __preSave(self, request=None, context=None):
+    def __preSave(self, request=None, context=None, graph_id=None):
         """
         Keyword Arguments:
         request -- request object passed from the view to the model.
         context -- string e.g. "copy" indicating conditions under which a resource is saved and how functions should behave.
+        graph_id -- the graph id of the tile's resource if already known
         """
 
         try:
-            for function in self._getFunctionClassInstances():
+            for function in self._getFunctionClassInstances(graph_id):
                 try:
                     function.save(self, request, context=context)
                 except NotImplementedError:
@@ -658,15 +836,16 @@ class Tile(models.TileModel):
             logger.warning(_("No associated functions or other TypeError raised by a function"))
             logger.warning(e)
 
-    def __postSave(self, request=None, context=None):
+    def __postSave(self, request=None, context=None, graph_id=None):
         """
         Keyword Arguments:
         request -- request object passed from the view to the model.
         context -- string e.g. "copy" indicating conditions under which a resource is saved and how functions should behave.
+        graph_id -- the graph id of the tile's resource if already known
         """
 
         try:
-            for function in self._getFunctionClassInstances():
+            for function in self._getFunctionClassInstances(graph_id):
                 try:
                     function.post_save(self, request, context=context)
                 except NotImplementedError:
@@ -675,17 +854,17 @@ class Tile(models.TileModel):
             logger.warning(_("No associated functions or other TypeError raised by a function"))
             logger.warning(e)
 
-    def _getFunctionClassInstances(self):
+    def _getFunctionClassInstances(self, graph_id=None):
         ret = []
-        resource = models.ResourceInstance.objects.get(pk=self.resourceinstance_id)
-        functionXgraphs = models.FunctionXGraph.objects.filter(
-            Q(graph_id=resource.graph_id),
-            Q(config__contains={"triggering_nodegroups": [str(self.nodegroup_id)]}) | Q(config__triggering_nodegroups__exact=[]),
-            ~Q(function__functiontype="primarydescriptors"),
-        )
-        for functionXgraph in functionXgraphs:
-            func = functionXgraph.function.get_class_module()(functionXgraph.config, self.nodegroup_id)
-            ret.append(func)
+        if graph_id is None:
+            graph_id = models.ResourceInstance.objects.get(pk=self.resourceinstance_id).graph_id
+        for functionXgraph in graph_metadata.get_functions_x_graph(graph_id):
+            if functionXgraph.function.functiontype == "primarydescriptors" or functionXgraph.config is None:
+                continue
+            triggering_nodegroups = functionXgraph.config.get("triggering_nodegroups")
+            if triggering_nodegroups == [] or (isinstance(triggering_nodegroups, list) and str(self.nodegroup_id) in triggering_nodegroups):
+                func = functionXgraph.function.get_class_module()(copy.deepcopy(functionXgraph.config), self.nodegroup_id)
+                ret.append(func)
         return ret
 
     def filter_by_perm(self, user, perm):
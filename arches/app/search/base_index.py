@@ -69,6 +69,28 @@ class BaseIndex(object):
         if document is not None and id is not None:
             self.se.index_data(index=self.index_name, body=document, id=id)
 
+    def add_document(self, unit_of_work, document=None, id=None):
+        """
+        Adds a document to an IndexUnitOfWork to be indexed along with the other
+        documents of the unit of work (see SearchEngine.IndexUnitOfWork)
+
+        Indexes that override index_document are indexed with it instead
+
+        Arguments:
+        unit_of_work -- the IndexUnitOfWork to add the document to
+
+        Keyword Arguments:
+        document -- the document to index
+        id -- the id of the document
+
+        Return: None
+        """
+
+        if type(self).index_document is not BaseIndex.index_document:
+            self.index_document(document=document, id=id)
+        elif document is not None and id is not None:
+            unit_of_work.add(index=self.index_name, id=id, data=document)
+
     def index_resources(self, resources=None, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False):
         """
         Indexes a list of resources in bulk to Elastic Search
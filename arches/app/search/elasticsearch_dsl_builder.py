@@ -549,12 +549,18 @@ class FiltersAgg(Aggregation):
 
     def __init__(self, **kwargs):
         self.name = kwargs.pop("name", None)
+        self.keyed = kwargs.pop("keyed", False)
 
-        self.agg = {self.name: {"filters": {"filters": []}}}
+        self.agg = {self.name: {"filters": {"filters": {} if self.keyed else []}}}
 
-    def add_filter(self, filter=None):
+    def add_filter(self, filter=None, key=None):
         if filter is not None:
-            self.agg[self.name]["filters"]["filters"].append(filter.dsl)
+            if self.keyed:
+                if key is None:
+                    raise AggregationDSLException(_("You need to specify a key for each filter of a keyed filters aggregation"))
+                self.agg[self.name]["filters"]["filters"][key] = filter.dsl
+            else:
+                self.agg[self.name]["filters"]["filters"].append(filter.dsl)
 
 
 class NestedAgg(Aggregation):
@@ -21,14 +21,21 @@ import urllib.parse
 import urllib.error
 import uuid
 import logging
+import functools
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from elasticsearch import Elasticsearch, helpers, ElasticsearchWarning
-from elasticsearch.exceptions import RequestError
+from elasticsearch.exceptions import ConnectionTimeout, NotFoundError, RequestError, TransportError
 from elasticsearch.helpers import BulkIndexError
 from arches.app.models.system_settings import settings
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 
+# the default http.max_content_length of Elasticsearch
+BULK_MAX_CHUNK_BYTES = 100 * 1024 * 1024
+
 
 class SearchEngine(object):
     def __init__(self, **kwargs):
@@ -194,11 +201,174 @@ class SearchEngine(object):
                 )
                 raise detail
 
-    def bulk_index(self, data, **kwargs):
+    def bulk_index(
+        self,
+        data,
+        chunk_size=500,
+        max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+        max_retries=5,
+        initial_backoff=2,
+        max_backoff=60,
+        raise_on_error=False,
+        stats=None,
+        **kwargs,
+    ):
+        """
+        Sends a list (or any iterable) of bulk items (see create_bulk_item) to Elasticsearch in chunks of
+        at most chunk_size items and max_chunk_bytes bytes
+
+        Items rejected with a 429 and chunks that time out are retried up to max_retries times,
+        waiting initial_backoff seconds before the first retry and twice as long before each
+        following one (up to max_backoff seconds)
+
+        Returns a BulkIndexStats with the number of documents, bytes and retries sent and a list of the failed items.
+        Failures are logged and, if raise_on_error is True, raised at the end as a BulkIndexError
+
+        Any other keyword arguments (eg: refresh) are passed on to each bulk request
+
+        """
+
+        if stats is None:
+            stats = BulkIndexStats()
+        for chunk in self._get_bulk_chunks(data, chunk_size, max_chunk_bytes):
+            self._send_bulk_chunk(chunk, stats, max_retries, initial_backoff, max_backoff, **kwargs)
+        if raise_on_error and len(stats.failures) > 0:
+            raise BulkIndexError("%i document(s) failed to index." % len(stats.failures), stats.failures)
+        return stats
+
+    def parallel_bulk_index(
+        self,
+        data,
+        thread_count=4,
+        queue_size=4,
+        chunk_size=500,
+        max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+        max_retries=5,
+        initial_backoff=2,
+        max_backoff=60,
+        raise_on_error=False,
+        stats=None,
+        **kwargs,
+    ):
+        """
+        Same as bulk_index but sends the chunks concurrently from a pool of thread_count threads
+
+        At most queue_size chunks wait for a free thread, so a slow cluster slows down
+        the reading of data rather than letting the chunks pile up in memory
+
+        """
+
+        if stats is None:
+            stats = BulkIndexStats()
+        pending_chunks = threading.BoundedSemaphore(thread_count + queue_size)
+
+        def chunk_sent(chunk, future):
+            pending_chunks.release()
+            detail = future.exception()
+            if detail is not None:
+                self.logger.warning("%s: WARNING: failed to bulk index documents, \nException detail: %s\n" % (datetime.now(), detail))
+                stats.add_failures(
+                    [{"_index": item.get("_index"), "_id": item.get("_id"), "status": None, "error": str(detail)} for item, lines in chunk]
+                )
+
+        with ThreadPoolExecutor(max_workers=thread_count) as executor:
+            for chunk in self._get_bulk_chunks(data, chunk_size, max_chunk_bytes):
+                pending_chunks.acquire()
+                future = executor.submit(self._send_bulk_chunk, chunk, stats, max_retries, initial_backoff, max_backoff, **kwargs)
+                future.add_done_callback(functools.partial(chunk_sent, chunk))
+        if raise_on_error and len(stats.failures) > 0:
+            raise BulkIndexError("%i document(s) failed to index." % len(stats.failures), stats.failures)
+        return stats
+
+    def _get_bulk_chunks(self, data, chunk_size, max_chunk_bytes):
+        """
+        Yields lists of (bulk item, serialized request lines) limited to chunk_size items and max_chunk_bytes bytes
+
+        """
+
+        serializer = self.es.transport.serializer
+        chunk = []
+        chunk_bytes = 0
+        for item in data:
+            action, source = helpers.expand_action(item)
+            lines = serializer.dumps(action) + "\n"
+            if source is not None:
+                lines += serializer.dumps(source) + "\n"
+            item_bytes = len(lines.encode("utf-8"))
+            if len(chunk) > 0 and (len(chunk) >= chunk_size or chunk_bytes + item_bytes > max_chunk_bytes):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+            chunk.append((item, lines))
+            chunk_bytes += item_bytes
+        if len(chunk) > 0:
+            yield chunk
+
+    def _send_bulk_chunk(self, chunk, stats, max_retries, initial_backoff, max_backoff, **kwargs):
+        """
+        Sends a chunk of bulk items in one request, retrying the items rejected with a 429
+        (or the whole chunk if the request times out or is rejected) with exponential backoff
+
+        """
+
+        attempt = 0
+        while len(chunk) > 0:
+            if attempt > 0:
+                stats.add_retries(len(chunk))
+                time.sleep(min(max_backoff, initial_backoff * 2 ** (attempt - 1)))
+            body = "".join(lines for item, lines in chunk)
+            try:
+                response = self.es.bulk(body=body, **kwargs)
+            except (ConnectionTimeout, TransportError) as detail:
+                retryable = isinstance(detail, ConnectionTimeout) or detail.status_code == 429
+                if retryable and attempt < max_retries:
+                    attempt += 1
+                    continue
+                self.logger.warning("%s: WARNING: failed to bulk index documents, \nException detail: %s\n" % (datetime.now(), detail))
+                stats.add_failures(
+                    [
+                        {"_index": item.get("_index"), "_id": item.get("_id"), "status": detail.status_code, "error": str(detail)}
+                        for item, lines in chunk
+                    ]
+                )
+                return
+
+            stats.add_sent(len(body.encode("utf-8")))
+            rejected = []
+            failures = []
+            sent = 0
+            for (item, lines), result in zip(chunk, response["items"]):
+                op_type, info = result.popitem()
+                status = info.get("status", 500)
+                if status < 300 or (op_type == "delete" and status == 404):
+                    sent += 1
+                elif status == 429 and attempt < max_retries:
+                    rejected.append((item, lines))
+                else:
+                    failures.append({"_index": info.get("_index"), "_id": info.get("_id"), "status": status, "error": info.get("error")})
+            stats.add_documents(sent)
+            if len(failures) > 0:
+                for failure in failures:
+                    self.logger.warning("%s: WARNING: failed to index document: %s\n" % (datetime.now(), failure))
+                stats.add_failures(failures)
+            chunk = rejected
+            attempt += 1
+
+    def get_ids(self, **kwargs):
+        """
+        Returns the ids of all the documents matching the query dsl passed in as body
+
+        """
+
+        kwargs = self._add_prefix(**kwargs)
+        body = dict(kwargs.pop("body", {}), _source=False)
         try:
-            helpers.bulk(self.es, data, **kwargs)
-        except Exception as detail:
-            self.logger.warning("%s: WARNING: failed to bulk index documents, \nException detail: %s\n" % (datetime.now(), detail))
+            return [hit["_id"] for hit in helpers.scan(self.es, query=body, **kwargs)]
+        except NotFoundError:
+            return []
+
+    def IndexUnitOfWork(self, **kwargs):
+        return IndexUnitOfWork(self, **kwargs)
 
     def create_bulk_item(self, op_type="index", index=None, id=None, data=None):
         return {"_op_type": op_type, "_index": self._add_prefix(index), "_type": "_doc", "_id": id, "_source": data}
@@ -224,6 +394,14 @@ class SearchEngine(object):
         kwargs = self._add_prefix(**kwargs)
         self.es.indices.refresh(**kwargs)
 
+    def get_settings(self, **kwargs):
+        kwargs = self._add_prefix(**kwargs)
+        return self.es.indices.get_settings(**kwargs)
+
+    def put_settings(self, **kwargs):
+        kwargs = self._add_prefix(**kwargs)
+        return self.es.indices.put_settings(**kwargs)
+
     def BulkIndexer(outer_self, batch_size=500, **kwargs):
         class _BulkIndexer(object):
             def __init__(self, **kwargs):
@@ -232,7 +410,7 @@ class SearchEngine(object):
                 kwargs.pop("maxsize", "")
                 kwargs.pop("timeout", "")
                 kwargs.pop("retry_on_timeout", "")
-                kwargs.pop("max_retries", "")
+                self.stats = kwargs.pop("stats", None) or BulkIndexStats()
                 self.kwargs = kwargs
 
             def add(self, op_type="index", index=None, id=None, data=None):
@@ -240,11 +418,11 @@ class SearchEngine(object):
                 self.queue.append(doc)
 
                 if len(self.queue) >= self.batch_size:
-                    outer_self.bulk_index(self.queue, **self.kwargs)
+                    outer_self.bulk_index(self.queue, stats=self.stats, **self.kwargs)
                     del self.queue[:]  # clear out the array
 
             def close(self):
-                outer_self.bulk_index(self.queue, **self.kwargs)
+                outer_self.bulk_index(self.queue, stats=self.stats, **self.kwargs)
 
             def __enter__(self, **kwargs):
                 return self
@@ -253,3 +431,94 @@ class SearchEngine(object):
                 return self.close()
 
         return _BulkIndexer(batch_size=batch_size, **kwargs)
+
+
+class IndexUnitOfWork(object):
+    """
+    Collects index and delete operations against any number of indexes and sends them
+    to Elasticsearch together in a single _bulk request
+
+    To use:
+
+        with se.IndexUnitOfWork() as unit_of_work:
+            unit_of_work.add(index=RESOURCES_INDEX, id=resourceid, data=document)
+            unit_of_work.delete(index=TERMS_INDEX, id=termid)
+
+    The operations are sent when the with block exits (or on flush). A BulkIndexError listing every
+    failed operation is raised if any of them fail (see SearchEngine.bulk_index)
+
+    """
+
+    def __init__(self, se, refresh=False):
+        self.se = se
+        self.refresh = refresh
+        self.actions = []
+
+    def add(self, op_type="index", index=None, id=None, data=None):
+        self.actions.append(self.se.create_bulk_item(op_type=op_type, index=index, id=id, data=data))
+
+    def delete(self, index=None, id=None):
+        self.actions.append({"_op_type": "delete", "_index": self.se._add_prefix(index), "_type": "_doc", "_id": id})
+
+    def flush(self):
+        if len(self.actions) == 0:
+            return
+        actions = self.actions
+        self.actions = []
+
+        # send every operation in one request rather than in chunks
+        stats = self.se.bulk_index(actions, chunk_size=len(actions), max_chunk_bytes=2**31, refresh=self.refresh)
+        if len(stats.failures) > 0:
+            raise BulkIndexError("%i of %i document(s) failed to index." % (len(stats.failures), len(actions)), stats.failures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.flush()
+
+
+class BulkIndexStats(object):
+    """
+    Thread safe counters of the documents indexed by SearchEngine.bulk_index and parallel_bulk_index
+
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.documents = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def add_documents(self, count):
+        with self._lock:
+            self.documents += count
+
+    def add_sent(self, byte_count):
+        with self._lock:
+            self.bytes += byte_count
+
+    def add_retries(self, count):
+        with self._lock:
+            self.retries += count
+
+    def add_failures(self, failures):
+        with self._lock:
+            self.failures.extend(failures)
+
+    @property
+    def docs_per_second(self):
+        elapsed = time.time() - self.started
+        return self.documents / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "%i documents indexed (%.1f docs/sec, %.1f MB sent), %i retries, %i failures" % (
+            self.documents,
+            self.docs_per_second,
+            self.bytes / (1024 * 1024),
+            self.retries,
+            len(self.failures),
+        )
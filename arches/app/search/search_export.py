@@ -21,8 +21,8 @@ import csv
 import datetime
 import logging
 from io import StringIO
-from io import BytesIO
 import re
+import tempfile
 from django.contrib.gis.geos import GeometryCollection, GEOSGeometry
 from django.core.files import File
 from django.utils.translation import ugettext as _
@@ -30,6 +30,8 @@ from django.urls import reverse
 from arches.app.models import models
 from arches.app.models.system_settings import settings
 from arches.app.datatypes.datatypes import DataTypeFactory
+from arches.app.search.elasticsearch_dsl_builder import Query
+from arches.app.search.mappings import RESOURCES_INDEX
 from arches.app.utils.flatten_dict import flatten_dict
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from arches.app.utils.data_management.resources.exporter import ResourceExporter
@@ -138,62 +140,112 @@ class SearchResultsExporter(object):
 
         return headers
 
+    def get_search_hits(self, dsl):
+        """
+        Yields the hits of the export search one page at a time using the Elasticsearch scroll api
+        so that the full result set (and each hit's tiles) is never held in memory at once
+
+        Arguments:
+        dsl -- the Query built from the search request (see SearchView.search_results)
+
+        """
+
+        permitted_nodegroups = SearchView.get_permitted_nodegroups(self.search_request.user)
+        dsl.include("graph_id")
+        dsl.include("resourceinstanceid")
+        dsl.include("tiles")
+        results = dsl.search(index=RESOURCES_INDEX, limit=settings.SEARCH_EXPORT_PAGE_SIZE, scroll="1m")
+        scroll_id = None
+        count = 0
+        try:
+            while results is not None and len(results["hits"]["hits"]) > 0:
+                scroll_id = results["_scroll_id"]
+                for hit in results["hits"]["hits"]:
+                    if count >= settings.SEARCH_EXPORT_LIMIT:
+                        return
+                    # only export tiles the user is allowed to read
+                    hit["_source"]["tiles"] = [
+                        tile for tile in hit["_source"].get("tiles", []) if tile["nodegroup_id"] in permitted_nodegroups
+                    ]
+                    count += 1
+                    yield hit
+                results = dsl.se.es.scroll(scroll_id=scroll_id, scroll="1m")
+        finally:
+            if scroll_id is not None:
+                dsl.se.es.clear_scroll(scroll_id=scroll_id, ignore=(404,))
+
+    def get_report_link(self, resourceid):
+        report_url = reverse("resource_report", kwargs={"resourceid": resourceid})
+        export_namespace = settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT.rstrip("/")
+        return f"{export_namespace}{report_url}"
+
+    def get_csv_headers(self, graph, report_link):
+        if settings.EXPORT_DATA_FIELDS_IN_CARD_ORDER is True:
+            headers = self.return_ordered_header(graph.pk, "csv")
+        else:
+            headers = list(graph.node_set.filter(exportable=True).values_list("name", flat=True))
+
+        headers.append("resourceid")
+        if (report_link == "true") and ("Link" not in headers):
+            headers.append("Link")
+        return headers
+
     def export(self, format, report_link):
         ret = []
-        search_res_json = SearchView.search_results(self.search_request)
-        if search_res_json.status_code == 500:
-            return ret
-        results = JSONDeserializer().deserialize(search_res_json.content)
-        instances = results["results"]["hits"]["hits"]
+        dsl = SearchView.search_results(self.search_request, returnDsl=True)
+        if not isinstance(dsl, Query):
+            return ret, None
+
         output = {}
+        csv_files = {}
+        graphs = {}
+        number_of_instances = 0
+        use_fieldname = self.format in ("shp",)
+
+        for resource_instance in self.get_search_hits(dsl):
+            number_of_instances += 1
+            graph_id = resource_instance["_source"]["graph_id"]
+            if graph_id not in graphs:
+                graphs[graph_id] = models.GraphModel.objects.get(pk=graph_id)
+
+            if format in ("tilexl", "html"):
+                # these exporters load the resources themselves so only the resource ids need to be kept
+                if len(resource_instance["_source"]["tiles"]) > 0:
+                    resourceid = resource_instance["_source"]["resourceinstanceid"]
+                    output.setdefault(graph_id, {"output": []})["output"].append({"resourceid": resourceid})
+                continue
 
-        for resource_instance in instances:
-            use_fieldname = self.format in ("shp",)
             resource_obj = self.flatten_tiles(
                 resource_instance["_source"]["tiles"], self.datatype_factory, compact=self.compact, use_fieldname=use_fieldname
             )
             has_geom = resource_obj.pop("has_geometry")
             skip_resource = self.format in ("shp",) and has_geom is False
-            if skip_resource is False:
-                try:
-                    output[resource_instance["_source"]["graph_id"]]["output"].append(resource_obj)
-                except KeyError as e:
-                    output[resource_instance["_source"]["graph_id"]] = {"output": []}
-                    output[resource_instance["_source"]["graph_id"]]["output"].append(resource_obj)
+            if skip_resource is True:
+                continue
 
-        for graph_id, resources in output.items():
-            graph = models.GraphModel.objects.get(pk=graph_id)
+            if (report_link == "true") and "resourceid" in resource_obj:
+                resource_obj["Link"] = self.get_report_link(resource_obj["resourceid"])
 
-            if (report_link == "true") and (format != "tilexl"):
-                for resource in resources["output"]:
-                    report_url = reverse("resource_report", kwargs={"resourceid": resource["resourceid"]})
-                    export_namespace = settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT.rstrip("/")
-                    resource["Link"] = f"{export_namespace}{report_url}"
+            if format == "tilecsv":
+                # rows are written as they are read so the export never holds more than a page of results
+                if graph_id not in csv_files:
+                    csv_files[graph_id] = self.create_csv_file(self.get_csv_headers(graphs[graph_id], report_link))
+                self.write_csv_row(csv_files[graph_id]["writer"], resource_obj)
+            else:
+                output.setdefault(graph_id, {"output": []})["output"].append(resource_obj)
 
-            if format == "geojson":
+        for graph_id, csv_file in csv_files.items():
+            ret.append({"name": f"{graphs[graph_id].name}.csv", "outputfile": csv_file["outputfile"]})
 
-                if settings.EXPORT_DATA_FIELDS_IN_CARD_ORDER is True:
-                    headers = self.return_ordered_header(graph_id, "csv")
-                else:
-                    headers = list(graph.node_set.filter(exportable=True).values_list("name", flat=True))
+        for graph_id, resources in output.items():
+            graph = graphs[graph_id]
 
-                if (report_link == "true") and ("Link" not in headers):
-                    headers.append("Link")
+            if format == "geojson":
+                headers = self.get_csv_headers(graph, report_link)
+                headers.remove("resourceid")
                 ret = self.to_geojson(resources["output"], headers=headers, name=graph.name)
                 return ret, ""
 
-            if format == "tilecsv":
-
-                if settings.EXPORT_DATA_FIELDS_IN_CARD_ORDER is True:
-                    headers = self.return_ordered_header(graph_id, "csv")
-                else:
-                    headers = list(graph.node_set.filter(exportable=True).values_list("name", flat=True))
-
-                headers.append("resourceid")
-                if (report_link == "true") and ("Link" not in headers):
-                    headers.append("Link")
-                ret.append(self.to_csv(resources["output"], headers=headers, name=graph.name))
-
             if format == "shp":
 
                 if settings.EXPORT_DATA_FIELDS_IN_CARD_ORDER is True:
@@ -220,9 +272,6 @@ class SearchResultsExporter(object):
                 ret += self.to_shp(resources["output"], headers=headers, name=graph.name)
 
             if format == "tilexl":
-                headers = graph.node_set.filter(exportable=True).values("fieldname", "datatype", "name")[::1]
-                headers = graph.node_set.filter(exportable=True).values("fieldname", "datatype")[::1]
-                headers.append({"fieldname": "resourceid", "datatype": "str"})
                 ret += self.to_tilexl(resources["output"])
 
             if format == "html":
@@ -231,7 +280,7 @@ class SearchResultsExporter(object):
         full_path = self.search_request.get_full_path()
         search_request_path = self.search_request.path if full_path is None else full_path
         search_export_info = models.SearchExportHistory(
-            user=self.search_request.user, numberofinstances=len(instances), url=search_request_path
+            user=self.search_request.user, numberofinstances=number_of_instances, url=search_request_path
         )
         search_export_info.save()
 
@@ -241,13 +290,13 @@ class SearchResultsExporter(object):
         """
         Writes a list of file like objects out to a zip file
         """
-        zip_stream = zip_utils.create_zip_file(files_for_export, "outputfile")
         today = datetime.datetime.now().isoformat()
         name = f"{export_name}.zip" if (export_name is not None and export_name != "Arches Export") else f"{settings.APP_NAME}_{today}.zip"
         search_history_obj = models.SearchExportHistory.objects.get(pk=export_info.searchexportid)
-        f = BytesIO(zip_stream)
-        download = File(f)
-        search_history_obj.downloadfile.save(name, download)
+        with tempfile.TemporaryFile() as f:
+            zip_utils.write_zip_file(files_for_export, f, "outputfile")
+            f.seek(0)
+            search_history_obj.downloadfile.save(name, File(f))
         return search_history_obj.searchexportid
 
     def get_node(self, nodeid):
@@ -337,12 +386,21 @@ class SearchResultsExporter(object):
         resource_json = self.create_resource_json(tiles)
         return flatten_dict(resource_json)
 
+    def create_csv_file(self, headers):
+        dest = tempfile.SpooledTemporaryFile(max_size=settings.SEARCH_EXPORT_SPOOL_SIZE, mode="w+", newline="")
+        csvwriter = csv.DictWriter(dest, delimiter=",", fieldnames=headers)
+        csvwriter.writeheader()
+        return {"writer": csvwriter, "outputfile": dest}
+
+    def write_csv_row(self, csvwriter, instance):
+        csvwriter.writerow({k: sanitize_csv_value(str(v)) for k, v in list(instance.items())})
+
     def to_csv(self, instances, headers, name):
         dest = StringIO()
         csvwriter = csv.DictWriter(dest, delimiter=",", fieldnames=headers)
         csvwriter.writeheader()
         for instance in instances:
-            csvwriter.writerow({k: sanitize_csv_value(str(v)) for k, v in list(instance.items())})
+            self.write_csv_row(csvwriter, instance)
         return {"name": f"{name}.csv", "outputfile": dest}
 
     def to_shp(self, instances, headers, name):
@@ -1,4 +1,6 @@
+import hashlib
 import math
+import uuid
 from arches.app.utils.date_utils import ExtendedDateFormat
 from arches.app.utils.permission_backend import get_nodegroups_by_perm
 from arches.app.search.elasticsearch_dsl_builder import (
@@ -22,11 +24,71 @@ from arches.app.search.elasticsearch_dsl_builder import (
 from arches.app.search.search_engine_factory import SearchEngineFactory
 from arches.app.search.mappings import RESOURCES_INDEX
 from arches.app.models.system_settings import settings
-from django.core.cache import cache
+from django.core.cache import caches
 
 
 class TimeWheel(object):
+    """
+    Builds the hierarchy of date periods (and the number of resources in each) shown by the search time wheel
+
+    The hierarchy depends only on the nodegroups a user is permitted to read, so it's cached
+    per set of permitted nodegroups and stamped with a version token that's replaced
+    (see TimeWheel.invalidate) whenever resources are indexed or removed from the index.
+    Both are kept in the cache named by settings.TIMEWHEEL_CACHE so that indexing in one
+    process (eg: a celery worker) discards the time wheels cached by every other process
+
+    """
+
+    VERSION_KEY = "time_wheel_version"
+
     def time_wheel_config(self, user):
+        permitted_nodegroups = self.get_permitted_nodegroups(user)
+        key = self.get_cache_key(permitted_nodegroups)
+        if key is None:
+            # the configured cache can't share a version (eg: a dummy cache) so nothing is cached
+            return self.get_time_wheel_config(permitted_nodegroups)
+
+        shared_cache = self._get_shared_cache()
+        root = shared_cache.get(key)
+        if root is None:
+            root = self.get_time_wheel_config(permitted_nodegroups)
+            if root is not None:
+                shared_cache.set(key, root, settings.TIMEWHEEL_CACHE_TIMEOUT)
+        return root
+
+    @staticmethod
+    def _get_shared_cache():
+        return caches[settings.TIMEWHEEL_CACHE]
+
+    def get_cache_key(self, permitted_nodegroups):
+        shared_cache = self._get_shared_cache()
+        version = shared_cache.get(self.VERSION_KEY)
+        if version is None:
+            shared_cache.add(self.VERSION_KEY, str(uuid.uuid4()), None)
+            version = shared_cache.get(self.VERSION_KEY)
+        if version is None:
+            return None
+        nodegroups_hash = hashlib.md5(",".join(sorted(permitted_nodegroups)).encode("utf-8")).hexdigest()
+        return "time_wheel_config_{0}_{1}".format(version, nodegroups_hash)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Replaces the version token so that every cached time wheel is rebuilt on next use
+
+        """
+
+        cls._get_shared_cache().set(cls.VERSION_KEY, str(uuid.uuid4()), None)
+
+    def get_time_wheel_config(self, permitted_nodegroups):
+        """
+        Returns the root d3Item of the time wheel hierarchy counting only the dates
+        of the given nodegroups, or None if no resource has been indexed with a date
+
+        The resources in every period of every tier are counted by a single keyed filters aggregation
+
+        """
+
         se = SearchEngineFactory().create()
         query = Query(se, limit=0)
         nested_agg = NestedAgg(path="dates", name="min_max_agg")
@@ -45,18 +107,14 @@ class TimeWheel(object):
             # round min and max date to the nearest 1000 years
             min_date = math.ceil(math.fabs(min_date) / 1000) * -1000 if min_date < 0 else math.floor(min_date / 1000) * 1000
             max_date = math.floor(math.fabs(max_date) / 1000) * -1000 if max_date < 0 else math.ceil(max_date / 1000) * 1000
-            query = Query(se, limit=0)
-            range_lookup = {}
 
-            def gen_range_agg(gte=None, lte=None, permitted_nodegroups=None):
+            def gen_range_query(gte=None, lte=None):
                 date_query = Bool()
                 date_query.filter(Range(field="dates.date", gte=gte, lte=lte, relation="intersects"))
-                if permitted_nodegroups is not None:
-                    date_query.filter(Terms(field="dates.nodegroup_id", terms=permitted_nodegroups))
+                date_query.filter(Terms(field="dates.nodegroup_id", terms=permitted_nodegroups))
                 date_ranges_query = Bool()
                 date_ranges_query.filter(Range(field="date_ranges.date_range", gte=gte, lte=lte, relation="intersects"))
-                if permitted_nodegroups is not None:
-                    date_ranges_query.filter(Terms(field="date_ranges.nodegroup_id", terms=permitted_nodegroups))
+                date_ranges_query.filter(Terms(field="date_ranges.nodegroup_id", terms=permitted_nodegroups))
                 wrapper_query = Bool()
                 wrapper_query.should(Nested(path="date_ranges", query=date_ranges_query))
                 wrapper_query.should(Nested(path="dates", query=date_query))
@@ -80,7 +138,9 @@ class TimeWheel(object):
             if settings.TIMEWHEEL_DATE_TIERS is not None:
                 date_tiers = settings.TIMEWHEEL_DATE_TIERS
 
-            def add_date_tier(date_tier, low_date, high_date, previous_period_agg=None):
+            periods_agg = FiltersAgg(name="periods", keyed=True)
+
+            def add_date_tier(date_tier, low_date, high_date, parent):
                 interval = date_tier["interval"]
                 name = date_tier["name"]
                 if "root" in date_tier:
@@ -93,72 +153,40 @@ class TimeWheel(object):
                         within_range = min_period >= date_tier["range"]["min"] and max_period <= date_tier["range"]["max"]
                     if within_range is True:
                         period_name = "{0} ({1} - {2})".format(name, min_period, max_period)
-                        nodegroups = self.get_permitted_nodegroups(user) if "root" in date_tier else None
-                        period_boolquery = gen_range_agg(
-                            gte=ExtendedDateFormat(min_period).lower,
-                            lte=ExtendedDateFormat(max_period).lower,
-                            permitted_nodegroups=nodegroups,
+                        periods_agg.add_filter(
+                            gen_range_query(gte=ExtendedDateFormat(min_period).lower, lte=ExtendedDateFormat(max_period).lower),
+                            key=period_name,
                         )
-                        period_agg = FiltersAgg(name=period_name)
-                        period_agg.add_filter(period_boolquery)
-                        if "root" not in date_tier:
-                            previous_period_agg.add_aggregation(period_agg)
-                        range_lookup[period_name] = [min_period, max_period]
+                        item = d3Item(name=period_name, start=min_period, end=max_period)
+                        parent.children.append(item)
                         if "child" in date_tier:
-                            add_date_tier(date_tier["child"], min_period, max_period, period_agg)
-                        if "root" in date_tier:
-                            query.add_aggregation(period_agg)
-
-            add_date_tier(date_tiers, min_date, max_date)
+                            add_date_tier(date_tier["child"], min_period, max_period, item)
 
             root = d3Item(name="root")
-            results = {"buckets": [query.search(index=RESOURCES_INDEX)["aggregations"]]}
-            results_with_ranges = self.appendDateRanges(results, range_lookup)
-            self.transformESAggToD3Hierarchy(results_with_ranges, root)
+            add_date_tier(date_tiers, min_date, max_date, root)
+
+            query = Query(se, limit=0)
+            query.add_aggregation(periods_agg)
+            buckets = query.search(index=RESOURCES_INDEX)["aggregations"]["periods"]["buckets"]
+            self.set_period_sizes(root, buckets)
 
             # calculate total number of docs
             for child in root.children:
                 root.size = root.size + child.size
 
-            if user.username in settings.CACHE_BY_USER:
-                key = "time_wheel_config_{0}".format(user.username)
-                cache.set(key, root, settings.CACHE_BY_USER[user.username])
-
             return root
 
-    def transformESAggToD3Hierarchy(self, results, d3ItemInstance):
-        if "buckets" not in results:
-            return d3ItemInstance
-
-        for key, value in results["buckets"][0].items():
-            if key == "from":
-                d3ItemInstance.start = int(value)
-            elif key == "to":
-                d3ItemInstance.end = int(value)
-            elif key == "doc_count":
-                d3ItemInstance.size = value
-            elif key == "key":
-                pass
-            else:
-                item = self.transformESAggToD3Hierarchy(value, d3Item(name=key))
-                # only append items if they have a document count > 0
-                if item.size > 0:
-                    d3ItemInstance.children.append(item)
-
-        d3ItemInstance.children = sorted(d3ItemInstance.children, key=lambda item: item.start)
-
-        return d3ItemInstance
-
-    def appendDateRanges(self, results, range_lookup):
-        if "buckets" in results:
-            bucket = results["buckets"][0]
-            for key, value in bucket.items():
-                if key in range_lookup:
-                    bucket[key]["buckets"][0]["from"] = range_lookup[key][0]
-                    bucket[key]["buckets"][0]["to"] = range_lookup[key][1]
-                    self.appendDateRanges(value, range_lookup)
-
-        return results
+    def set_period_sizes(self, d3ItemInstance, buckets):
+        """
+        Sets the number of resources in each period below the given item from the
+        buckets of the periods aggregation, dropping the periods without any resources
+
+        """
+
+        for item in d3ItemInstance.children:
+            item.size = buckets[item.name]["doc_count"]
+            self.set_period_sizes(item, buckets)
+        d3ItemInstance.children = sorted([item for item in d3ItemInstance.children if item.size > 0], key=lambda item: item.start)
 
     def get_permitted_nodegroups(self, user):
         return [str(nodegroup.pk) for nodegroup in get_nodegroups_by_perm(user, "models.read_nodegroup")]
@@ -215,7 +215,7 @@ def load_branch_csv(userid, files, summary, result, temp_dir, loadid):
         BranchCsvImporter.run_load_task(files, summary, result, temp_dir, loadid)
 
         load_event = models.LoadEvent.objects.get(loadid=loadid)
-        status = _("Completed") if load_event.status == "indexed" else _("Failed")
+        status = _("Completed") if load_event.status in ("indexed", "indexing") else _("Failed")
         msg = _("Branch Excel Import: {} [{}]").format(summary["name"], status)
         user = User.objects.get(id=userid)
         notify_completion(msg, user)
@@ -237,7 +237,7 @@ def load_single_csv(userid, loadid, graphid, has_headers, fieldnames, csv_file_n
         ImportSingleCsv.run_load_task(loadid, graphid, has_headers, fieldnames, csv_file_name, id_label)
 
         load_event = models.LoadEvent.objects.get(loadid=loadid)
-        status = _("Completed") if load_event.status == "indexed" else _("Failed")
+        status = _("Completed") if load_event.status in ("indexed", "indexing") else _("Failed")
         msg = _("Single CSV Import: {} [{}]").format(csv_file_name, status)
         user = User.objects.get(id=userid)
         notify_completion(msg, user)
@@ -247,6 +247,39 @@ def load_single_csv(userid, loadid, graphid, has_headers, fieldnames, csv_file_n
         load_event.status = _("Failed")
         load_event.save()
 
+
+@shared_task
+def index_load_chunk(loadid, resourceids):
+    from arches.app.etl_modules import base_import_module
+    from arches.app.utils.index_database import index_resources_by_transaction
+
+    from arches.app.search.base_index import SearchIndexError
+
+    module = base_import_module.BaseImportModule()
+    stats = index_resources_by_transaction(loadid, quiet=True, use_multiprocessing=False, resourceids=resourceids)
+    if len(stats.failures) > 0:
+        # fails the chord so that index_load_error marks the load as failed
+        raise SearchIndexError(_("Failed to index {0} documents of load {1}").format(len(stats.failures), loadid))
+    module.update_indexing_progress(loadid, len(resourceids))
+
+
+@shared_task
+def index_load_complete(loadid):
+    from arches.app.etl_modules import base_import_module
+
+    module = base_import_module.BaseImportModule()
+    module.complete_indexing(loadid)
+
+
+@shared_task
+def index_load_error(loadid):
+    logger = logging.getLogger(__name__)
+    logger.error(_("Failed to index the resources of load {}").format(loadid))
+    load_event = models.LoadEvent.objects.get(loadid=loadid)
+    load_event.status = "failed"
+    load_event.save()
+
+
 @shared_task
 def reverse_etl_load(loadid):
     from arches.app.etl_modules import base_import_module
@@ -17,8 +17,11 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 """
 
 import couchdb
+import logging
 from arches.app.models.system_settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 class Couch(object):
     def __init__(self):
@@ -43,6 +46,45 @@ class Couch(object):
             db[doc_id] = doc
         return db.get(doc_id)
 
+    def bulk_update_docs(self, db, docs, batch_size=500):
+        """
+        Creates or updates a list of documents (each with an "_id") using the _bulk_docs api.
+        As with update_doc each document is merged into any existing document with the same id,
+        documents that wouldn't change are skipped
+
+        Returns the list of documents that were written, with their new "_rev"
+
+        """
+
+        written = []
+        for i in range(0, len(docs), batch_size):
+            batch = docs[i : i + batch_size]
+            existing_docs = {}
+            for row in db.view("_all_docs", keys=[doc["_id"] for doc in batch], include_docs=True):
+                if row.doc is not None:  # missing and deleted documents are returned without a doc
+                    existing_docs[row.id] = row.doc
+
+            updates = []
+            for doc in batch:
+                existing_doc = existing_docs.get(doc["_id"])
+                if existing_doc is not None:
+                    updated_doc = dict(existing_doc)
+                    updated_doc.update(doc)
+                    if updated_doc == dict(existing_doc):
+                        continue
+                    doc = updated_doc
+                updates.append(doc)
+
+            if len(updates) > 0:
+                # db.update sets the new "_rev" on each document that was saved
+                for (success, doc_id, result), doc in zip(db.update(updates), updates):
+                    if success:
+                        written.append(doc)
+                    else:
+                        logger.warning(f"Failed to save couch document {doc_id}: {result}")
+
+        return written
+
     def read_doc(self, db, doc_id, rev=None):
         if rev is None:
             doc = db.get(doc_id)
@@ -53,5 +95,24 @@ class Couch(object):
         else:
             return False
 
+    def changed_docs(self, db, since=None):
+        """
+        Reads the _changes feed of a database and returns a tuple of the documents (with any
+        conflicting revisions) changed since the given update sequence, excluding deleted and
+        design documents, and the update sequence to read from next time
+
+        """
+
+        options = {"include_docs": True, "conflicts": True}
+        if since is not None:
+            options["since"] = since
+        changes = db.changes(**options)
+        docs = [
+            change["doc"]
+            for change in changes["results"]
+            if change.get("deleted") is not True and "doc" in change and not change["id"].startswith("_design/")
+        ]
+        return docs, changes["last_seq"]
+
     def all_docs(self, db):
         return db.view("_all_docs", include_docs=True, conflicts=True)
@@ -236,6 +236,14 @@ class Writer(object):
 
         self.get_tiles(graph_id=graph_id, resourceinstanceids=resourceinstanceids, **kwargs)
 
+    def can_stream(self):
+        """
+        Returns True if the writer's format can be written one resource at a time with stream_resources
+
+        """
+
+        return False
+
     def write_resource_relations(self):
         """
         Returns a list of dictionaries with the following format:
@@ -281,10 +289,7 @@ class Writer(object):
             except:
                 self.graph_id = models.ResourceInstance.objects.get(resourceinstanceid=resourceinstanceids[0]).graph_id
 
-        iso_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.graph_model = models.GraphModel.objects.get(graphid=self.graph_id)
-        self.file_prefix = self.graph_model.name.replace(" ", "_")
-        self.file_name = "{0}_{1}".format(self.file_prefix, iso_date)
+        self.set_graph(self.graph_id)
 
         for tile in self.tiles:
             try:
@@ -294,3 +299,48 @@ class Writer(object):
                 self.resourceinstances[tile.resourceinstance_id].append(tile)
 
         return self.resourceinstances
+
+    def set_graph(self, graph_id):
+        iso_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.graph_id = graph_id
+        self.graph_model = models.GraphModel.objects.get(graphid=graph_id)
+        self.file_prefix = self.graph_model.name.replace(" ", "_")
+        self.file_name = "{0}_{1}".format(self.file_prefix, iso_date)
+
+    def iter_resource_tiles(self, graph_id, chunk_size=500, **kwargs):
+        """
+        Yields a tuple of the resourceinstanceid and list of tiles of each resource instance of a graph
+        that has tiles, loading the tiles of chunk_size resource instances at a time (ordered by resourceinstanceid)
+        so that the tiles of the whole graph are never held in memory at once
+
+        Keyword Arguments:
+        user -- only yield the tiles of the nodegroups this user can read
+        exclude -- the ids of resource instances to skip (eg: those the user is restricted from)
+
+        """
+
+        user = kwargs.get("user", None)
+        exclude = {str(resourceinstanceid) for resourceinstanceid in kwargs.get("exclude", [])}
+        filters = {}
+        if user:
+            filters["nodegroup_id__in"] = [str(nodegroup.pk) for nodegroup in get_nodegroups_by_perm(user, "models.read_nodegroup")]
+
+        resourceinstances = models.ResourceInstance.objects.filter(graph_id=graph_id).order_by("resourceinstanceid")
+        last_resourceinstanceid = None
+        while True:
+            if last_resourceinstanceid is not None:
+                chunk = resourceinstances.filter(resourceinstanceid__gt=last_resourceinstanceid)
+            else:
+                chunk = resourceinstances
+            resourceinstanceids = list(chunk.values_list("resourceinstanceid", flat=True)[:chunk_size])
+            if len(resourceinstanceids) == 0:
+                break
+
+            tiles = {}
+            chunk_tiles = models.TileModel.objects.filter(resourceinstance_id__in=resourceinstanceids, **filters)
+            for tile in chunk_tiles.select_related("parenttile"):
+                tiles.setdefault(tile.resourceinstance_id, []).append(tile)
+            for resourceinstanceid in resourceinstanceids:
+                if resourceinstanceid in tiles and str(resourceinstanceid) not in exclude:
+                    yield resourceinstanceid, tiles.pop(resourceinstanceid)
+            last_resourceinstanceid = resourceinstanceids[-1]
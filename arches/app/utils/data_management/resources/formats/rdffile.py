@@ -1,5 +1,6 @@
 import os
 import re
+import copy
 import json
 import uuid
 import requests
@@ -10,16 +11,16 @@ from django.urls import reverse
 from .format import Writer, Reader
 from arches.app.models import models
 from arches.app.models.resource import Resource
-from arches.app.models.graph import Graph as GraphProxy
+from arches.app.models.graph_metadata import graph_metadata
 from arches.app.models.tile import Tile
 from arches.app.models.concept import Concept
 from arches.app.models.system_settings import settings
 from arches.app.datatypes.datatypes import DataTypeFactory
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from rdflib import Namespace
-from rdflib import URIRef, Literal
+from rdflib import URIRef, Literal, BNode
 from rdflib import ConjunctiveGraph as Graph
-from rdflib.namespace import RDF, RDFS
+from rdflib.namespace import RDF, RDFS, XSD
 from pyld.jsonld import compact, frame, from_rdf, to_rdf, expand, set_document_loader
 
 
@@ -71,7 +72,33 @@ class RdfWriter(Writer):
         full_file_name = os.path.join("{0}.{1}".format(self.file_name, "rdf"))
         return [{"name": full_file_name, "outputfile": dest}]
 
-    def get_rdf_graph(self):
+    def can_stream(self):
+        # the rdf of several resources can only be concatenated in line based formats
+        return self.format in ("nt", "nquads")
+
+    def stream_resources(self, graph_id, **kwargs):
+        """
+        Returns the file name to write to and a generator of the rdf of each resource instance of a graph
+        serialized as n-triples or n-quads (see can_stream), so that graph wide exports can be written
+        to a file or http response without building one rdf graph of every resource
+
+        """
+
+        if not self.can_stream():
+            raise ValueError("Resources can't be streamed as {0}".format(self.format))
+
+        self.set_graph(graph_id)
+
+        def stream():
+            for resourceinstanceid, tiles in self.iter_resource_tiles(graph_id, **kwargs):
+                g = self.get_rdf_graph({resourceinstanceid: tiles})
+                yield g.serialize(format=self.format).decode("utf-8")
+
+        return "{0}.{1}".format(self.file_name, "rdf"), stream()
+
+    def get_rdf_graph(self, resourceinstances=None):
+        if resourceinstances is None:
+            resourceinstances = self.resourceinstances
         archesproject = Namespace(settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT)
         graph_uri = URIRef(archesproject[reverse("graph", args=[self.graph_id]).lstrip("/")])
         self.logger.debug("Using `{0}` for Arches URI namespace".format(settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT))
@@ -79,49 +106,6 @@ class RdfWriter(Writer):
 
         g = Graph()
         g.bind("archesproject", archesproject, False)
-        graph_cache = {}
-
-        def get_nodegroup_edges_by_collector_node(node):
-            edges = []
-            nodegroup = node.nodegroup
-
-            def getchildedges(node):
-                for edge in models.Edge.objects.filter(domainnode=node):
-                    if nodegroup == edge.rangenode.nodegroup:
-                        edges.append(edge)
-                        getchildedges(edge.rangenode)
-
-            getchildedges(node)
-            return edges
-
-        def get_graph_parts(graphid):
-            if graphid not in graph_cache:
-                graph_cache[graphid] = {
-                    "rootedges": [],
-                    "subgraphs": {},
-                    "nodedatatypes": {},
-                }
-                graph = models.GraphModel.objects.get(pk=graphid)
-                nodegroups = set()
-                for node in graph.node_set.all():
-                    graph_cache[graphid]["nodedatatypes"][str(node.nodeid)] = node.datatype
-                    if node.nodegroup:
-                        nodegroups.add(node.nodegroup)
-                    if node.istopnode:
-                        for edge in get_nodegroup_edges_by_collector_node(node):
-                            if edge.rangenode.nodegroup is None:
-                                graph_cache[graphid]["rootedges"].append(edge)
-                for nodegroup in nodegroups:
-                    graph_cache[graphid]["subgraphs"][nodegroup] = {"edges": [], "inedge": None, "parentnode_nodegroup": None}
-                    graph_cache[graphid]["subgraphs"][nodegroup]["inedge"] = models.Edge.objects.get(rangenode_id=nodegroup.pk)
-                    graph_cache[graphid]["subgraphs"][nodegroup]["parentnode_nodegroup"] = graph_cache[graphid]["subgraphs"][nodegroup][
-                        "inedge"
-                    ].domainnode.nodegroup
-                    graph_cache[graphid]["subgraphs"][nodegroup]["edges"] = get_nodegroup_edges_by_collector_node(
-                        models.Node.objects.get(pk=nodegroup.pk)
-                    )
-
-            return graph_cache[graphid]
 
         def add_edge_to_graph(graph, domainnode, rangenode, edge, tile, graph_info):
             pkg = {}
@@ -188,26 +172,25 @@ class RdfWriter(Writer):
                 # both are single, 1 * 1
                 graph += rng_dt.to_rdf(pkg, edge)
 
-        for resourceinstanceid, tiles in self.resourceinstances.items():
-            graph_info = get_graph_parts(self.graph_id)
-
+        graph_info = graph_metadata.get_graph_edge_tree(self.graph_id)
+        for resourceinstanceid, tiles in resourceinstances.items():
             # add the edges for the group of nodes that include the root (this group of nodes has no nodegroup)
-            for edge in graph_cache[self.graph_id]["rootedges"]:
+            for edge in graph_info["rootedges"]:
                 domainnode = archesproject[str(edge.domainnode.pk)]
                 rangenode = archesproject[str(edge.rangenode.pk)]
                 add_edge_to_graph(g, domainnode, rangenode, edge, None, graph_info)
 
             for tile in tiles:
                 # add all the edges for a given tile/nodegroup
-                for edge in graph_info["subgraphs"][tile.nodegroup]["edges"]:
+                for edge in graph_info["subgraphs"][str(tile.nodegroup_id)]["edges"]:
                     domainnode = archesproject["tile/%s/node/%s" % (str(tile.pk), str(edge.domainnode.pk))]
                     rangenode = archesproject["tile/%s/node/%s" % (str(tile.pk), str(edge.rangenode.pk))]
                     add_edge_to_graph(g, domainnode, rangenode, edge, tile, graph_info)
 
                 # add the edge from the parent node to this tile's root node
                 # where the tile has no parent tile, which means the domain node has no tile_id
-                if graph_info["subgraphs"][tile.nodegroup]["parentnode_nodegroup"] is None:
-                    edge = graph_info["subgraphs"][tile.nodegroup]["inedge"]
+                if graph_info["subgraphs"][str(tile.nodegroup_id)]["parentnode_nodegroup"] is None:
+                    edge = graph_info["subgraphs"][str(tile.nodegroup_id)]["inedge"]
                     if edge.domainnode.istopnode:
                         domainnode = archesproject[reverse("resources", args=[resourceinstanceid]).lstrip("/")]
                     else:
@@ -217,9 +200,9 @@ class RdfWriter(Writer):
 
                 # add the edge from the parent node to this tile's root node
                 # where the tile has a parent tile
-                if graph_info["subgraphs"][tile.nodegroup]["parentnode_nodegroup"] is not None:
-                    edge = graph_info["subgraphs"][tile.nodegroup]["inedge"]
-                    domainnode = archesproject["tile/%s/node/%s" % (str(tile.parenttile.pk), str(edge.domainnode.pk))]
+                if graph_info["subgraphs"][str(tile.nodegroup_id)]["parentnode_nodegroup"] is not None:
+                    edge = graph_info["subgraphs"][str(tile.nodegroup_id)]["inedge"]
+                    domainnode = archesproject["tile/%s/node/%s" % (str(tile.parenttile_id), str(edge.domainnode.pk))]
                     rangenode = archesproject["tile/%s/node/%s" % (str(tile.pk), str(edge.rangenode.pk))]
                     add_edge_to_graph(g, domainnode, rangenode, edge, tile, graph_info)
         return g
@@ -230,16 +213,49 @@ class JsonLdWriter(RdfWriter):
         # Build the JSON separately serializing it, so we can use internally
         super(RdfWriter, self).write_resources(graph_id=graph_id, resourceinstanceids=resourceinstanceids, **kwargs)
         g = self.get_rdf_graph()
-        value = g.serialize(format="nquads").decode("utf-8")
-
-        js = from_rdf(value, {"format": "application/nquads", "useNativeTypes": True})
 
         assert len(resourceinstanceids) == 1  # currently, this should be limited to a single top resource
 
+        return self.get_resource_json(g, resourceinstanceids[0])
+
+    def can_stream(self):
+        # json-ld documents can't be concatenated, so only the newline delimited format is streamed
+        return self.format == "ndjson-ld"
+
+    def stream_resources(self, graph_id, **kwargs):
+        """
+        Returns the file name to write to and a generator of the json-ld of each resource instance
+        of a graph as newline delimited json (the "ndjson-ld" format)
+
+        """
+
+        if not self.can_stream():
+            raise ValueError("Resources can't be streamed as {0}".format(self.format))
+
+        self.set_graph(graph_id)
+
+        def stream():
+            for resourceinstanceid, tiles in self.iter_resource_tiles(graph_id, **kwargs):
+                g = self.get_rdf_graph({resourceinstanceid: tiles})
+                yield json.dumps(self.get_resource_json(g, resourceinstanceid), sort_keys=True) + "\n"
+
+        return "{0}.{1}".format(self.file_name, "ndjson"), stream()
+
+    def get_resource_json(self, g, resourceinstanceid):
         archesproject = Namespace(settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT)
-        resource_inst_uri = archesproject[reverse("resources", args=[resourceinstanceids[0]]).lstrip("/")]
+        resource_inst_uri = archesproject[reverse("resources", args=[resourceinstanceid]).lstrip("/")]
+
+        # convert the graph to json-ld directly rather than serializing it to n-quads
+        # and having pyld parse them back into json-ld
+        js = self.get_expanded_json(g)
 
         context = self.graph_model.jsonldcontext
+        if not context:
+            # without a context to compact against, a tree of nodes can be framed without pyld
+            framed = self.get_framed_json(js, str(resource_inst_uri))
+            if framed is not None:
+                return framed
+
         framing = {"@omitDefault": True, "@omitGraph": False, "@id": str(resource_inst_uri)}
 
         if context:
@@ -247,15 +263,6 @@ class JsonLdWriter(RdfWriter):
 
         js = frame(js, framing)
 
-        try:
-            context = JSONDeserializer().deserialize(context)
-        except ValueError:
-            if context == "":
-                context = {}
-            context = {"@context": context}
-        except AttributeError:
-            context = {"@context": {}}
-
         # Currently omitGraph is not processed by pyLd, but data is compacted
         # simulate omitGraph:
         if "@graph" in js and len(js["@graph"]) == 1:
@@ -265,6 +272,136 @@ class JsonLdWriter(RdfWriter):
             del js["@graph"]
         return js
 
+    def get_framed_json(self, js, root_id):
+        """
+        Returns the json-ld of the node with the given id with the nodes it references embedded in it,
+        the same json-ld as pyld's frame returns for the expanded json-ld with an empty context
+
+        Returns None if the nodes don't form a tree (a node is referenced more than once or the root is referenced),
+        or there are blank nodes or lists, leaving framing to pyld
+
+        """
+
+        subjects = {}
+        for graph_node in js:
+            for node in graph_node.get("@graph", [graph_node]):
+                subject = subjects.setdefault(node["@id"], {"@id": node["@id"]})
+                for key, values in node.items():
+                    if key == "@id":
+                        continue
+                    merged = subject.setdefault(key, [])
+                    for value in values:
+                        if value not in merged:
+                            merged.append(value)
+
+        references = {}
+        for subject_id, subject in subjects.items():
+            if subject_id.startswith("_:"):
+                return None
+            for key, values in subject.items():
+                if key in ("@id", "@type"):
+                    continue
+                for value in values:
+                    if "@list" in value:
+                        return None
+                    if "@id" in value:
+                        if value["@id"].startswith("_:"):
+                            return None
+                        references[value["@id"]] = references.get(value["@id"], 0) + 1
+        if root_id not in subjects or root_id in references:
+            return None
+        if any(count > 1 for subject_id, count in references.items() if subject_id in subjects):
+            return None
+
+        def compact_value(value):
+            if "@id" in value:
+                return embed(value["@id"])
+            if len(value) == 1:
+                return value["@value"]
+            return value
+
+        def embed(subject_id):
+            node = {}
+            for key, values in subjects.get(subject_id, {"@id": subject_id}).items():
+                if key == "@id":
+                    node[key] = values
+                    continue
+                if key != "@type":
+                    values = [compact_value(value) for value in values]
+                node[key] = values[0] if len(values) == 1 else values
+            return node
+
+        return embed(root_id)
+
+    def get_expanded_json(self, g):
+        """
+        Returns the expanded json-ld of an rdflib graph, the same json-ld as pyld's from_rdf
+        returns for the graph serialized as n-quads (with native types), without the round trip through n-quads
+
+        """
+
+        if (None, None, RDF.nil) in g:
+            # leave converting rdf lists to @list objects to pyld
+            value = g.serialize(format="nquads").decode("utf-8")
+            return from_rdf(value, {"format": "application/nquads", "useNativeTypes": True})
+
+        def get_id(term):
+            return term.n3() if isinstance(term, BNode) else str(term)
+
+        graph_nodes = {}
+        node_maps = {}
+        for context in g.contexts():
+            name = get_id(context.identifier)
+            graph_nodes.setdefault(name, {"@id": name})
+            node_map = node_maps.setdefault(name, {})
+            for s, p, o in context:
+                subject = get_id(s)
+                node = node_map.setdefault(subject, {"@id": subject})
+                if isinstance(o, Literal):
+                    node.setdefault(str(p), []).append(self.get_literal_value(o))
+                    continue
+                object_id = get_id(o)
+                node_map.setdefault(object_id, {"@id": object_id})
+                if p == RDF.type:
+                    node.setdefault("@type", []).append(object_id)
+                else:
+                    node.setdefault(str(p), []).append({"@id": object_id})
+
+        js = []
+        for name, graph_node in sorted(graph_nodes.items()):
+            # nodes that are only referenced (eg: the ontology classes) aren't output as subjects
+            graph_node["@graph"] = [node for subject, node in sorted(node_maps[name].items()) if len(node) > 1]
+            js.append(graph_node)
+        return js
+
+    def get_literal_value(self, literal):
+        """
+        Returns the expanded json-ld value of an rdflib Literal, converting
+        booleans, integers and doubles to native types as pyld's from_rdf does
+
+        """
+
+        value = str(literal)
+        if literal.language:
+            return {"@value": value, "@language": literal.language}
+
+        datatype = literal.datatype if literal.datatype is not None else XSD.string
+        if datatype == XSD.boolean:
+            if value in ("true", "false"):
+                value = value == "true"
+        elif datatype in (XSD.integer, XSD.double):
+            try:
+                float(value)
+                if datatype == XSD.double:
+                    value = float(value)
+                elif value.isdigit():
+                    value = int(value)
+            except ValueError:
+                pass
+        if datatype in (XSD.boolean, XSD.integer, XSD.double, XSD.string):
+            return {"@value": value}
+        return {"@value": value, "@type": str(datatype)}
+
     def write_resources(self, graph_id=None, resourceinstanceids=None, **kwargs):
         js = self.build_json(graph_id, resourceinstanceids, **kwargs)
         out = json.dumps(js, indent=kwargs.get("indent", None), sort_keys=True)
@@ -286,9 +423,8 @@ class JsonLdReader(Reader):
         self.verbosity = kwargs.get("verbosity", 1)
         self.ignore_errors = kwargs.get("ignore_errors", False)
         self.logger = logging.getLogger(__name__)
-        for graph in models.GraphModel.objects.filter(isresource=True):
-            node = models.Node.objects.get(graph_id=graph.pk, istopnode=True)
-            self.root_ontologyclass_lookup[str(graph.pk)] = node.ontologyclass
+        for graphid in models.GraphModel.objects.filter(isresource=True).values_list("graphid", flat=True):
+            self.root_ontologyclass_lookup[str(graphid)] = graph_metadata.get_root_ontology_class(graphid)
         self.logger.info("Initialized JsonLdReader")
 
     def validate_concept_in_collection(self, value, collection):
@@ -304,8 +440,8 @@ class JsonLdReader(Reader):
     def process_graph(self, graphid):
         root_node = None
         nodes = {}
-        graph = GraphProxy.objects.get(graphid=graphid)
-        for nodeid, n in graph.nodes.items():
+        edge_tree = graph_metadata.get_graph_edge_tree(graphid)
+        for nodeid, n in edge_tree["nodes"].items():
             node = {}
             if n.istopnode:
                 root_node = node
@@ -321,9 +457,11 @@ class JsonLdReader(Reader):
             if n.config and "rdmCollection" in n.config:
                 node["config"]["collection_id"] = str(n.config["rdmCollection"])
             elif n.config and "graphs" in n.config:
-                for entry in n.config["graphs"]:
+                # the nodes are shared with other readers and writers so leave their config as is
+                n_config_graphs = copy.deepcopy(n.config["graphs"])
+                for entry in n_config_graphs:
                     entry["rootclass"] = self.root_ontologyclass_lookup[entry["graphid"]]
-                node["config"]["graphs"] = n.config["graphs"]
+                node["config"]["graphs"] = n_config_graphs
             node["required"] = n.isrequired
             node["node_id"] = str(n.nodeid)
             node["name"] = n.name
@@ -334,7 +472,7 @@ class JsonLdReader(Reader):
             node["children"] = {}
             nodes[str(n.nodeid)] = node
 
-        for edegid, e in graph.edges.items():
+        for e in edge_tree["edges"]:
             dn = e.domainnode_id
             rng = e.rangenode_id
             prop = e.ontologyproperty
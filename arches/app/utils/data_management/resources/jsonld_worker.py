@@ -0,0 +1,39 @@
+import django
+
+# django.setup() must be called here to prepare for multiprocessing. specifically,
+# it must be called before any models are imported, otherwise the spawned subprocesses
+# that unpickle read_resource will crash with AppRegistryNotReady
+django.setup()
+from django.db import connections
+from arches.app.utils.data_management.resources.formats.rdffile import JsonLdReader
+
+# one reader per graph in each subprocess used to read resources in parallel
+readers = {}
+
+
+def init_reader_worker(database_name):
+    """
+    Points a spawned subprocess at the database used by the parent process (eg the test database)
+
+    """
+
+    connections["default"].settings_dict["NAME"] = database_name
+
+
+def read_resource(args):
+    """
+    Reads a json-ld record into a list of resources in a subprocess
+
+    Returns a tuple of the resourceid, the list of resources and the error message if the record couldn't be read
+
+    """
+
+    resourceid, graphid, data, verbosity, ignore_errors = args
+    if graphid not in readers:
+        readers[graphid] = JsonLdReader(verbosity=verbosity, ignore_errors=ignore_errors)
+        readers[graphid].graphtree = readers[graphid].process_graph(graphid)
+    try:
+        readers[graphid].read_resource(data, resourceid=resourceid, graphid=graphid)
+        return resourceid, list(readers[graphid].resources), None
+    except Exception as e:
+        return resourceid, [], str(e)
@@ -6,30 +6,41 @@ django.setup()
 
 import pyprind
 import sys
+from contextlib import contextmanager
 from django.db import connection, connections
 from django.db.models import Q
 from arches.app.models import models
 from arches.app.models.models import Value
 from arches.app.models.resource import Resource
+from arches.app.models.graph_metadata import graph_metadata
 from arches.app.models.system_settings import settings
+from arches.app.search.search import BulkIndexStats
 from arches.app.search.search_engine_factory import SearchEngineInstance as se
-from arches.app.search.elasticsearch_dsl_builder import Query, Term
-from arches.app.search.base_index import get_index
+from elasticsearch.exceptions import NotFoundError
+from arches.app.search.elasticsearch_dsl_builder import Bool, Query, Term, Terms
+from arches.app.search.base_index import get_index, SearchIndexError
 from arches.app.search.mappings import TERMS_INDEX, CONCEPTS_INDEX, RESOURCES_INDEX
+from arches.app.search.time_wheel import TimeWheel
 from arches.app.datatypes.datatypes import DataTypeFactory
 from arches.app.utils import import_class_from_string
-from datetime import datetime
+from arches.app.utils.betterJSONSerializer import JSONSerializer
+from arches.app.utils.permission_backend import get_restricted_users__bulk
+from datetime import datetime, timedelta
 
 
+import functools
 import multiprocessing
-import os
 import math
 import logging
+import queue
+import threading
 
 logger = logging.getLogger(__name__)
 
 
-def index_db(clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0):
+def index_db(
+    clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0, stats=None
+):
     """
     Deletes any existing indicies from elasticsearch and then indexes all
     concepts and resources from the database
@@ -40,24 +51,30 @@ def index_db(clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet
     quiet -- Silences the status bar output during certain operations, use in celery operations for example
     use_multiprocessing (default False) -- runs the reindexing in multiple subprocesses to take advantage of parallel indexing
     max_subprocesses - limits multiprocessing to a this number of processes. Default is half cpu count.
+    stats -- a BulkIndexStats to add the counts of the resources and terms indexed to
+
+    Returns a BulkIndexStats with the resources and terms indexed and any that failed
     """
 
     index_concepts(clear_index=clear_index, batch_size=batch_size)
-    index_resources(
+    stats = index_resources(
         clear_index=clear_index,
         batch_size=batch_size,
         quiet=quiet,
         use_multiprocessing=use_multiprocessing,
         max_subprocesses=max_subprocesses,
+        stats=stats,
     )
     index_custom_indexes(clear_index=clear_index, batch_size=batch_size, quiet=quiet)
+    return stats
 
 
 def index_resources(
-    clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0
+    clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0, stats=None
 ):
     """
-    Indexes all resources from the database
+    Indexes all resources from the database, with refreshing and replication of the resources
+    and terms indexes turned off until they're all indexed (see _bulk_indexing_mode)
 
     Keyword Arguments:
     clear_index -- set to True to remove all the resources from the index before the reindexing operation
@@ -65,61 +82,226 @@ def index_resources(
     quiet -- Silences the status bar output during certain operations, use in celery operations for example
     use_multiprocessing (default False) -- runs the reindexing in multiple subprocesses to take advantage of parallel indexing
     max_subprocesses -- explicitly sets the size of process pool. Auto limits to cpu count if more than this.
+    stats -- a BulkIndexStats to add the counts of the resources and terms indexed to
+
+    Returns a BulkIndexStats with the resources and terms indexed and any that failed
 
     """
 
+    started = datetime.now()
+    if stats is None:
+        stats = BulkIndexStats()
     resource_types = (
         models.GraphModel.objects.filter(isresource=True)
         .exclude(graphid=settings.SYSTEM_SETTINGS_RESOURCE_MODEL_ID)
         .values_list("graphid", flat=True)
     )
-    index_resources_by_type(
-        resource_types,
-        clear_index=clear_index,
-        batch_size=batch_size,
-        quiet=quiet,
-        use_multiprocessing=use_multiprocessing,
-        max_subprocesses=max_subprocesses,
-    )
+    with _bulk_indexing_mode(RESOURCES_INDEX, TERMS_INDEX):
+        index_resources_by_type(
+            resource_types,
+            clear_index=clear_index,
+            batch_size=batch_size,
+            quiet=quiet,
+            use_multiprocessing=use_multiprocessing,
+            max_subprocesses=max_subprocesses,
+            stats=stats,
+        )
+    _set_index_checkpoint(started)
+    return stats
+
+
+def index_changed_resources(
+    since=None,
+    batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+    quiet=False,
+    use_multiprocessing=False,
+    max_subprocesses=0,
+    checkpoint_name="resources",
+    overlap=timedelta(minutes=5),
+    stats=None,
+):
+    """
+    Incrementally indexes only the resources with edit log entries since the last stored checkpoint (or the given time)
+    and removes the documents of any of those resources that have since been deleted. Resources are indexed in place,
+    without first clearing the index, and the checkpoint is moved forward once indexing is complete.
+    If there is no checkpoint yet all resources are indexed.
+
+    Keyword Arguments:
+    since -- a datetime to index changes from instead of the stored checkpoint
+    batch_size -- the number of records to index as a group, the larger the number to more memory required
+    quiet -- Silences the status bar output during certain operations, use in celery operations for example
+    use_multiprocessing (default False) -- runs the reindexing in multiple subprocesses to take advantage of parallel indexing
+    max_subprocesses -- explicitly sets the size of process pool. Auto limits to cpu count if more than this.
+    checkpoint_name -- the name of the checkpoint to read and update
+    overlap -- how far before the checkpoint to look for edits, to catch edits committed after a previous run started
+    stats -- a BulkIndexStats to add the counts of the resources and terms indexed to
+
+    Returns a BulkIndexStats with the resources and terms indexed and any that failed
+
+    """
+
+    started = datetime.now()
+    if since is None:
+        checkpoint = models.ResourceIndexCheckpoint.objects.filter(name=checkpoint_name).first()
+        if checkpoint is None:
+            logger.info("No index checkpoint found, indexing all resources")
+            return index_resources(
+                clear_index=False,
+                batch_size=batch_size,
+                quiet=quiet,
+                use_multiprocessing=use_multiprocessing,
+                max_subprocesses=max_subprocesses,
+                stats=stats,
+            )
+        since = checkpoint.timestamp - overlap
+
+    changed_ids = set()
+    for resourceid in (
+        models.EditLog.objects.filter(timestamp__gte=since)
+        .exclude(resourceinstanceid=None)
+        .values_list("resourceinstanceid", flat=True)
+        .distinct()
+    ):
+        try:
+            changed_ids.add(str(uuid.UUID(str(resourceid))))
+        except ValueError:
+            pass
+
+    existing_ids = {
+        str(resourceid)
+        for resourceid in models.ResourceInstance.objects.filter(resourceinstanceid__in=changed_ids).values_list(
+            "resourceinstanceid", flat=True
+        )
+    }
+    deleted_ids = changed_ids - existing_ids
+    resourceids = [
+        str(resourceid)
+        for resourceid in models.ResourceInstance.objects.filter(resourceinstanceid__in=existing_ids)
+        .exclude(graph_id=settings.SYSTEM_SETTINGS_RESOURCE_MODEL_ID)
+        .values_list("resourceinstanceid", flat=True)
+    ]
+    logger.info(f"Indexing {len(resourceids)} changed resources and removing {len(deleted_ids)} deleted resources since {since}")
+
+    # the terms of changed resources are removed too, as they may belong to tiles that no longer exist
+    for batch in _get_batches(list(deleted_ids) + resourceids, batch_size):
+        delete_query = Query(se=se)
+        bool_query = Bool()
+        bool_query.filter(Terms(field="resourceinstanceid", terms=batch))
+        delete_query.add_query(bool_query)
+        delete_query.delete(index=TERMS_INDEX)
+    for batch in _get_batches(list(deleted_ids), batch_size):
+        delete_query = Query(se=se)
+        bool_query = Bool()
+        bool_query.filter(Terms(field="resourceinstanceid", terms=batch))
+        delete_query.add_query(bool_query)
+        delete_query.delete(index=RESOURCES_INDEX, refresh=True)
+
+    if use_multiprocessing:
+        stats = index_resources_using_multiprocessing(
+            resourceids=resourceids, batch_size=batch_size, quiet=quiet, max_subprocesses=max_subprocesses, stats=stats
+        )
+    else:
+        resources = Resource.objects.filter(resourceinstanceid__in=resourceids)
+        stats = index_resources_using_singleprocessing(
+            resources=resources, batch_size=batch_size, quiet=quiet, title="Indexing changed resources", stats=stats
+        )
+
+    _set_index_checkpoint(started, checkpoint_name)
+    return stats
+
+
+def _set_index_checkpoint(timestamp, checkpoint_name="resources"):
+    models.ResourceIndexCheckpoint.objects.update_or_create(name=checkpoint_name, defaults={"timestamp": timestamp})
 
 
 def index_resources_using_multiprocessing(
-    resourceids, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, max_subprocesses=0, callback=None
+    resourceids,
+    batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+    quiet=False,
+    max_subprocesses=0,
+    callback=None,
+    refresh=True,
+    resource_count=None,
+    stats=None,
 ):
+    """
+    Indexes resources with a pipeline of long lived subprocesses that build the documents of batches of resources
+    and a sender thread that indexes those documents with parallel bulk requests
+
+    The ids are read lazily, so resourceids can be a (server side cursor) iterator, and both the number of batches
+    waiting on the subprocesses and the number of documents waiting to be sent are bounded
+
+    Arguments:
+    resourceids -- an iterable of resource instance ids to index
+
+    Keyword Arguments:
+    batch_size -- the number of records to index as a group, the larger the number to more memory required
+    quiet -- Silences the status bar output during certain operations, use in celery operations for example
+    max_subprocesses -- explicitly sets the size of process pool. Auto limits to cpu count if more than this.
+    callback -- a function called with the number of resources in a batch each time a batch has been indexed
+    refresh -- False to leave refreshing the indexes to the caller rather than refreshing them once indexing is done,
+        in which case the caller also invalidates the cached time wheels (see TimeWheel.invalidate) once they're refreshed
+    resource_count -- the number of resources to index, needed for the progress bar when resourceids is an iterator
+    stats -- a BulkIndexStats to add the counts of this run to
+
+    Returns a BulkIndexStats with the documents indexed and any that failed, including the resources of batches
+    that couldn't be built
+
+    """
+
     try:
         multiprocessing.set_start_method("spawn")
     except:
         pass
 
     logger.debug(f"... multiprocessing method: {multiprocessing.get_start_method()}")
-    resource_batches = []
-    resource_count = 0
-    batch_number = 0
-    resource_batches.append([])
-
-    for resource in resourceids:
-        resource_count += 1
-        resource_batches[batch_number].append(resource)
-        if resource_count == batch_size:
-            resource_batches.append([])
-            batch_number += 1
-            resource_count = 0
 
-    connections.close_all()
+    default_process_count = math.ceil(multiprocessing.cpu_count() / 2)
+    if max_subprocesses == 0:
+        process_count = default_process_count
+    elif max_subprocesses > multiprocessing.cpu_count():
+        process_count = multiprocessing.cpu_count()
+        logger.debug(f"... max_subprocess count exceeds CPU count. Limiting to {process_count}")
+    else:
+        process_count = max_subprocesses
+    logger.debug(f"... multiprocessing process count: {process_count}")
 
+    bar = None
     if quiet is False:
-        bar = pyprind.ProgBar(len(resource_batches), bar_char="█", stream=sys.stdout) if len(resource_batches) > 1 else None
-
-    def process_complete_callback(result):
-        if quiet is False and bar is not None:
-            bar.update(item_id=result)
+        if resource_count is None:
+            try:
+                resource_count = len(resourceids)
+            except TypeError:
+                pass  # the number of ids isn't known up front
+        if resource_count is not None:
+            batch_count = math.ceil(resource_count / batch_size)
+            bar = pyprind.ProgBar(batch_count, bar_char="█", stream=sys.stdout) if batch_count > 1 else None
+
+    # documents built by the subprocesses wait here for the sender
+    bulk_items_queue = queue.Queue(maxsize=process_count * 2)
+    # batches handed to the subprocesses but not yet built
+    pending_batches = threading.BoundedSemaphore(process_count * 2)
+    if stats is None:
+        stats = BulkIndexStats()
+    sender = threading.Thread(target=_send_bulk_items, args=(bulk_items_queue, process_count, batch_size, stats))
+    sender.start()
+
+    def process_complete_callback(batch_count, bulk_items):
+        bulk_items_queue.put(bulk_items)
+        pending_batches.release()
+        if bar is not None:
+            bar.update(item_id=stats)
         if callback is not None:
-            callback()
+            callback(batch_count)
 
-    def process_error_callback(err):
+    def process_error_callback(resource_batch, err):
         import traceback
 
-        if quiet is False and bar is not None:
+        pending_batches.release()
+        stats.add_failures(
+            [{"_index": RESOURCES_INDEX, "_id": resourceid, "status": None, "error": str(err)} for resourceid in resource_batch]
+        )
+        if bar is not None:
             bar.update()
         try:
             raise err
@@ -128,53 +310,207 @@ def index_resources_using_multiprocessing(
         finally:
             logger.error(f"Error indexing resource batch, type {type(err)}, message: {err}, \n>>>>>>>>>>>>>> TRACEBACK: {tb}")
 
-    default_process_count = math.ceil(multiprocessing.cpu_count() / 2)
-    if max_subprocesses == 0:
-        process_count = default_process_count
-    elif max_subprocesses > multiprocessing.cpu_count():
-        process_count = multiprocessing.cpu_count()
-        logger.debug(f"... max_subprocess count exceeds CPU count. Limiting to {process_count}")
-    else:
-        process_count = max_subprocesses
+    connections.close_all()
+    try:
+        with multiprocessing.Pool(processes=process_count, initializer=_init_index_worker) as pool:
+            for resource_batch in _get_batches((str(resourceid) for resourceid in resourceids), batch_size):
+                pending_batches.acquire()
+                pool.apply_async(
+                    _get_resource_batch_bulk_items,
+                    args=(resource_batch,),
+                    callback=functools.partial(process_complete_callback, len(resource_batch)),
+                    error_callback=functools.partial(process_error_callback, resource_batch),
+                )
+            pool.close()
+            pool.join()
+    finally:
+        bulk_items_queue.put(None)
+        sender.join()
+    _log_bulk_index_stats("Resources and terms", stats)
+
+    if refresh:
+        se.refresh(index=RESOURCES_INDEX)
+        se.refresh(index=TERMS_INDEX)
+        TimeWheel.invalidate()
+
+    return stats
+
+
+def _send_bulk_items(bulk_items_queue, thread_count, chunk_size, stats):
+    """
+    Indexes the lists of bulk items put on the queue with parallel bulk requests until None is put on the queue
+
+    """
+
+    done = threading.Event()
+
+    def get_bulk_items():
+        while True:
+            bulk_items = bulk_items_queue.get()
+            if bulk_items is None:
+                done.set()
+                return
+            yield from bulk_items
+
+    error = None
+    try:
+        se.parallel_bulk_index(get_bulk_items(), thread_count=thread_count, queue_size=thread_count, chunk_size=chunk_size, stats=stats)
+    except Exception as e:
+        logger.error(f"Error sending indexed resources to Elasticsearch: {e}")
+        error = str(e)
+        stats.add_failures([{"_index": None, "_id": None, "status": None, "error": error}])
+
+    # if the bulk requests stopped early keep emptying the queue so that the subprocesses aren't blocked,
+    # recording the documents that won't be sent as failures
+    if not done.is_set():
+        stats.add_failures(
+            [{"_index": bulk_item["_index"], "_id": bulk_item["_id"], "status": None, "error": error} for bulk_item in get_bulk_items()]
+        )
+
+
+def _init_index_worker():
+    # load the graph metadata once for the life of the subprocess
+    graph_metadata.get_node_datatypes()
 
-    logger.debug(f"... multiprocessing process count: {process_count}")
-    logger.debug(f"... resource type batch count (batch size={batch_size}): {len(resource_batches)}")
-    with multiprocessing.Pool(processes=process_count) as pool:
-        for resource_batch in resource_batches:
-            pool.apply_async(
-                _index_resource_batch,
-                args=(resource_batch,),
-                callback=process_complete_callback,
-                error_callback=process_error_callback,
-            )
-        pool.close()
-        pool.join()
+
+def _get_resource_batch_bulk_items(resourceids):
+    """
+    Returns the bulk items (see SearchEngine.create_bulk_item) needed to index a batch of resources
+
+    """
+
+    datatype_factory = DataTypeFactory()
+    node_datatypes = graph_metadata.get_node_datatypes()
+    serializer = JSONSerializer()
+    bulk_items = []
+    resources = list(Resource.objects.filter(resourceinstanceid__in=resourceids))
+    for resource, document, terms in _get_documents_to_index(resources, datatype_factory, node_datatypes):
+        bulk_items.append(
+            se.create_bulk_item(index=RESOURCES_INDEX, id=document["resourceinstanceid"], data=serializer.serializeToPython(document))
+        )
+        for term in terms:
+            bulk_items.append(se.create_bulk_item(index=TERMS_INDEX, id=term["_id"], data=serializer.serializeToPython(term["_source"])))
+    return bulk_items
+
+
+def _get_documents_to_index(resources, datatype_factory, node_datatypes):
+    """
+    Yields a tuple of (resource, document, terms) for each of a batch of resources, calculating their descriptors
+    and restrictions in bulk, then saves the descriptors of the batch with a single update
+
+    """
+
+    Resource.get_descriptors__bulk(resources)
+    restricted_users = get_restricted_users__bulk(resources)
+    for resource in resources:
+        document, terms = resource.get_documents_to_index(
+            fetchTiles=True,
+            datatype_factory=datatype_factory,
+            node_datatypes=node_datatypes,
+            fetchDescriptors=False,
+            restrictions=restricted_users[str(resource.pk)],
+        )
+        yield resource, document, terms
+    Resource.objects.bulk_update(resources, ["name", "descriptors"], batch_size=len(resources))
 
 
 def index_resources_using_singleprocessing(
-    resources: Iterable[Resource], batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, title=None
+    resources: Iterable[Resource], batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, title=None, refresh=True, stats=None
 ):
+    """
+    Indexes resources in batches from the current process, saving the descriptors
+    calculated for each batch of resources with a single update
+
+    Arguments:
+    resources -- the resources to index
+
+    Keyword Arguments:
+    batch_size -- the number of records to index as a group, the larger the number to more memory required
+    quiet -- Silences the status bar output during certain operations, use in celery operations for example
+    title -- the title of the progress bar
+    refresh -- False to leave refreshing the indexes to the caller rather than refreshing them after every batch,
+        in which case the caller also invalidates the cached time wheels (see TimeWheel.invalidate) once they're refreshed
+    stats -- a BulkIndexStats to add the counts of this run to
+
+    Returns a BulkIndexStats with the documents indexed and any that failed
+
+    """
+
     datatype_factory = DataTypeFactory()
-    node_datatypes = {str(nodeid): datatype for nodeid, datatype in models.Node.objects.values_list("nodeid", "datatype")}
-    with se.BulkIndexer(batch_size=batch_size, refresh=True) as doc_indexer:
-        with se.BulkIndexer(batch_size=batch_size, refresh=True) as term_indexer:
+    node_datatypes = graph_metadata.get_node_datatypes()
+    if stats is None:
+        stats = BulkIndexStats()
+    with se.BulkIndexer(batch_size=batch_size, refresh=refresh, stats=stats) as doc_indexer:
+        with se.BulkIndexer(batch_size=batch_size, refresh=refresh, stats=stats) as term_indexer:
             if quiet is False:
                 bar = pyprind.ProgBar(len(resources), bar_char="█", title=title) if len(resources) > 1 else None
-            for resource in resources:
-                if quiet is False and bar is not None:
-                    bar.update(item_id=resource)
-                document, terms = resource.get_documents_to_index(
-                    fetchTiles=True, datatype_factory=datatype_factory, node_datatypes=node_datatypes
-                )
-                resource.save(index=False)
-                doc_indexer.add(index=RESOURCES_INDEX, id=document["resourceinstanceid"], data=document)
-                for term in terms:
-                    term_indexer.add(index=TERMS_INDEX, id=term["_id"], data=term["_source"])
+            for resource_batch in _get_batches(resources, batch_size):
+                for resource, document, terms in _get_documents_to_index(resource_batch, datatype_factory, node_datatypes):
+                    if quiet is False and bar is not None:
+                        bar.update(item_id=resource)
+                    doc_indexer.add(index=RESOURCES_INDEX, id=document["resourceinstanceid"], data=document)
+                    for term in terms:
+                        term_indexer.add(index=TERMS_INDEX, id=term["_id"], data=term["_source"])
+    _log_bulk_index_stats("Resources and terms", stats)
+    if refresh:
+        # every bulk request refreshed the indexes, so the documents are already searchable
+        TimeWheel.invalidate()
+
+    return stats
+
+
+def _log_bulk_index_stats(name, stats):
+    if len(stats.failures) > 0:
+        logger.warning(f"{name}: {stats}")
+    else:
+        logger.info(f"{name}: {stats}")
+
+
+@contextmanager
+def _bulk_indexing_mode(*indexes):
+    """
+    Turns off refreshing and replication of the given indexes while reindexing into them,
+    then restores their previous settings and refreshes them once
+
+    Refuses to start if refreshing is already turned off on any of the indexes, as another reindex
+    is either still running or was interrupted, and its settings would otherwise be restored as the previous ones
+
+    """
+
+    previous_settings = {}
+    for index in indexes:
+        try:
+            current_settings = se.get_settings(index=index, name=["index.refresh_interval", "index.number_of_replicas"])
+        except NotFoundError:
+            continue
+        index_settings = list(current_settings.values())[0]["settings"]["index"]
+        if index_settings.get("refresh_interval") == "-1":
+            raise SearchIndexError(
+                f"Refreshing of the {index} index is already turned off. Another reindex may still be running, "
+                + "otherwise reset its refresh_interval before reindexing."
+            )
+        previous_settings[index] = {
+            "refresh_interval": index_settings.get("refresh_interval"),
+            "number_of_replicas": index_settings.get("number_of_replicas"),
+        }
+    for index in previous_settings:
+        se.put_settings(index=index, body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+    try:
+        yield
+    finally:
+        for index, index_settings in previous_settings.items():
+            se.put_settings(index=index, body={"index": index_settings})
+            se.refresh(index=index)
 
-    return os.getpid()
 
 def index_resources_by_type(
-    resource_types, clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0
+    resource_types,
+    clear_index=True,
+    batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+    quiet=False,
+    use_multiprocessing=False,
+    max_subprocesses=0,
+    stats=None,
 ):
     """
     Indexes all resources of a given type(s)
@@ -188,6 +524,7 @@ def index_resources_by_type(
     quiet -- Silences the status bar output during certain operations, use in celery operations for example
     use_multiprocessing (default False) -- runs the reindexing in multiple subprocesses to take advantage of parallel indexing
     max_subprocesses (default 0) -- explicitly set the number of processes to use.
+    stats -- a BulkIndexStats to add the counts of the resources and terms indexed to
 
     """
 
@@ -201,57 +538,92 @@ def index_resources_by_type(
         # resource_types = [resource_types]
 
     for resource_type in resource_types:
-        start = datetime.now()
-
-        graph_name = models.GraphModel.objects.get(graphid=str(resource_type)).name
-        logger.info("Indexing resource type '{0}'".format(graph_name))
-
-        if clear_index:
-            tq = Query(se=se)
-            cards = models.CardModel.objects.filter(graph_id=str(resource_type)).select_related("nodegroup")
-            for nodegroup in [card.nodegroup for card in cards]:
-                term = Term(field="nodegroupid", term=str(nodegroup.nodegroupid))
-                tq.add_query(term)
-            tq.delete(index=TERMS_INDEX, refresh=True)
-
-            rq = Query(se=se)
-            term = Term(field="graph_id", term=str(resource_type))
-            rq.add_query(term)
-            rq.delete(index=RESOURCES_INDEX, refresh=True)
-
-        if use_multiprocessing:
-            resources = [
-                str(rid) for rid in Resource.objects.filter(graph_id=str(resource_type)).values_list("resourceinstanceid", flat=True)
-            ]
-            index_resources_using_multiprocessing(
-                resourceids=resources, batch_size=batch_size, quiet=quiet, max_subprocesses=max_subprocesses
-            )
+        status = _index_resource_type(
+            resource_type,
+            clear_index=clear_index,
+            batch_size=batch_size,
+            quiet=quiet,
+            use_multiprocessing=use_multiprocessing,
+            max_subprocesses=max_subprocesses,
+            stats=stats,
+        )
+    return status
 
-        else:
-            from arches.app.search.search_engine_factory import SearchEngineInstance as _se
 
-            resources = Resource.objects.filter(graph_id=str(resource_type))
-            index_resources_using_singleprocessing(resources=resources, batch_size=batch_size, quiet=quiet, title=graph_name)
+def _index_resource_type(resource_type, clear_index, batch_size, quiet, use_multiprocessing, max_subprocesses, stats=None):
+    """
+    Indexes all resources of a given type without refreshing the indexes after each batch
+    and returns the status of the indexing
 
-        q = Query(se=se)
+    """
+
+    start = datetime.now()
+
+    graph_name = models.GraphModel.objects.get(graphid=str(resource_type)).name
+    logger.info("Indexing resource type '{0}'".format(graph_name))
+
+    if clear_index:
+        tq = Query(se=se)
+        cards = models.CardModel.objects.filter(graph_id=str(resource_type)).select_related("nodegroup")
+        for nodegroup in [card.nodegroup for card in cards]:
+            term = Term(field="nodegroupid", term=str(nodegroup.nodegroupid))
+            tq.add_query(term)
+        tq.delete(index=TERMS_INDEX, refresh=True)
+
+        rq = Query(se=se)
         term = Term(field="graph_id", term=str(resource_type))
-        q.add_query(term)
-        result_summary = {"database": len(resources), "indexed": se.count(index=RESOURCES_INDEX, body=q.dsl)}
-        status = "Passed" if result_summary["database"] == result_summary["indexed"] else "Failed"
-        logger.info(
-            "Status: {0}, Resource Type: {1}, In Database: {2}, Indexed: {3}, Took: {4} seconds".format(
-                status, graph_name, result_summary["database"], result_summary["indexed"], (datetime.now() - start).seconds
-            )
+        rq.add_query(term)
+        rq.delete(index=RESOURCES_INDEX, refresh=True)
+
+    if use_multiprocessing:
+        resources = Resource.objects.filter(graph_id=str(resource_type)).values_list("resourceinstanceid", flat=True)
+        index_resources_using_multiprocessing(
+            resourceids=resources.iterator(chunk_size=batch_size),
+            batch_size=batch_size,
+            quiet=quiet,
+            max_subprocesses=max_subprocesses,
+            refresh=False,
+            resource_count=None if quiet else resources.count(),
+            stats=stats,
         )
+
+    else:
+        from arches.app.search.search_engine_factory import SearchEngineInstance as _se
+
+        resources = Resource.objects.filter(graph_id=str(resource_type))
+        index_resources_using_singleprocessing(
+            resources=resources, batch_size=batch_size, quiet=quiet, title=graph_name, refresh=False, stats=stats
+        )
+
+    se.refresh(index=RESOURCES_INDEX)
+    TimeWheel.invalidate()
+    q = Query(se=se)
+    term = Term(field="graph_id", term=str(resource_type))
+    q.add_query(term)
+    result_summary = {"database": resources.count(), "indexed": se.count(index=RESOURCES_INDEX, body=q.dsl)}
+    status = "Passed" if result_summary["database"] == result_summary["indexed"] else "Failed"
+    logger.info(
+        "Status: {0}, Resource Type: {1}, In Database: {2}, Indexed: {3}, Took: {4} seconds".format(
+            status, graph_name, result_summary["database"], result_summary["indexed"], (datetime.now() - start).seconds
+        )
+    )
     return status
 
 
-def _index_resource_batch(resourceids):
-    from arches.app.search.search_engine_factory import SearchEngineInstance as _se
+def _get_batches(items, batch_size):
+    """
+    Yields lists of at most batch_size items from an iterable
+
+    """
 
-    resources = Resource.objects.filter(resourceinstanceid__in=resourceids)
-    batch_size = int(len(resourceids) / 2)
-    return index_resources_using_singleprocessing(resources, batch_size, quiet=True, se=_se)
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
 
 
 def index_custom_indexes(index_name=None, clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False):
@@ -378,43 +750,75 @@ def index_concepts(clear_index=True, batch_size=settings.BULK_IMPORT_BATCH_SIZE)
     )
 
 
+def get_resourceids_by_transaction(transaction_id):
+    """
+    Returns the ids of all the resources created with a transaction id
+
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute("""SELECT resourceinstanceid FROM edit_log WHERE transactionid = %s AND edittype = 'create';""", [transaction_id])
+        rows = cursor.fetchall()
+    return [id for (id,) in rows]
+
+
 def index_resources_by_transaction(
-    transaction_id, batch_size=settings.BULK_IMPORT_BATCH_SIZE, quiet=False, use_multiprocessing=False, max_subprocesses=0
+    transaction_id,
+    batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+    quiet=False,
+    use_multiprocessing=False,
+    max_subprocesses=0,
+    resourceids=None,
+    callback=None,
+    stats=None,
 ):
     """
     Indexes all the resources with a transaction id
 
     Keyword Arguments:
+    batch_size -- the number of records to index as a group, the larger the number to more memory required
     quiet -- Silences the status bar output during certain operations, use in celery operations for example
+    use_multiprocessing (default False) -- runs the reindexing in multiple subprocesses to take advantage of parallel indexing
+    max_subprocesses (default 0) -- explicitly set the number of processes to use.
+    resourceids -- only index this chunk of the resources created with the transaction id
+    callback -- a function called with the number of resources indexed each time a batch has been indexed
+    stats -- a BulkIndexStats to add the counts of the resources and terms indexed to
+
+    Returns a BulkIndexStats with the resources and terms indexed and any that failed
 
     """
     start = datetime.now()
 
     try:
-        uuid.UUID(transaction_id)
+        uuid.UUID(str(transaction_id))
     except ValueError:
         logger.error("A transaction id must be a valid uuid")
         return
 
     logger.info("Indexing transaction '{0}'".format(transaction_id))
 
-    with connection.cursor() as cursor:
-        cursor.execute("""SELECT resourceinstanceid FROM edit_log WHERE transactionid = %s AND edittype = 'create';""", [transaction_id])
-        rows = cursor.fetchall()
-    resourceids = [id for (id,) in rows]
+    if resourceids is None:
+        resourceids = get_resourceids_by_transaction(transaction_id)
+    if stats is None:
+        stats = BulkIndexStats()
 
     if use_multiprocessing:
         index_resources_using_multiprocessing(
-            resourceids=resourceids, batch_size=batch_size, quiet=quiet, max_subprocesses=max_subprocesses
+            resourceids=resourceids, batch_size=batch_size, quiet=quiet, max_subprocesses=max_subprocesses, callback=callback, stats=stats
         )
     else:
-        index_resources_using_singleprocessing(
-            resources=Resource.objects.filter(pk__in=resourceids),
-            batch_size=batch_size,
-            quiet=quiet,
-            title="transaction {}".format(transaction_id),
-        )
+        for resourceid_batch in _get_batches(resourceids, batch_size):
+            index_resources_using_singleprocessing(
+                resources=Resource.objects.filter(pk__in=resourceid_batch),
+                batch_size=batch_size,
+                quiet=quiet,
+                title="transaction {}".format(transaction_id),
+                stats=stats,
+            )
+            if callback is not None:
+                callback(len(resourceid_batch))
 
     logger.info(
         "Transaction: {0}, In Database: {1}, Took: {2} seconds".format(transaction_id, len(resourceids), (datetime.now() - start).seconds)
     )
+    return stats
@@ -1,5 +1,9 @@
+import logging
 from arches.app.datatypes.datatypes import DataTypeFactory
 from arches.app.models import models
+from arches.app.models.graph_metadata import graph_metadata
+
+logger = logging.getLogger(__name__)
 
 RESOURCE_ID_KEY = "@resource_id"
 NODE_ID_KEY = "@node_id"
@@ -77,7 +81,7 @@ class LabelBasedNode(object):
 
 class LabelBasedGraph(object):
     @staticmethod
-    def generate_node_ids_to_tiles_reference_and_nodegroup_cardinality_reference(resource):
+    def generate_node_ids_to_tiles_reference_and_nodegroup_cardinality_reference(resource, nodegroup_cardinality_reference=None):
         """
         Builds a reference of all nodes in a in a given resource,
         paired with a list of tiles in which they exist
@@ -97,8 +101,11 @@ class LabelBasedGraph(object):
                 tile_list.append(tile)
                 node_ids_to_tiles_reference[node_id] = tile_list
 
-        nodegroup_cardinality = models.NodeGroup.objects.filter(pk__in=nodegroupids).values("nodegroupid", "cardinality")
-        nodegroup_cardinality_reference = {str(nodegroup["nodegroupid"]): nodegroup["cardinality"] for nodegroup in nodegroup_cardinality}
+        if nodegroup_cardinality_reference is None:
+            nodegroup_cardinality = models.NodeGroup.objects.filter(pk__in=nodegroupids).values("nodegroupid", "cardinality")
+            nodegroup_cardinality_reference = {
+                str(nodegroup["nodegroupid"]): nodegroup["cardinality"] for nodegroup in nodegroup_cardinality
+            }
 
         return node_ids_to_tiles_reference, nodegroup_cardinality_reference
 
@@ -113,6 +120,7 @@ class LabelBasedGraph(object):
         compact=False,
         hide_empty_nodes=False,
         as_json=True,
+        display_values=None,
     ):
         """
         Generates a label-based graph from a given tile
@@ -138,6 +146,7 @@ class LabelBasedGraph(object):
             nodegroup_cardinality_reference=nodegroup_cardinality_reference,
             node_cache=node_cache,
             datatype_factory=datatype_factory,
+            display_values=display_values,
         )
 
         return graph.as_json(include_empty_nodes=bool(not hide_empty_nodes)) if as_json else graph
@@ -154,9 +163,13 @@ class LabelBasedGraph(object):
         user=None,
         perm=None,
         hide_hidden_nodes=False,
+        nodegroup_cardinality_reference=None,
+        display_values=None,
+        tiles_loaded=False,
     ):
         """
-        Generates a label-based graph from a given resource
+        Generates a label-based graph from a given resource, loading its tiles unless
+        tiles_loaded is True (eg: they were loaded in bulk and the resource has none the user can read)
         """
         if not datatype_factory:
             datatype_factory = DataTypeFactory()
@@ -164,13 +177,20 @@ class LabelBasedGraph(object):
         if node_cache is None:  # need explicit None comparison
             node_cache = {}
 
-        if not resource.tiles:
+        if not tiles_loaded and not resource.tiles:
             resource.load_tiles(user, perm)
 
+        cls._cache_graph_nodes(resource.graph_id, node_cache)
+
         (
             node_ids_to_tiles_reference,
             nodegroup_cardinality_reference,
-        ) = cls.generate_node_ids_to_tiles_reference_and_nodegroup_cardinality_reference(resource=resource)
+        ) = cls.generate_node_ids_to_tiles_reference_and_nodegroup_cardinality_reference(
+            resource=resource, nodegroup_cardinality_reference=nodegroup_cardinality_reference
+        )
+
+        if display_values is None:
+            display_values = cls._get_display_values__bulk([resource], datatype_factory)
 
         root_label_based_node = LabelBasedNode(name=None, node_id=None, tile_id=None, value=None, cardinality=None)
 
@@ -184,6 +204,7 @@ class LabelBasedGraph(object):
                 compact=compact,
                 hide_empty_nodes=hide_empty_nodes,
                 as_json=False,
+                display_values=display_values,
             )
 
             if label_based_graph:
@@ -207,15 +228,45 @@ class LabelBasedGraph(object):
             return root_label_based_node
 
     @classmethod
-    def from_resources(cls, resources, compact=False, hide_empty_nodes=False, as_json=True):
+    def from_resources(cls, resources, compact=False, hide_empty_nodes=False, as_json=True, user=None, perm=None, hide_hidden_nodes=False):
         """
         Generates a list of label-based graph from given resources
         """
 
+        return list(
+            cls.iter_resources(
+                resources,
+                compact=compact,
+                hide_empty_nodes=hide_empty_nodes,
+                as_json=as_json,
+                user=user,
+                perm=perm,
+                hide_hidden_nodes=hide_hidden_nodes,
+            )
+        )
+
+    @classmethod
+    def iter_resources(cls, resources, compact=False, hide_empty_nodes=False, as_json=True, user=None, perm=None, hide_hidden_nodes=False):
+        """
+        Yields the label-based graph of each of the given resources, loading the tiles of
+        all the resources, the cardinality of their nodegroups and their display values up front
+        """
+
+        # need this here to prevent a circular import error
+        from arches.app.models.resource import Resource
+
         datatype_factory = DataTypeFactory()
         node_cache = {}
 
-        resource_label_based_graphs = []
+        resources = list(resources)
+        Resource.load_tiles__bulk([resource for resource in resources if not resource.tiles], user=user, perm=perm)
+        nodegroup_cardinality_reference = {
+            str(nodegroupid): cardinality
+            for nodegroupid, cardinality in models.NodeGroup.objects.filter(
+                pk__in={tile.nodegroup_id for resource in resources for tile in resource.tiles}
+            ).values_list("nodegroupid", "cardinality")
+        }
+        display_values = cls._get_display_values__bulk(resources, datatype_factory)
 
         for resource in resources:
             resource_label_based_graph = cls.from_resource(
@@ -225,17 +276,67 @@ class LabelBasedGraph(object):
                 compact=compact,
                 hide_empty_nodes=hide_empty_nodes,
                 as_json=as_json,
+                hide_hidden_nodes=hide_hidden_nodes,
+                nodegroup_cardinality_reference=nodegroup_cardinality_reference,
+                display_values=display_values,
+                tiles_loaded=True,
             )
 
             resource_label_based_graph[RESOURCE_ID_KEY] = str(resource.pk)
-            resource_label_based_graphs.append(resource_label_based_graph)
+            yield resource_label_based_graph
 
-        return resource_label_based_graphs
+    @staticmethod
+    def _cache_graph_nodes(graph_id, node_cache):
+        """
+        Adds the nodes of the cached graph, and the direct child nodes of each, to the node cache
+        so that they aren't fetched from the database one at a time
+        """
+        edge_tree = graph_metadata.get_graph_edge_tree(graph_id)
+        for nodeid, node in edge_tree["nodes"].items():
+            node_cache.setdefault(node.pk, node)
+            node_cache.setdefault("child_nodes_%s" % nodeid, edge_tree["child_nodes"].get(nodeid, []))
+
+    @classmethod
+    def _get_display_values__bulk(cls, resources, datatype_factory):
+        """
+        Returns a dictionary of display values keyed to (tileid, nodeid) for the tiles of the given resources,
+        resolving the values of each node for all the tiles at once (eg: one query per concept or resource instance node)
+        """
+        nodes_by_nodegroup = {}
+        tiles_by_nodegroup = {}
+        for resource in resources:
+            for node in graph_metadata.get_graph_edge_tree(resource.graph_id)["nodes"].values():
+                if node.nodegroup_id is not None:
+                    nodes_by_nodegroup.setdefault(str(node.nodegroup_id), {})[str(node.pk)] = node
+            for tile in resource.tiles:
+                if tile.data:
+                    tiles_by_nodegroup.setdefault(str(tile.nodegroup_id), []).append(tile)
+
+        display_values = {}
+        for nodegroupid, tiles in tiles_by_nodegroup.items():
+            for nodeid, node in nodes_by_nodegroup.get(nodegroupid, {}).items():
+                if datatype_factory.datatypes[node.datatype].defaultwidget is None:
+                    continue
+                datatype = datatype_factory.get_instance(node.datatype)
+                node_tiles = [tile for tile in tiles if nodeid in tile.data]
+                try:
+                    node_display_values = datatype.get_display_values__bulk(node_tiles, node)
+                except Exception:
+                    # leave the values to be resolved (or fail) one at a time in _get_display_value
+                    logger.warning("Unable to get the display values of node %s in bulk" % nodeid, exc_info=True)
+                    continue
+                for tile, display_value in zip(node_tiles, node_display_values):
+                    display_values[(str(tile.pk), nodeid)] = display_value
+
+        return display_values
 
     @classmethod
-    def _get_display_value(cls, tile, node, datatype_factory):
+    def _get_display_value(cls, tile, node, datatype_factory, display_values=None):
         display_value = None
 
+        if display_values is not None and (str(tile.pk), str(node.pk)) in display_values:
+            return display_values[(str(tile.pk), str(node.pk))]
+
         # if the node is unable to collect data, let's explicitly say so
         if datatype_factory.datatypes[node.datatype].defaultwidget is None:
             display_value = NON_DATA_COLLECTING_NODE
@@ -253,11 +354,25 @@ class LabelBasedGraph(object):
 
     @classmethod
     def _build_graph(
-        cls, input_node, input_tile, parent_tree, node_ids_to_tiles_reference, nodegroup_cardinality_reference, node_cache, datatype_factory
+        cls,
+        input_node,
+        input_tile,
+        parent_tree,
+        node_ids_to_tiles_reference,
+        nodegroup_cardinality_reference,
+        node_cache,
+        datatype_factory,
+        display_values=None,
     ):
+        def get_direct_child_nodes(node):
+            key = "child_nodes_%s" % node.pk
+            if key not in node_cache:
+                node_cache[key] = node.get_direct_child_nodes()
+            return node_cache[key]
+
         def is_valid_semantic_node(node, tile):
             if node.datatype == "semantic":
-                child_nodes = node.get_direct_child_nodes()
+                child_nodes = get_direct_child_nodes(node)
                 semantic_child_nodes = [child_node for child_node in child_nodes if child_node.datatype == "semantic"]
                 non_semantic_child_nodes = [child_node for child_node in child_nodes if child_node.datatype != "semantic"]
 
@@ -274,25 +389,27 @@ class LabelBasedGraph(object):
                 return has_valid_child_semantic_node
 
         for associated_tile in node_ids_to_tiles_reference.get(str(input_node.pk), [input_tile]):
-            parent_tile = associated_tile.parenttile
+            parent_tile_id = associated_tile.parenttile_id
 
-            if associated_tile == input_tile or parent_tile == input_tile:
+            if associated_tile == input_tile or (parent_tile_id is not None and parent_tile_id == input_tile.pk):
                 if is_valid_semantic_node(input_node, associated_tile) or str(input_node.pk) in associated_tile.data:
                     label_based_node = LabelBasedNode(
                         name=input_node.name,
                         node_id=str(input_node.pk),
                         tile_id=str(associated_tile.pk),
-                        value=cls._get_display_value(tile=associated_tile, node=input_node, datatype_factory=datatype_factory),
+                        value=cls._get_display_value(
+                            tile=associated_tile, node=input_node, datatype_factory=datatype_factory, display_values=display_values
+                        ),
                         cardinality=nodegroup_cardinality_reference.get(str(associated_tile.nodegroup_id)),
                     )
 
                     if not parent_tree:  # if top node and
-                        if not parent_tile:  # if not top node in separate card
+                        if not parent_tile_id:  # if not top node in separate card
                             parent_tree = label_based_node
                     else:
                         parent_tree.child_nodes.append(label_based_node)
 
-                    for child_node in input_node.get_direct_child_nodes():
+                    for child_node in get_direct_child_nodes(input_node):
                         if not node_cache.get(child_node.pk):
                             node_cache[child_node.pk] = child_node
 
@@ -304,6 +421,7 @@ class LabelBasedGraph(object):
                             nodegroup_cardinality_reference=nodegroup_cardinality_reference,
                             node_cache=node_cache,
                             datatype_factory=datatype_factory,
+                            display_values=display_values,
                         )
 
         return parent_tree
@@ -1,4 +1,5 @@
 import inspect
+import uuid
 
 from arches.app.models.models import *
 from arches.app.models.system_settings import settings
@@ -14,6 +15,7 @@ from guardian.shortcuts import (
 from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.exceptions import WrongAppError
 from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db.models import Model
 from django.core.cache import caches
 from arches.app.models.models import ResourceInstance
@@ -53,33 +55,92 @@ def get_restricted_users(resource):
 
     """
 
-    user_perms = get_users_with_perms(resource, attach_perms=True, with_group_users=False)
-    user_and_group_perms = get_users_with_perms(resource, attach_perms=True, with_group_users=True)
+    return get_restricted_users__bulk([resource])[str(resource.pk)]
 
-    result = {
-        "no_access": [],
-        "cannot_read": [],
-        "cannot_write": [],
-        "cannot_delete": [],
+
+def get_restricted_users__bulk(resources):
+    """
+    Takes a list of resource instances and identifies which users are explicitly restricted from
+    reading, editing, deleting, or accessing each of them, using a fixed number of queries regardless
+    of the number of resources.
+
+    Returns a dictionary keyed to resource instance id of the same results returned by get_restricted_users
+
+    Arguments:
+    resources -- a list of resource instances (or resource instance ids)
+
+    """
+
+    resourceids = [str(getattr(resource, "pk", resource)) for resource in resources]
+    content_type = ContentType.objects.get_for_model(ResourceInstance)
+
+    user_perms = {}  # {resourceid: {userid: set(codenames)}}
+    for object_pk, userid, codename in UserObjectPermission.objects.filter(
+        content_type=content_type, object_pk__in=resourceids
+    ).values_list("object_pk", "user_id", "permission__codename"):
+        user_perms.setdefault(object_pk, {}).setdefault(userid, set()).add(codename)
+
+    group_perms = {}  # {resourceid: {groupid: set(codenames)}}
+    for object_pk, groupid, codename in GroupObjectPermission.objects.filter(
+        content_type=content_type, object_pk__in=resourceids
+    ).values_list("object_pk", "group_id", "permission__codename"):
+        group_perms.setdefault(object_pk, {}).setdefault(groupid, set()).add(codename)
+
+    groupids = {groupid for perms in group_perms.values() for groupid in perms}
+    group_users = {}  # {groupid: set(userids)}
+    user_groups = {}  # {userid: set(groupids)}
+    for userid, groupid in User.groups.through.objects.filter(group_id__in=groupids).values_list("user_id", "group_id"):
+        group_users.setdefault(groupid, set()).add(userid)
+        user_groups.setdefault(userid, set()).add(groupid)
+
+    userids = {userid for perms in user_perms.values() for userid in perms} | set(user_groups.keys())
+    users = {
+        userid: (is_superuser, is_active)
+        for userid, is_superuser, is_active in User.objects.filter(id__in=userids).values_list("id", "is_superuser", "is_active")
     }
 
-    for user, perms in user_and_group_perms.items():
-        if user.is_superuser:
-            pass
-        elif user in user_perms and "no_access_to_resourceinstance" in user_perms[user]:
-            for k, v in result.items():
-                v.append(user.id)
-        else:
-            if "view_resourceinstance" not in perms:
-                result["cannot_read"].append(user.id)
-            if "change_resourceinstance" not in perms:
-                result["cannot_write"].append(user.id)
-            if "delete_resourceinstance" not in perms:
-                result["cannot_delete"].append(user.id)
-            if "no_access_to_resourceinstance" in perms and len(perms) == 1:
-                result["no_access"].append(user.id)
+    ret = {}
+    for resourceid in resourceids:
+        result = {
+            "no_access": [],
+            "cannot_read": [],
+            "cannot_write": [],
+            "cannot_delete": [],
+        }
+        resource_user_perms = user_perms.get(resourceid, {})
+        resource_group_perms = group_perms.get(resourceid, {})
+        resource_userids = set(resource_user_perms.keys())
+        for groupid in resource_group_perms:
+            resource_userids |= group_users.get(groupid, set())
+
+        for userid in sorted(resource_userids):
+            is_superuser, is_active = users.get(userid, (False, False))
+            if is_superuser:
+                continue
+            # mirrors guardian, which reports no permissions for inactive users
+            perms = set()
+            if is_active:
+                perms |= resource_user_perms.get(userid, set())
+                for groupid in user_groups.get(userid, set()):
+                    perms |= resource_group_perms.get(groupid, set())
+
+            # as with guardian's get_users_with_perms(with_group_users=False), a user with any direct permission
+            # is fully restricted if their effective permissions (direct and group) include no access
+            if userid in resource_user_perms and "no_access_to_resourceinstance" in perms:
+                for k, v in result.items():
+                    v.append(userid)
+            else:
+                if "view_resourceinstance" not in perms:
+                    result["cannot_read"].append(userid)
+                if "change_resourceinstance" not in perms:
+                    result["cannot_write"].append(userid)
+                if "delete_resourceinstance" not in perms:
+                    result["cannot_delete"].append(userid)
+                if "no_access_to_resourceinstance" in perms and len(perms) == 1:
+                    result["no_access"].append(userid)
+        ret[resourceid] = result
 
-    return result
+    return ret
 
 
 def get_restricted_instances(user, search_engine=None, allresources=False):
@@ -116,6 +177,63 @@ def get_restricted_instances(user, search_engine=None, allresources=False):
         return restricted_ids
 
 
+def get_restricted_instances_sql(resourceinstanceid_column):
+    """
+    Returns a sql condition that excludes the resource instances any user or group is restricted from accessing
+    (the same instances returned by get_restricted_instances with allresources=True) by anti-joining
+    against the guardian permission tables instead of passing the restricted ids as query parameters
+
+    Arguments:
+    resourceinstanceid_column -- the column of the outer query holding the resource instance id eg: "geojson_geometries.resourceinstanceid"
+
+    """
+
+    return """NOT EXISTS (
+            SELECT 1 FROM guardian_userobjectpermission uop
+            JOIN auth_permission p ON p.id = uop.permission_id
+            WHERE p.codename = 'no_access_to_resourceinstance' AND uop.object_pk = {0}::text
+        ) AND NOT EXISTS (
+            SELECT 1 FROM guardian_groupobjectpermission gop
+            JOIN auth_permission p ON p.id = gop.permission_id
+            WHERE p.codename = 'no_access_to_resourceinstance' AND gop.object_pk = {0}::text
+        )""".format(
+        resourceinstanceid_column
+    )
+
+
+RESTRICTED_INSTANCES_VERSION_KEY = "restricted_instances_version"
+
+
+def get_restricted_instances_key():
+    """
+    Returns a version token that changes whenever a resource instance restriction is added or removed for any user or group
+    Use it as part of a cache key for anything that depends on get_restricted_instances with allresources=True
+
+    The token is kept in the user_permission cache and is replaced by invalidate_restricted_instances_key
+    (called from the UserObjectPermission and GroupObjectPermission signal receivers)
+
+    """
+
+    user_permission_cache = caches["user_permission"]
+    version = user_permission_cache.get(RESTRICTED_INSTANCES_VERSION_KEY)
+    if version is None:
+        user_permission_cache.add(RESTRICTED_INSTANCES_VERSION_KEY, str(uuid.uuid4()), None)
+        version = user_permission_cache.get(RESTRICTED_INSTANCES_VERSION_KEY)
+    if version is None:
+        # the configured cache can't share a version (eg: a dummy cache) so every key is unique
+        version = str(uuid.uuid4())
+    return version
+
+
+def invalidate_restricted_instances_key():
+    """
+    Replaces the version token returned by get_restricted_instances_key so that anything cached under the old token is ignored
+
+    """
+
+    caches["user_permission"].set(RESTRICTED_INSTANCES_VERSION_KEY, str(uuid.uuid4()), None)
+
+
 def get_groups_for_object(perm, obj):
     """
     returns a list of group objects that have the given permission on the given object
@@ -185,6 +303,14 @@ def get_nodegroups_by_perm(user, perms, any_perm=True):
         else:
             formatted_perms.append(perm)
 
+    # permitted nodegroups are cached with the user's other permissions (see CachedObjectPermissionChecker)
+    # and are cleared whenever object permissions, group membership, graphs or nodegroups change
+    user_permission_cache = caches["user_permission"]
+    cache_key = (tuple(sorted(set(formatted_perms))), any_perm)
+    cached_nodegroups = user_permission_cache.get(str(user.pk), {}).get("nodegroups_by_perm", {})
+    if cache_key in cached_nodegroups:
+        return cached_nodegroups[cache_key]
+
     permitted_nodegroups = set()
     NodegroupPermissionsChecker = CachedObjectPermissionChecker(user, NodeGroup)
 
@@ -201,6 +327,11 @@ def get_nodegroups_by_perm(user, perms, any_perm=True):
         else:  # if no explicit permissions, object is considered accessible by all with group permissions
             permitted_nodegroups.add(nodegroup)
 
+    # re-read the user's cache entry as the permission checker above may have just added to it
+    current_user_cached_permissions = user_permission_cache.get(str(user.pk), {})
+    current_user_cached_permissions.setdefault("nodegroups_by_perm", {})[cache_key] = permitted_nodegroups
+    user_permission_cache.set(str(user.pk), current_user_cached_permissions)
+
     return permitted_nodegroups
 
 
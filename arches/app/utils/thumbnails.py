@@ -0,0 +1,102 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import logging
+import mimetypes
+from PIL import Image
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = "uploadedfiles/thumbnails"
+
+
+def get_thumbnail_dir(fileid):
+    return "%s/%s" % (THUMBNAIL_DIR, fileid)
+
+
+def get_thumbnail_name(fileid, size):
+    return "%s/%s.jpg" % (get_thumbnail_dir(fileid), size)
+
+
+def is_image(file):
+    mimetype = mimetypes.guess_type(file.path.name)[0]
+    return mimetype is not None and mimetype.startswith("image/")
+
+
+def create_thumbnail(file, size):
+    """
+    Renders a JPEG thumbnail (no wider or taller than size pixels) of the given File model
+    and saves it to the storage of the original file, replacing any existing thumbnail
+
+    Returns the bytes of the thumbnail
+
+    """
+
+    storage = file.path.storage
+    name = get_thumbnail_name(file.fileid, size)
+    with Image.open(file.path.file).copy() as image:
+        image = image.convert("RGB")
+        image.thumbnail((size, size))
+        b = io.BytesIO()
+        image.save(b, "JPEG")
+    thumbnail = b.getvalue()
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(thumbnail))
+    return thumbnail
+
+
+def get_thumbnail(file, size):
+    """
+    Returns the bytes of a JPEG thumbnail of the given File model, only rendering
+    the thumbnail if it hasn't already been saved to storage
+
+    Returns None if the file can't be read as an image
+
+    """
+
+    storage = file.path.storage
+    name = get_thumbnail_name(file.fileid, size)
+    try:
+        if storage.exists(name):
+            with storage.open(name, "rb") as f:
+                return f.read()
+        return create_thumbnail(file, size)
+    except Exception as e:
+        logger.warning("Unable to create a thumbnail of file %s: %s" % (file.fileid, e))
+        return None
+
+
+def delete_thumbnails(file):
+    """
+    Deletes every thumbnail saved for the given File model
+
+    """
+
+    storage = file.path.storage
+    thumbnail_dir = get_thumbnail_dir(file.fileid)
+    try:
+        if not storage.exists(thumbnail_dir):
+            return
+        for name in storage.listdir(thumbnail_dir)[1]:
+            storage.delete("%s/%s" % (thumbnail_dir, name))
+        storage.delete(thumbnail_dir)
+    except Exception as e:
+        logger.warning("Unable to delete the thumbnails of file %s: %s" % (file.fileid, e))
@@ -23,18 +23,33 @@ from arches.app.models import models
 from django.http import HttpResponse
 
 
-def create_zip_file(files_for_export, filekey):
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def write_zip_file(files_for_export, dest, filekey="outputfile"):
     """
-    Takes a list of dictionaries, each with a file object and a name, zips up all the files with those names and returns a zip file buffer.
+    Takes a list of dictionaries, each with a file object and a name, and zips up all the files with those names into dest
+    (a path or a writable file object). Files are copied into the zip in chunks so they are never read fully into memory.
     """
 
-    buffer = BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip:
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zip:
         for f in files_for_export:
             f[filekey].seek(0)
-            zip.writestr(f["name"], f[filekey].read())
+            with zip.open(f["name"], "w", force_zip64=True) as zipped_file:
+                while True:
+                    chunk = f[filekey].read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    zipped_file.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+
 
-    zip.close()
+def create_zip_file(files_for_export, filekey):
+    """
+    Takes a list of dictionaries, each with a file object and a name, zips up all the files with those names and returns a zip file buffer.
+    """
+
+    buffer = BytesIO()
+    write_zip_file(files_for_export, buffer, filekey)
     buffer.flush()
     zip_stream = buffer.getvalue()
     buffer.close()
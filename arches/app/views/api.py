@@ -1,4 +1,5 @@
-from base64 import b64decode
+from base64 import b64decode, urlsafe_b64decode, urlsafe_b64encode
+import datetime
 import importlib
 import json
 import logging
@@ -19,13 +20,15 @@ from django.contrib.auth import authenticate
 from django.shortcuts import render
 from django.views.generic import View
 from django.db import transaction, connection
-from django.db.models import Q
-from django.http import Http404, HttpResponse
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.http.request import QueryDict
 from django.core import management
 from django.core.cache import cache
 from django.forms.models import model_to_dict
 from django.urls import reverse
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.translation import ugettext as _
 from django.core.files.base import ContentFile
 from django.views.decorators.csrf import csrf_exempt
@@ -41,6 +44,7 @@ from arches.app.models.tile import Tile as TileProxyModel, TileValidationError
 from arches.app.views.tile import TileData as TileView
 from arches.app.views.resource import RelatedResourcesView, get_resource_relationship_types
 from arches.app.utils.skos import SKOSWriter
+from arches.app.utils.label_based_graph import LabelBasedGraph
 from arches.app.utils.response import JSONResponse
 from arches.app.utils.decorators import can_read_concept, group_required
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
@@ -54,7 +58,10 @@ from arches.app.utils.permission_backend import (
     user_can_read_concepts,
     user_is_resource_reviewer,
     get_restricted_instances,
+    get_restricted_instances_key,
+    get_restricted_instances_sql,
     check_resource_instance_permissions,
+    get_restricted_users__bulk,
     get_nodegroups_by_perm,
 )
 from arches.app.utils.geo_utils import GeoUtils
@@ -400,13 +407,9 @@ class MVT(APIBase):
         except models.Node.DoesNotExist:
             raise Http404()
         config = node.config
-        cache_key = f"mvt_{nodeid}_{zoom}_{x}_{y}"
+        cache_key = f"mvt_{nodeid}_{zoom}_{x}_{y}_{get_restricted_instances_key()}"
         tile = cache.get(cache_key)
         if tile is None:
-            resource_ids = get_restricted_instances(request.user, allresources=True)
-            if len(resource_ids) == 0:
-                resource_ids.append("10000000-0000-0000-0000-000000000001")  # This must have a uuid that will never be a resource id.
-            resource_ids = tuple(resource_ids)
             with connection.cursor() as cursor:
                 if int(zoom) <= int(config["clusterMaxZoom"]):
                     arc = self.EARTHCIRCUM / ((1 << int(zoom)) * self.PIXELSPERTILE)
@@ -424,7 +427,7 @@ class MVT(APIBase):
                                     nodeid,
                                     geom
                                 FROM geojson_geometries
-                                WHERE nodeid = %s and resourceinstanceid not in %s
+                                WHERE nodeid = %s and {0}
                             ) m
                         )
 
@@ -461,8 +464,10 @@ class MVT(APIBase):
                             FROM clusters
                             WHERE cid IS NOT NULL
                             GROUP BY cid
-                        ) as tile;""",
-                        [distance, min_points, nodeid, resource_ids, nodeid, zoom, x, y, zoom, x, y],
+                        ) as tile;""".format(
+                            get_restricted_instances_sql("geojson_geometries.resourceinstanceid")
+                        ),
+                        [distance, min_points, nodeid, nodeid, zoom, x, y, zoom, x, y],
                     )
                 else:
                     cursor.execute(
@@ -476,8 +481,10 @@ class MVT(APIBase):
                             ) AS geom,
                             1 AS total
                         FROM geojson_geometries
-                        WHERE nodeid = %s and resourceinstanceid not in %s) AS tile;""",
-                        [nodeid, zoom, x, y, nodeid, resource_ids],
+                        WHERE nodeid = %s and {0}) AS tile;""".format(
+                            get_restricted_instances_sql("geojson_geometries.resourceinstanceid")
+                        ),
+                        [nodeid, zoom, x, y, nodeid],
                     )
                 tile = bytes(cursor.fetchone()[0])
                 cache.set(cache_key, tile, settings.TILE_CACHE_TIMEOUT)
@@ -568,11 +575,16 @@ class Resources(APIBase):
             return JSONResponse(status=403)
 
         allowed_formats = ["json", "json-ld", "arches-json"]
+        # formats a whole graph of resources can be streamed in, one resource at a time
+        streamed_formats = ["nt", "nquads", "ndjson-ld"]
         format = request.GET.get("format", "json-ld")
         hide_hidden_nodes = bool(request.GET.get("hidden", "true").lower() == "false")
         user = request.user
         perm = "read_nodegroup"
 
+        if format in streamed_formats and not resourceid:
+            return self.stream_graph(request, format, graphid=request.GET.get("graph", graphid), slug=slug)
+
         if format not in allowed_formats:
             return JSONResponse(status=406, reason="incorrect format specified, only %s formats allowed" % allowed_formats)
 
@@ -668,31 +680,83 @@ class Resources(APIBase):
             # out = compact(out, context, options={'skipExpansion':False, 'compactArrays': False})
 
             page_size = settings.API_MAX_PAGE_SIZE
+            base_url = "%s%s" % (settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT, reverse("resources", args=[""]).lstrip("/"))
 
-            try:
-                page = int(request.GET.get("page", None))
-            except Exception:
-                page = 1
-
-            start = (page - 1) * page_size
-            end = start + page_size
+            resourceids = Resource.objects.exclude(pk=settings.SYSTEM_SETTINGS_RESOURCE_ID).order_by("pk")
+            graphid = request.GET.get("graph", graphid)
+            if graphid:
+                try:
+                    resourceids = resourceids.filter(graph_id=uuid.UUID(str(graphid)))
+                except ValueError:
+                    return JSONResponse(status=400, reason="invalid graph id")
+            elif slug:
+                resourceids = resourceids.filter(graph__slug=slug)
+
+            modified_since = request.GET.get("modified_since", None)
+            if modified_since:
+                try:
+                    modified_since = parse_datetime(modified_since) or datetime.datetime.combine(
+                        parse_date(modified_since), datetime.time.min
+                    )
+                except (TypeError, ValueError):
+                    return JSONResponse(status=400, reason="modified_since must be an ISO 8601 date or datetime")
+                # edit_log stores resource ids as text
+                edited_resourceids = models.EditLog.objects.filter(timestamp__gte=modified_since).values("resourceinstanceid")
+                resourceids = resourceids.annotate(resourceinstanceid_text=Cast("pk", output_field=TextField())).filter(
+                    resourceinstanceid_text__in=edited_resourceids
+                )
+            resourceids = resourceids.values_list("pk", flat=True)
+
+            if request.GET.get("stream", "false").lower() == "true":
+                # stream every matching resource as newline delimited json rather than one page at a time
+                def stream():
+                    last_resourceid = None
+                    while True:
+                        page = resourceids if last_resourceid is None else resourceids.filter(pk__gt=last_resourceid)
+                        page = list(page[:page_size])
+                        for resourceid in page:
+                            yield json.dumps({"@id": "%s%s" % (base_url, resourceid)}) + "\n"
+                        if len(page) < page_size:
+                            break
+                        last_resourceid = page[-1]
+
+                return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+
+            if "page" in request.GET:
+                try:
+                    page_number = int(request.GET.get("page", None))
+                except Exception:
+                    page_number = 1
+
+                start = (page_number - 1) * page_size
+                end = start + page_size
+                page = list(resourceids[start:end])
+                next_page = {"page": page_number + 1} if len(page) == page_size else None
+            else:
+                # use keyset pagination, continuing after the last resource of the previous page
+                cursor = request.GET.get("cursor", None)
+                if cursor:
+                    try:
+                        resourceids = resourceids.filter(pk__gt=uuid.UUID(urlsafe_b64decode(cursor.encode()).decode()))
+                    except ValueError:
+                        return JSONResponse(status=400, reason="invalid cursor")
+                page = list(resourceids[:page_size])
+                next_page = {"cursor": urlsafe_b64encode(str(page[-1]).encode()).decode()} if len(page) == page_size else None
 
-            base_url = "%s%s" % (settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT, reverse("resources", args=[""]).lstrip("/"))
             out = {
                 "@context": "https://www.w3.org/ns/ldp/",
                 "@id": "",
                 "@type": "ldp:BasicContainer",
                 # Here we actually mean the name
                 # "label": str(model.name),
-                "ldp:contains": [
-                    "%s%s" % (base_url, resourceid)
-                    for resourceid in list(
-                        Resource.objects.values_list("pk", flat=True)
-                        .exclude(pk=settings.SYSTEM_SETTINGS_RESOURCE_ID)
-                        .order_by("pk")[start:end]
-                    )
-                ],
+                "ldp:contains": ["%s%s" % (base_url, resourceid) for resourceid in page],
             }
+            if next_page is not None:
+                params = request.GET.copy()
+                params.pop("cursor", None)
+                for key, value in next_page.items():
+                    params[key] = value
+                out["next"] = "%s?%s" % (request.build_absolute_uri(request.path), params.urlencode())
 
         return JSONResponse(out, indent=indent)
 
@@ -735,6 +799,31 @@ class Resources(APIBase):
     #     except Exception as e:
     #         return JSONResponse(status=500, reason=e)
 
+    def stream_graph(self, request, format, graphid=None, slug=None):
+        """
+        Streams the rdf (as n-triples or n-quads) or newline delimited json-ld of every resource of a graph
+        that the user can read, building the rdf of one resource at a time
+
+        """
+
+        try:
+            if graphid:
+                graph = models.GraphModel.objects.get(pk=uuid.UUID(str(graphid)))
+            elif slug:
+                graph = models.GraphModel.objects.get(slug=slug)
+            else:
+                return JSONResponse(status=400, reason="a graph is required to stream resources as %s" % format)
+        except (ValueError, models.GraphModel.DoesNotExist):
+            return JSONResponse(status=404, reason="graph not found")
+
+        exporter = ResourceExporter(format=format)
+        restricted_resourceids = get_restricted_instances(request.user, SearchEngineFactory().create())
+        file_name, stream = exporter.writer.stream_resources(graph.pk, user=request.user, exclude=restricted_resourceids)
+        content_type = {"nt": "application/n-triples", "nquads": "application/n-quads", "ndjson-ld": "application/x-ndjson"}[format]
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response["Content-Disposition"] = 'attachment; filename="%s"' % file_name
+        return response
+
     def put(self, request, resourceid, slug=None, graphid=None):
         try:
             indent = int(request.PUT.get("indent", None))
@@ -1450,6 +1539,69 @@ class BulkDisambiguatedResourceInstance(APIBase):
         )
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class BulkResources(APIBase):
+    """
+    Returns the label based json of up to settings.API_MAX_BULK_RESOURCES resources at once, streamed as a json array
+
+    The ids of the resources are passed either as a comma separated "resource_ids" query parameter
+    or as a "resource_ids" list in a json request body
+
+    """
+
+    def get(self, request):
+        resource_ids = [resource_id.strip() for resource_id in request.GET.get("resource_ids", "").split(",") if resource_id.strip()]
+        return self.get_resources(request, resource_ids)
+
+    def post(self, request):
+        try:
+            resource_ids = JSONDeserializer().deserialize(request.body).get("resource_ids", [])
+        except (ValueError, AttributeError):
+            return JSONResponse(status=400, reason="the request body must be a json object with a list of resource_ids")
+        return self.get_resources(request, resource_ids)
+
+    def get_resources(self, request, resource_ids):
+        if not request.user.is_authenticated or request.user.username == "anonymous":
+            return JSONResponse(status=403)
+        if len(resource_ids) > settings.API_MAX_BULK_RESOURCES:
+            return JSONResponse(status=400, reason="no more than %s resources can be requested at once" % settings.API_MAX_BULK_RESOURCES)
+        try:
+            resource_ids = [uuid.UUID(str(resource_id)) for resource_id in resource_ids]
+        except ValueError:
+            return JSONResponse(status=400, reason="invalid resource id")
+
+        compact = bool(request.GET.get("compact", "true").lower() == "true")  # default True
+        hide_empty_nodes = bool(request.GET.get("hide_empty_nodes", "false").lower() == "true")  # default False
+        hide_hidden_nodes = bool(request.GET.get("hidden", "true").lower() == "false")
+
+        resources = list(Resource.objects.filter(pk__in=resource_ids))
+        if not request.user.is_superuser:
+            restrictions = get_restricted_users__bulk(resources)
+            resources = [
+                resource
+                for resource in resources
+                if request.user.id not in restrictions[str(resource.pk)]["cannot_read"]
+                and request.user.id not in restrictions[str(resource.pk)]["no_access"]
+            ]
+
+        def stream():
+            yield "["
+            for i, resource_graph in enumerate(
+                LabelBasedGraph.iter_resources(
+                    resources,
+                    compact=compact,
+                    hide_empty_nodes=hide_empty_nodes,
+                    user=request.user,
+                    perm="read_nodegroup",
+                    hide_hidden_nodes=hide_hidden_nodes,
+                )
+            ):
+                yield ("," if i > 0 else "") + JSONSerializer().serialize(resource_graph)
+            yield "]"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class Tile(APIBase):
     def get(self, request, tileid):
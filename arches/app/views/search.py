@@ -23,7 +23,6 @@ import os
 import json
 from django.contrib.auth import authenticate
 from django.contrib.gis.geos import GEOSGeometry
-from django.core.cache import cache
 from django.db import connection
 from django.http import HttpResponseNotFound
 from django.shortcuts import render
@@ -456,10 +455,7 @@ def _get_child_concepts(conceptid):
 
 def time_wheel_config(request):
     time_wheel = TimeWheel()
-    key = "time_wheel_config_{0}".format(request.user.username)
-    config = cache.get(key)
-    if config is None:
-        config = time_wheel.time_wheel_config(request.user)
+    config = time_wheel.time_wheel_config(request.user)
     return JSONResponse(config, indent=4)
 
 
@@ -20,9 +20,10 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import uuid
 import logging
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from arches.app.models.system_settings import settings
 from arches.app.search.base_index import get_index
+from arches.app.search.search import BulkIndexStats
 from arches.app.search.mappings import (
     prepare_terms_index,
     prepare_concepts_index,
@@ -56,6 +57,7 @@ class Command(BaseCommand):
                 "index_resources",
                 "index_resources_by_type",
                 "index_resources_by_transaction",
+                "index_changed_resources",
                 "add_index",
                 "delete_index",
             ],
@@ -68,6 +70,7 @@ class Command(BaseCommand):
             + "'index_resources'=Indexes all resources from the database"
             + "'index_resources_by_type'=Indexes only resources of a given resource_model/graph"
             + "'index_resources_by_transaction'=Indexes only resources of a given transaction"
+            + "'index_changed_resources'=Indexes only resources edited (and removes resources deleted) since the last index run"
             + "'add_index'=Register a new index in Elasticsearch"
             + "'delete_index'=Deletes a named index from Elasticsearch",
         )
@@ -148,6 +151,9 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # counts the resources and terms indexed by any of the operations below
+        stats = BulkIndexStats()
+
         if options["operation"] == "setup_indexes":
             self.setup_indexes(name=options["name"])
 
@@ -168,6 +174,7 @@ class Command(BaseCommand):
                 quiet=options["quiet"],
                 use_multiprocessing=options["use_multiprocessing"],
                 max_subprocesses=options["max_subprocesses"],
+                stats=stats,
             )
 
         if options["operation"] == "reindex_database":
@@ -177,6 +184,7 @@ class Command(BaseCommand):
                 quiet=options["quiet"],
                 use_multiprocessing=options["use_multiprocessing"],
                 max_subprocesses=options["max_subprocesses"],
+                stats=stats,
             )
 
         if options["operation"] == "index_concepts":
@@ -189,6 +197,7 @@ class Command(BaseCommand):
                 quiet=options["quiet"],
                 use_multiprocessing=options["use_multiprocessing"],
                 max_subprocesses=options["max_subprocesses"],
+                stats=stats,
             )
 
         if options["operation"] == "index_resources_by_type":
@@ -199,6 +208,7 @@ class Command(BaseCommand):
                 quiet=options["quiet"],
                 use_multiprocessing=options["use_multiprocessing"],
                 max_subprocesses=options["max_subprocesses"],
+                stats=stats,
             )
 
         if options["operation"] == "index_resources_by_transaction":
@@ -212,8 +222,21 @@ class Command(BaseCommand):
                 quiet=options["quiet"],
                 use_multiprocessing=options["use_multiprocessing"],
                 max_subprocesses=options["max_subprocesses"],
+                stats=stats,
             )
 
+        if options["operation"] == "index_changed_resources":
+            index_database_util.index_changed_resources(
+                batch_size=options["batch_size"],
+                quiet=options["quiet"],
+                use_multiprocessing=options["use_multiprocessing"],
+                max_subprocesses=options["max_subprocesses"],
+                stats=stats,
+            )
+
+        if len(stats.failures) > 0:
+            raise CommandError("%i document(s) failed to index: %s" % (len(stats.failures), stats))
+
     def register_index(self, name):
         es_index = get_index(name)
         es_index.prepare_index()
@@ -222,7 +245,9 @@ class Command(BaseCommand):
         es_index = get_index(name)
         es_index.delete_index()
 
-    def index_database(self, batch_size, clear_index=True, name=None, quiet=False, use_multiprocessing=False, max_subprocesses=0):
+    def index_database(
+        self, batch_size, clear_index=True, name=None, quiet=False, use_multiprocessing=False, max_subprocesses=0, stats=None
+    ):
         if name is not None:
             index_database_util.index_custom_indexes(
                 index_name=name,
@@ -239,6 +264,7 @@ class Command(BaseCommand):
                 quiet=quiet,
                 use_multiprocessing=use_multiprocessing,
                 max_subprocesses=max_subprocesses,
+                stats=stats,
             )
 
     def reindex_database(
@@ -248,6 +274,7 @@ class Command(BaseCommand):
         quiet=False,
         use_multiprocessing=False,
         max_subprocesses=0,
+        stats=None,
     ):
         self.delete_indexes(name=name)
         self.setup_indexes(name=name)
@@ -258,6 +285,7 @@ class Command(BaseCommand):
             quiet=quiet,
             use_multiprocessing=use_multiprocessing,
             max_subprocesses=max_subprocesses,
+            stats=stats,
         )
 
     def setup_indexes(self, name=None):
@@ -18,17 +18,23 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
 import json
+import math
 import time
+import datetime
+import multiprocessing
 
 from arches.app.models import models as archesmodels
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, connections, transaction
+from arches.app.etl_modules.base_import_module import copy_models
 from arches.app.models.resource import Resource
 from arches.app.utils.data_management.resources.formats.rdffile import JsonLdReader
+from arches.app.utils.data_management.resources.jsonld_worker import init_reader_worker, read_resource
 from arches.app.models.models import TileModel
 from arches.app.datatypes.datatypes import DataTypeFactory
 from arches.app.search.search_engine_factory import SearchEngineInstance
 from arches.app.utils.betterJSONSerializer import JSONSerializer
+from arches.app.utils.permission_backend import get_restricted_users__bulk
 from arches.app.models.system_settings import settings
 
 
@@ -86,6 +92,24 @@ class Command(BaseCommand):
 
         parser.add_argument("--fast", default=0, action="store", type=int, dest="fast", help="Use bulk_save to store n records at a time")
 
+        parser.add_argument(
+            "--processes",
+            default=0,
+            type=int,
+            action="store",
+            dest="processes",
+            help="In fast mode, read records across a pool of n subprocesses",
+        )
+
+        parser.add_argument(
+            "--index-threads",
+            default=4,
+            type=int,
+            action="store",
+            dest="index_threads",
+            help="In fast mode, the number of bulk requests sent to Elasticsearch at once",
+        )
+
         parser.add_argument("-q", "--quiet", default=False, action="store_true", dest="quiet", help="Don't announce every record")
 
         parser.add_argument(
@@ -131,9 +155,34 @@ class Command(BaseCommand):
         if options["strip_search"] and not options["fast"]:
             print("ERROR: stripping fields not exposed to advanced search only works in fast mode")
             return
+        if options["processes"] and not options["fast"]:
+            print("ERROR: reading records in parallel only works in fast mode")
+            return
 
         self.resources = []
-        self.load_resources(options)
+        self.pending = []
+        self.pool = None
+        self.existing_resourceids = set()
+        self.checked_resourceids = set()
+        if options["processes"]:
+            try:
+                multiprocessing.set_start_method("spawn")
+            except:
+                pass
+            self.process_count = min(options["processes"], multiprocessing.cpu_count())
+            print(f"Reading records across {self.process_count} subprocesses")
+            if multiprocessing.get_start_method() == "fork":
+                # forked subprocesses would otherwise share the parent's database connections
+                connections.close_all()
+            self.pool = multiprocessing.Pool(
+                processes=self.process_count, initializer=init_reader_worker, initargs=(connection.settings_dict["NAME"],)
+            )
+        try:
+            self.load_resources(options)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
 
     def load_resources(self, options):
 
@@ -198,6 +247,7 @@ class Command(BaseCommand):
                 for b in blocks:
                     files = os.listdir(f"{source}/{m}/{b}")
                     files.sort()
+                    self.prefetch_existing_resourceids(files, options["suffix"])
                     for f in files:
                         if not f.endswith(options["suffix"]):
                             continue
@@ -243,6 +293,7 @@ class Command(BaseCommand):
                                         reload=options["force"],
                                         quiet=options["quiet"],
                                         strip_search=options["strip_search"],
+                                        options=options,
                                     )
                                 else:
                                     l = self.import_resource(uu, graphid, jsdata, reload=options["force"], quiet=options["quiet"])
@@ -260,15 +311,35 @@ class Command(BaseCommand):
                 break
             except:
                 raise
-        if options["fast"] and self.resources:
-            self.save_resources()
-            self.index_resources(options["strip_search"])
-            self.resources = []
+        if options["fast"] and (self.resources or self.pending):
+            self.flush_resources(options)
         print(f"Total Time: seen {seen} / loaded {loaded} in {time.time()-start} seconds")
 
-    def fast_import_resource(self, resourceid, graphid, data, n=1000, reload="ignore", quiet=True, strip_search=False):
-        try:
-            resource_instance = Resource.objects.get(pk=resourceid)
+    def prefetch_existing_resourceids(self, files, suffix):
+        """
+        Finds which of the records in a block (named by their resourceid) have already been loaded with a single query
+
+        """
+
+        resourceids = []
+        for f in files:
+            uu = f.replace(f".{suffix}", "")
+            if len(uu) == 36 and uu[8] == "-":
+                resourceids.append(uu)
+        self.checked_resourceids = set(resourceids)
+        self.existing_resourceids = {
+            str(resourceid)
+            for resourceid in archesmodels.ResourceInstance.objects.filter(pk__in=resourceids).values_list("resourceinstanceid", flat=True)
+        }
+
+    def resource_exists(self, resourceid):
+        if resourceid in self.checked_resourceids:
+            return resourceid in self.existing_resourceids
+        # the record's file wasn't named by its resourceid
+        return archesmodels.ResourceInstance.objects.filter(pk=resourceid).exists()
+
+    def fast_import_resource(self, resourceid, graphid, data, n=1000, reload="ignore", quiet=True, strip_search=False, options=None):
+        if self.resource_exists(resourceid):
             if reload == "ignore":
                 if not quiet:
                     print(f" ... already loaded")
@@ -277,26 +348,39 @@ class Command(BaseCommand):
                 print(f"*** Record exists for {resourceid}, and -ow is error")
                 raise FileExistsError(resourceid)
             else:
-                resource_instance.delete()
-        except archesmodels.ResourceInstance.DoesNotExist:
-            # thrown when resource doesn't exist
-            pass
-        try:
-            self.reader.read_resource(data, resourceid=resourceid, graphid=graphid)
-            self.resources.extend(self.reader.resources)
-        except:
-            print(f"Exception raised while reading {resourceid}...")
-            raise
-        if len(self.resources) >= n:
-            self.save_resources()
-            self.index_resources(strip_search)
-            self.resources = []
+                Resource.objects.get(pk=resourceid).delete()
+        if self.pool is not None:
+            # read in a subprocess when the batch is flushed
+            self.pending.append((resourceid, graphid, data, options["verbosity"], options["ignore_errors"]))
+        else:
+            try:
+                self.reader.read_resource(data, resourceid=resourceid, graphid=graphid)
+                self.resources.extend(self.reader.resources)
+            except:
+                print(f"Exception raised while reading {resourceid}...")
+                raise
+        if len(self.resources) + len(self.pending) >= n:
+            self.flush_resources(options)
         return 1
 
+    def flush_resources(self, options):
+        if self.pending:
+            chunksize = max(1, math.ceil(len(self.pending) / (self.process_count * 4)))
+            for resourceid, resources, error in self.pool.imap(read_resource, self.pending, chunksize=chunksize):
+                if error is not None:
+                    print(f"*** Failed to load {resourceid}:\n     {error}\n")
+                    if not options["ignore_errors"]:
+                        raise Exception(error)
+                self.resources.extend(resources)
+            self.pending = []
+        if self.resources:
+            self.save_resources()
+            self.index_resources(options["strip_search"], options["index_threads"])
+        self.resources = []
+
     def import_resource(self, resourceid, graphid, data, reload="ignore", quiet=False):
         with transaction.atomic():
-            try:
-                resource_instance = Resource.objects.get(pk=resourceid)
+            if self.resource_exists(resourceid):
                 if reload == "ignore":
                     if not quiet:
                         print(f" ... already loaded")
@@ -305,10 +389,7 @@ class Command(BaseCommand):
                     print(f"*** Record exists for {resourceid}, and -ow is error")
                     raise FileExistsError(resourceid)
                 else:
-                    resource_instance.delete()
-            except archesmodels.ResourceInstance.DoesNotExist:
-                # thrown when resource doesn't exist
-                pass
+                    Resource.objects.get(pk=resourceid).delete()
 
             try:
                 self.reader.read_resource(data, resourceid=resourceid, graphid=graphid)
@@ -326,31 +407,54 @@ class Command(BaseCommand):
         for resource in self.resources:
             resource.tiles = resource.get_flattened_tiles()
             tiles.extend(resource.tiles)
-        Resource.objects.bulk_create(self.resources)
-        TileModel.objects.bulk_create(tiles)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                copy_models(cursor, archesmodels.ResourceInstance, self.resources)
+                copy_models(cursor, TileModel, tiles)
         for t in tiles:
             for nodeid in t.data.keys():
                 datatype = self.node_info[nodeid]["datatype"]
                 datatype.pre_tile_save(t, nodeid)
-        for resource in self.resources:
-            resource.save_edit(edit_type="create")
+        timestamp = datetime.datetime.now()
+        archesmodels.EditLog.objects.bulk_create(
+            [
+                archesmodels.EditLog(
+                    resourceclassid=resource.graph_id,
+                    resourceinstanceid=resource.resourceinstanceid,
+                    userid="",
+                    user_email="",
+                    user_firstname="",
+                    user_lastname="",
+                    note="",
+                    timestamp=timestamp,
+                    edittype="create",
+                )
+                for resource in self.resources
+            ]
+        )
 
-    def index_resources(self, strip_search=False):
+    def index_resources(self, strip_search=False, index_threads=4):
         se = SearchEngineInstance
         documents = []
         term_list = []
+        Resource.get_descriptors__bulk(self.resources)
+        restricted_users = get_restricted_users__bulk(self.resources)
         for resource in self.resources:
             if strip_search:
                 document, terms = monkey_get_documents_to_index(resource, node_info=self.node_info)
             else:
                 document, terms = resource.get_documents_to_index(
-                    fetchTiles=False, datatype_factory=self.datatype_factory, node_datatypes=self.node_datatypes
+                    fetchTiles=False,
+                    datatype_factory=self.datatype_factory,
+                    node_datatypes=self.node_datatypes,
+                    fetchDescriptors=False,
+                    restrictions=restricted_users[str(resource.pk)],
                 )
             documents.append(se.create_bulk_item(index="resources", id=document["resourceinstanceid"], data=document))
             for term in terms:
                 term_list.append(se.create_bulk_item(index="terms", id=term["_id"], data=term["_source"]))
-        se.bulk_index(documents)
-        se.bulk_index(term_list)
+        se.parallel_bulk_index(documents, thread_count=index_threads)
+        se.parallel_bulk_index(term_list, thread_count=index_threads)
 
 
 def monkey_get_documents_to_index(self, node_info):
@@ -1015,26 +1015,37 @@ class Command(BaseCommand):
                     resource_exporter = ResourceExporter(
                         file_format, configs=config_file, single_file=single_file
                     )  # New exporter needed for each graphid, else previous data is appended with each subsequent graph
-                    data = resource_exporter.export(graph_id=graphid, resourceinstanceids=None)
-                    for file in data:
-                        with open(
-                            os.path.join(
-                                data_dest,
-                                "".join(char if (char.isalnum() or char in safe_characters) else "-" for char in file["name"]).rstrip(),
-                            ),
-                            "w",
-                        ) as f:
-                            if file_format == "tilexl":
-                                file["outputfile"].save(os.path.join(data_dest, file["name"]))
-                            else:
-                                file["outputfile"].seek(0)
-                                shutil.copyfileobj(file["outputfile"], f, 16 * 1024)
+                    data = None
+                    if not resource_exporter.writer.can_stream():
+                        data = resource_exporter.export(graph_id=graphid, resourceinstanceids=None)
                 except KeyError:
                     utils.print_message("{0} is not a valid export file format.".format(file_format))
                     sys.exit()
                 except MissingConfigException:
                     utils.print_message("No mapping file specified. Please rerun this command with the '-c' parameter populated.")
                     sys.exit()
+
+                if data is None:
+                    # write rdf one resource at a time rather than building the rdf of the whole graph in memory
+                    file_name, stream = resource_exporter.writer.stream_resources(graphid)
+                    file_name = "".join(char if (char.isalnum() or char in safe_characters) else "-" for char in file_name).rstrip()
+                    with open(os.path.join(data_dest, file_name), "w") as f:
+                        for chunk in stream:
+                            f.write(chunk)
+                    continue
+                for file in data:
+                    with open(
+                        os.path.join(
+                            data_dest,
+                            "".join(char if (char.isalnum() or char in safe_characters) else "-" for char in file["name"]).rstrip(),
+                        ),
+                        "w",
+                    ) as f:
+                        if file_format == "tilexl":
+                            file["outputfile"].save(os.path.join(data_dest, file["name"]))
+                        else:
+                            file["outputfile"].seek(0)
+                            shutil.copyfileobj(file["outputfile"], f, 16 * 1024)
         else:
             utils.print_message(
                 "The destination is unspecified or invalid. Please rerun this command with the '-d' parameter populated with a valid path."
@@ -96,8 +96,10 @@ RESOURCE_FORMATTERS = {
     "xml": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
     "pretty-xml": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
     "json-ld": "arches.app.utils.data_management.resources.formats.rdffile.JsonLdWriter",
+    "ndjson-ld": "arches.app.utils.data_management.resources.formats.rdffile.JsonLdWriter",
     "n3": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
     "nt": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
+    "nquads": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
     "trix": "arches.app.utils.data_management.resources.formats.rdffile.RdfWriter",
     "html": "arches.app.utils.data_management.resources.formats.htmlfile.HtmlWriter",
 }
@@ -482,8 +484,13 @@ DEFAULT_RESOURCE_IMPORT_USER = {"username": "admin", "userid": 1}
 #   }
 TIMEWHEEL_DATE_TIERS = None
 
-# Identify the usernames and duration (seconds) for which you want to cache the timewheel
-CACHE_BY_USER = {"anonymous": 3600 * 24}
+# The duration (seconds) for which the timewheel of each set of permitted nodegroups is cached
+# (a cached timewheel is also discarded as soon as resources are indexed)
+TIMEWHEEL_CACHE_TIMEOUT = 3600 * 24
+
+# The cache the timewheels and their version are kept in. It should be a cache shared by all web and celery
+# processes so that indexing resources in one process discards the timewheels cached by the others.
+TIMEWHEEL_CACHE = "user_permission"
 
 BYPASS_UNIQUE_CONSTRAINT_TILE_VALIDATION = False
 BYPASS_REQUIRED_VALUE_TILE_VALIDATION = False
@@ -509,6 +516,9 @@ DATE_FORMATS = {
 
 API_MAX_PAGE_SIZE = 500
 
+# The maximum number of resources that can be requested at once from the bulk resources api
+API_MAX_BULK_RESOURCES = 500
+
 UUID_REGEX = "[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
 
 OAUTH2_PROVIDER = {"ACCESS_TOKEN_EXPIRE_SECONDS": 604800}  # one week
@@ -530,6 +540,11 @@ SEARCH_EXPORT_IMMEDIATE_DOWNLOAD_THRESHOLD = 2000  # The maximum number of insta
 # The maximum number of instances a user can download using HTML format from search export without celery
 SEARCH_EXPORT_IMMEDIATE_DOWNLOAD_THRESHOLD_HTML_FORMAT = 10
 
+# search exports page through results this many instances at a time, writing each page out before fetching the next
+SEARCH_EXPORT_PAGE_SIZE = 1000
+# export files smaller than this (in bytes) are kept in memory, larger ones are written to a temporary file on disk
+SEARCH_EXPORT_SPOOL_SIZE = 10 * 1024 * 1024
+
 RELATED_RESOURCES_PER_PAGE = 15
 RELATED_RESOURCES_EXPORT_LIMIT = 10000
 SEARCH_DROPDOWN_LENGTH = 100
@@ -655,6 +670,14 @@ TILE_CACHE_TIMEOUT = 600  # seconds
 CLUSTER_DISTANCE_MAX = 5000  # meters
 GRAPH_MODEL_CACHE_TIMEOUT = None  # seconds * hours * days = ~1mo
 
+# The cache used to share the graph metadata version (node datatypes, root ontology classes, functions, etc...)
+# between processes. It should be a cache shared by all web and celery processes so that saving a graph
+# in one process invalidates the metadata cached by the others.
+GRAPH_METADATA_CACHE = "user_permission"
+
+# The number of concept values (eg: the labels shown in reports and exports) each process keeps in memory
+CONCEPT_VALUE_CACHE_SIZE = 10000
+
 CANTALOUPE_DIR = os.path.join(ROOT_DIR, "uploadedfiles")
 CANTALOUPE_HTTP_ENDPOINT = "http://localhost:8182/"
 
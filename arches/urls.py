@@ -251,6 +251,7 @@ urlpatterns = [
         api.BulkDisambiguatedResourceInstance.as_view(),
         name="api_bulk_disambiguated_resource_instance",
     ),
+    url(r"^api/bulk_resources$", api.BulkResources.as_view(), name="api_bulk_resources"),
     url(r"^api/search/export_results$", api.SearchExport.as_view(), name="api_export_results"),
     url(r"^rdm/concepts/(?P<conceptid>%s|())$" % uuid_regex, api.Concepts.as_view(), name="concepts"),
     url(r"^plugins/(?P<pluginid>%s)$" % uuid_regex, PluginView.as_view(), name="plugins"),
@@ -3,6 +3,7 @@
 import os
 import json
 import csv
+from unittest import mock
 from io import BytesIO
 from tests import test_settings
 from operator import itemgetter
@@ -16,6 +17,11 @@ from arches.app.models.models import TileModel, ResourceInstance
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from arches.app.utils.data_management.resources.importer import BusinessDataImporter
 from arches.app.utils.data_management.resources.exporter import ResourceExporter as BusinessDataExporter
+from arches.app.utils.data_management.resources.formats.rdffile import JsonLdWriter, RdfWriter
+from pyld.jsonld import frame, from_rdf
+from rdflib import ConjunctiveGraph, Graph, BNode, Literal, Namespace, URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import RDF, RDFS, XSD
 from arches.app.utils.data_management.resource_graphs.importer import import_graph as ResourceGraphImporter
 
 # these tests can be run from the command line via
@@ -547,3 +553,158 @@ class JsonLDExportTests(ArchesTestCase):
         botb = 'http://www.cidoc-crm.org/cidoc-crm/P82a_begin_of_the_begin'
         self.assertTrue(tsdata[botb]['@value'] == "2019-11-01")
 
+    def get_pyld_json(self, g, resourceid, context=None):
+        # the json-ld built by serializing the graph to n-quads and having pyld parse and frame them
+        js = from_rdf(g.serialize(format="nquads").decode("utf-8"), {"format": "application/nquads", "useNativeTypes": True})
+        framing = {"@omitDefault": True, "@omitGraph": False, "@id": "http://localhost:8000/resources/%s" % resourceid}
+        if context:
+            framing["@context"] = context
+        js = frame(js, framing)
+        if "@graph" in js and len(js["@graph"]) == 1:
+            for k, v in list(js["@graph"][0].items()):
+                js[k] = v
+            del js["@graph"]
+        return js
+
+    def test_json_matches_pyld_framing(self):
+        resourceids = [
+            "e6412598-f6b5-11e9-8f09-a4d18cec433a",
+            "24d0d25a-fa75-11e9-b369-3af9d3b32b71",
+            "12bbf5bc-fa85-11e9-91b8-3af9d3b32b71",
+            "45fbd100-fb60-11e9-98e3-3af9d3b32b71",
+            "6edd753e-fbf0-11e9-9ca4-3af9d3b32b71",
+            "bbc1651a-fbf3-11e9-9ca4-3af9d3b32b71",
+            "a16ea9a4-fbf1-11e9-9ca4-3af9d3b32b71",
+            "b588fae8-fbf1-11e9-9ca4-3af9d3b32b71",
+            "7f90ff58-0722-11ea-b628-acde48001122",
+        ]
+        for resourceid in resourceids:
+            writer = JsonLdWriter()
+            writer.get_tiles(resourceinstanceids=[resourceid])
+            g = writer.get_rdf_graph()
+            js = writer.get_resource_json(g, resourceid)
+            expected = self.get_pyld_json(g, resourceid, writer.graph_model.jsonldcontext)
+            self.assertEqual(json.dumps(js, sort_keys=True), json.dumps(expected, sort_keys=True), resourceid)
+
+    def test_json_matches_pyld_framing_of_shared_and_blank_nodes(self):
+        crm = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
+        resourceid = "d8c4f0a2-1c47-4d3c-9b1e-6b9e8f3a2c10"
+        resource = URIRef("http://localhost:8000/resources/%s" % resourceid)
+        concepts = [URIRef("http://localhost:8000/concepts/%s" % i) for i in range(3)]
+        g = ConjunctiveGraph()
+        g.add((resource, RDF.type, crm.E22_Man_Made_Object))
+        for concept in concepts:
+            g.add((concept, RDF.type, crm.E55_Type))
+            g.add((concept, RDFS.label, Literal('Concept "%s"\n' % concept[-1], lang="en")))
+            g.add((resource, crm.P2_has_type, concept))
+        names = [BNode() for i in range(4)]
+        for i, name in enumerate(names):
+            g.add((resource, crm.P1_is_identified_by, name))
+            g.add((name, RDF.type, crm.E41_Appellation))
+            g.add((name, crm.P2_has_type, concepts[i % len(concepts)]))
+        g.add((names[0], RDFS.label, Literal(5)))
+        g.add((names[1], RDFS.label, Literal(-3)))
+        g.add((names[2], RDFS.label, Literal(2.5)))
+        g.add((names[3], RDFS.label, Literal("2020-01-01", datatype=XSD.date)))
+        g.add((names[3], crm.P106_is_composed_of, names[0]))
+        g.add((names[1], crm.P106_is_composed_of, BNode()))
+
+        writer = JsonLdWriter()
+        self.assertEqual(
+            json.dumps(writer.get_expanded_json(g), sort_keys=True),
+            json.dumps(
+                from_rdf(g.serialize(format="nquads").decode("utf-8"), {"format": "application/nquads", "useNativeTypes": True}),
+                sort_keys=True,
+            ),
+        )
+        for context in (None, {"crm": str(crm), "rdfs": str(RDFS)}):
+            writer.graph_model = mock.Mock(jsonldcontext=context)
+            js = writer.get_resource_json(g, resourceid)
+            self.assertEqual(json.dumps(js, sort_keys=True), json.dumps(self.get_pyld_json(g, resourceid, context), sort_keys=True))
+
+    def test_json_of_a_tree_is_framed_without_pyld(self):
+        crm = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
+        resourceid = "5f0e1c7a-3d2b-4b8e-9a61-0c4d7e2f8b93"
+        resource = URIRef("http://localhost:8000/resources/%s" % resourceid)
+        tile_node = "http://localhost:8000/tile/7a1d3c2e-8f4b-4e6a-b0c9-2d5f1e3a4b6c/node/%s"
+        g = ConjunctiveGraph()
+        g.add((resource, RDF.type, crm.E22_Man_Made_Object))
+        names = [URIRef(tile_node % i) for i in range(2)]
+        for i, name in enumerate(names):
+            g.add((resource, crm.P1_is_identified_by, name))
+            g.add((name, RDF.type, crm.E41_Appellation))
+            g.add((name, RDF.type, crm.E33_Linguistic_Object))
+            g.add((name, RDFS.label, Literal("Name %s" % i)))
+        timespan = URIRef(tile_node % "timespan")
+        g.add((names[0], crm.P4_has_time_span, timespan))
+        g.add((timespan, RDF.type, crm["E52_Time-Span"]))
+        g.add((timespan, crm.P82a_begin_of_the_begin, Literal("2019-11-01", datatype=XSD.dateTime)))
+        g.add((timespan, RDFS.label, Literal("November", lang="en")))
+        g.add((timespan, crm.P3_has_note, Literal(True)))
+        g.add((timespan, crm.P2_has_type, URIRef("http://localhost:8000/concepts/1")))
+        g.add((names[1], crm.P2_has_type, URIRef("http://localhost:8000/concepts/1")))
+
+        writer = JsonLdWriter()
+        writer.graph_model = mock.Mock(jsonldcontext=None)
+        with mock.patch("arches.app.utils.data_management.resources.formats.rdffile.frame") as pyld_frame:
+            js = writer.get_resource_json(g, resourceid)
+        pyld_frame.assert_not_called()
+        self.assertEqual(json.dumps(js, sort_keys=True), json.dumps(self.get_pyld_json(g, resourceid), sort_keys=True))
+
+    def test_only_line_based_formats_are_streamed(self):
+        streamed_formats = [
+            format for format in ("xml", "pretty-xml", "n3", "nt", "nquads", "trix") if RdfWriter(format=format).can_stream()
+        ]
+        self.assertEqual(streamed_formats, ["nt", "nquads"])
+        self.assertFalse(JsonLdWriter(format="json-ld").can_stream())
+        self.assertTrue(JsonLdWriter(format="ndjson-ld").can_stream())
+        with self.assertRaises(ValueError):
+            RdfWriter(format="xml").stream_resources("e6412598-f6b5-11e9-8f09-a4d18cec433a")
+
+    def test_resource_tiles_are_chunked_by_resourceinstanceid(self):
+        graphid = "ee72fb1e-fa6c-11e9-b369-3af9d3b32b71"
+        writer = RdfWriter(format="nt")
+        expected = {}
+        for tile in TileModel.objects.filter(resourceinstance__graph_id=graphid):
+            expected.setdefault(tile.resourceinstance_id, set()).add(tile.pk)
+        self.assertTrue(len(expected) > 3)
+
+        for chunk_size in (1, 3, 500):
+            with self.subTest(chunk_size=chunk_size):
+                resource_tiles = list(writer.iter_resource_tiles(graphid, chunk_size=chunk_size))
+                resourceids = [resourceid for resourceid, tiles in resource_tiles]
+                self.assertEqual(resourceids, sorted(expected.keys()))
+                for resourceid, tiles in resource_tiles:
+                    self.assertEqual({tile.pk for tile in tiles}, expected[resourceid])
+
+        excluded = sorted(expected.keys())[1]
+        resourceids = [resourceid for resourceid, tiles in writer.iter_resource_tiles(graphid, chunk_size=1, exclude=[str(excluded)])]
+        self.assertEqual(resourceids, [resourceid for resourceid in sorted(expected.keys()) if resourceid != excluded])
+
+    def test_streamed_ndjson_ld_matches_the_json_ld_of_each_resource(self):
+        graphid = "ee72fb1e-fa6c-11e9-b369-3af9d3b32b71"
+        file_name, stream = JsonLdWriter(format="ndjson-ld").stream_resources(graphid, chunk_size=3)
+        lines = list(stream)
+        self.assertTrue(file_name.endswith(".ndjson"))
+        self.assertEqual(len(lines), 4)
+
+        for line in lines:
+            self.assertTrue(line.endswith("\n"))
+            self.assertEqual(line.count("\n"), 1)
+            js = json.loads(line)
+            resourceid = js["@id"].rstrip("/").split("/")[-1]
+            expected = JsonLdWriter(format="json-ld").build_json(graph_id=graphid, resourceinstanceids=[resourceid])
+            self.assertEqual(json.dumps(js, sort_keys=True), json.dumps(expected, sort_keys=True))
+
+    def test_streamed_n_triples_match_the_rdf_of_the_graph(self):
+        graphid = "ee72fb1e-fa6c-11e9-b369-3af9d3b32b71"
+        file_name, stream = RdfWriter(format="nt").stream_resources(graphid, chunk_size=3)
+        self.assertTrue(file_name.endswith(".rdf"))
+        streamed = Graph()
+        streamed.parse(data="".join(stream), format="nt")
+
+        writer = RdfWriter(format="nt")
+        writer.write_resources(graph_id=graphid)
+        expected = writer.get_rdf_graph()
+        self.assertEqual(len(streamed), len(expected))
+        self.assertTrue(isomorphic(streamed, expected))
@@ -0,0 +1,124 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import csv
+import io
+import os
+import uuid
+from django.db import connection
+from tests.base_test import ArchesTestCase
+from arches.app.etl_modules.import_single_csv import ImportSingleCsv
+from arches.app.models import models
+from arches.app.utils.betterJSONSerializer import JSONDeserializer
+from arches.app.utils.data_management.resource_graphs.importer import import_graph as resource_graph_importer
+
+# these tests can be run from the command line via
+# python manage.py test tests/importer/import_single_csv_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+SINGLE_CSV_MODULE_ID = "0a0cea7e-b59a-431a-93d8-e9f8c41bdd6b"
+STAGING_COLUMNS = (
+    "nodegroupid, legacyid, resourceid, tileid, parenttileid, value, nodegroup_depth, source_description, passes_validation, error_message"
+)
+
+
+class ImportSingleCsvTests(ArchesTestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join("tests/fixtures/resource_graphs/Resource Test Model.json"), "rU") as f:
+            archesfile = JSONDeserializer().deserialize(f)
+        resource_graph_importer(archesfile["graph"])
+        cls.graphid = "c9b37a14-17b3-11eb-a708-acde48001122"
+        cls.name_nodeid = "c9b37b7c-17b3-11eb-a708-acde48001122"
+        cls.sensitive_info_nodeid = "c9b38aea-17b3-11eb-a708-acde48001122"
+
+    @classmethod
+    def tearDownClass(cls):
+        models.GraphModel.objects.filter(pk=cls.graphid).delete()
+
+    def create_load_event(self):
+        return models.LoadEvent.objects.create(user_id=1, etl_module_id=SINGLE_CSV_MODULE_ID, status="running").pk
+
+    def get_staging(self, loadid):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {STAGING_COLUMNS} FROM load_staging WHERE loadid = %s ORDER BY tileid", [loadid])
+            return cursor.fetchall()
+
+    def test_copy_to_load_staging_matches_insert(self):
+        models.Node.objects.filter(pk=self.name_nodeid).update(alias="name")
+        models.Node.objects.filter(pk=self.sensitive_info_nodeid).update(alias="sensitive_info")
+        resourceid = str(uuid.uuid4())
+        csv_file = io.StringIO(
+            'id,name,sensitive_info\r\nlegacy-1,"a tab\there","a new line\nand a \\ backslash"\r\n{0},"C:\\temp\\new",\r\n'.format(
+                resourceid
+            )
+        )
+        reader = csv.DictReader(csv_file)
+        importer = ImportSingleCsv()
+        column_lookup = importer.get_column_lookup(self.graphid, reader.fieldnames, "id", "uploadedfiles/tmp/test")
+        staging_rows = []
+        for row in reader:
+            staging_rows.extend(importer.get_staging_rows(row, column_lookup, None, "test.csv", "id"))
+
+        copied_loadid = self.create_load_event()
+        inserted_loadid = self.create_load_event()
+        with connection.cursor() as cursor:
+            importer.copy_to_load_staging(cursor, [dict(row, loadid=copied_loadid) for row in staging_rows])
+            # the insert the staging rows used to be written with, one statement per row
+            for row in staging_rows:
+                cursor.execute(
+                    """
+                    INSERT INTO load_staging (
+                        nodegroupid,
+                        legacyid,
+                        resourceid,
+                        tileid,
+                        value,
+                        loadid,
+                        nodegroup_depth,
+                        source_description,
+                        passes_validation
+                    ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+                    (
+                        row["nodegroupid"],
+                        row["legacyid"],
+                        row["resourceid"],
+                        row["tileid"],
+                        row["value"],
+                        inserted_loadid,
+                        row["nodegroup_depth"],
+                        row["source_description"],
+                        row["passes_validation"],
+                    ),
+                )
+
+        copied = self.get_staging(copied_loadid)
+        self.assertEqual(len(copied), 4)
+        self.assertEqual(copied, self.get_staging(inserted_loadid))
+
+        values = {}
+        for nodegroupid, legacyid, staged_resourceid, tileid, parenttileid, value, *rest in copied:
+            values[(legacyid or str(staged_resourceid), str(nodegroupid))] = value[str(nodegroupid)]["source"]
+        self.assertEqual(
+            values,
+            {
+                ("legacy-1", self.name_nodeid): "a tab\there",
+                ("legacy-1", self.sensitive_info_nodeid): "a new line\nand a \\ backslash",
+                (resourceid, self.name_nodeid): "C:\\temp\\new",
+                (resourceid, self.sensitive_info_nodeid): "",
+            },
+        )
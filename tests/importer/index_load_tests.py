@@ -0,0 +1,134 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+from unittest import mock
+from tests.base_test import ArchesTestCase
+from arches.app import tasks
+from arches.app.etl_modules.base_import_module import BaseImportModule
+from arches.app.models import models
+from arches.app.models.system_settings import settings
+from arches.app.search.base_index import SearchIndexError
+from arches.app.search.mappings import RESOURCES_INDEX
+from arches.app.search.search import BulkIndexStats
+from arches.app.search.search_engine_factory import SearchEngineFactory
+from arches.app.utils import index_database
+from arches.app.utils.betterJSONSerializer import JSONDeserializer
+from arches.app.utils.data_management.resource_graphs.importer import import_graph as resource_graph_importer
+from arches.celery import app
+
+# these tests can be run from the command line via
+# python manage.py test tests/importer/index_load_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+SINGLE_CSV_MODULE_ID = "0a0cea7e-b59a-431a-93d8-e9f8c41bdd6b"
+
+
+def index_with_failures(*args, **kwargs):
+    stats = BulkIndexStats()
+    stats.add_failures([{"_index": RESOURCES_INDEX, "_id": "1", "status": 400, "error": "mapper_parsing_exception"}])
+    return stats
+
+
+class IndexLoadTests(ArchesTestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join("tests/fixtures/resource_graphs/Resource Test Model.json"), "rU") as f:
+            archesfile = JSONDeserializer().deserialize(f)
+        resource_graph_importer(archesfile["graph"])
+        cls.graphid = "c9b37a14-17b3-11eb-a708-acde48001122"
+
+    @classmethod
+    def tearDownClass(cls):
+        models.GraphModel.objects.filter(pk=cls.graphid).delete()
+
+    def setUp(self):
+        app.conf.update(task_always_eager=True, task_eager_propagates=False)
+        self.se = SearchEngineFactory().create()
+        self.load_event = models.LoadEvent.objects.create(user_id=1, etl_module_id=SINGLE_CSV_MODULE_ID, status="validated")
+        self.resourceids = []
+        for i in range(5):
+            resource = models.ResourceInstance.objects.create(graph_id=self.graphid)
+            models.EditLog.objects.create(
+                resourceinstanceid=str(resource.pk), resourceclassid=self.graphid, transactionid=self.load_event.pk, edittype="create"
+            )
+            self.resourceids.append(str(resource.pk))
+
+    def tearDown(self):
+        app.conf.update(task_always_eager=False, task_eager_propagates=False)
+        self.se.delete(index=RESOURCES_INDEX, body={"query": {"terms": {"resourceinstanceid": self.resourceids}}})
+
+    def get_indexed_resourceids(self):
+        self.se.refresh(index=RESOURCES_INDEX)
+        results = self.se.search(index=RESOURCES_INDEX, body={"query": {"terms": {"resourceinstanceid": self.resourceids}}, "size": 100})
+        return [hit["_id"] for hit in results["hits"]["hits"]]
+
+    def test_index_load_in_process(self):
+        with mock.patch("arches.app.utils.task_management.check_if_celery_available", return_value=False):
+            BaseImportModule().index_load(self.load_event.pk)
+
+        self.load_event.refresh_from_db()
+        self.assertEqual(self.load_event.status, "indexed")
+        self.assertTrue(self.load_event.complete)
+        self.assertTrue(self.load_event.successful)
+        self.assertEqual(self.load_event.load_details["indexing"]["total"], 5)
+        self.assertEqual(self.load_event.load_details["indexing"]["indexed"], 5)
+        self.assertCountEqual(self.get_indexed_resourceids(), self.resourceids)
+
+    def test_index_load_in_chunks(self):
+        with mock.patch.object(settings, "BULK_IMPORT_BATCH_SIZE", 2):
+            with mock.patch("arches.app.utils.task_management.check_if_celery_available", return_value=True):
+                with mock.patch.object(
+                    index_database, "index_resources_by_transaction", wraps=index_database.index_resources_by_transaction
+                ) as index_resources_by_transaction:
+                    BaseImportModule().index_load(self.load_event.pk)
+
+        chunks = [call.kwargs["resourceids"] for call in index_resources_by_transaction.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertCountEqual([resourceid for chunk in chunks for resourceid in chunk], self.resourceids)
+        self.load_event.refresh_from_db()
+        self.assertEqual(self.load_event.status, "indexed")
+        self.assertTrue(self.load_event.successful)
+        self.assertEqual(self.load_event.load_details["indexing"]["total"], 5)
+        self.assertEqual(self.load_event.load_details["indexing"]["indexed"], 5)
+        self.assertIsNotNone(self.load_event.load_details["indexing"]["rate"])
+        self.assertCountEqual(self.get_indexed_resourceids(), self.resourceids)
+
+    def test_index_load_in_process_failure(self):
+        with mock.patch("arches.app.utils.task_management.check_if_celery_available", return_value=False):
+            with mock.patch("arches.app.etl_modules.base_import_module.index_resources_by_transaction", side_effect=index_with_failures):
+                BaseImportModule().index_load(self.load_event.pk)
+
+        self.load_event.refresh_from_db()
+        self.assertEqual(self.load_event.status, "failed")
+        self.assertFalse(self.load_event.complete)
+
+    def test_index_load_chunk_failure(self):
+        BaseImportModule().start_indexing_progress(self.load_event.pk, len(self.resourceids))
+        with mock.patch.object(index_database, "index_resources_by_transaction", side_effect=index_with_failures):
+            result = tasks.index_load_chunk.apply(args=[str(self.load_event.pk), self.resourceids])
+
+        self.assertTrue(result.failed())
+        self.assertIsInstance(result.result, SearchIndexError)
+        self.load_event.refresh_from_db()
+        self.assertEqual(self.load_event.load_details["indexing"]["indexed"], 0)
+
+        # the error callback of the chord started by index_load
+        tasks.index_load_error.apply(args=[str(self.load_event.pk)])
+        self.load_event.refresh_from_db()
+        self.assertEqual(self.load_event.status, "failed")
+        self.assertFalse(self.load_event.complete)
@@ -3,7 +3,9 @@ import json
 import csv
 import base64
 import datetime
+import tempfile
 from io import BytesIO
+from unittest import mock
 from tests import test_settings
 from operator import itemgetter
 from django.core import management
@@ -20,6 +22,7 @@ from arches.app.utils.data_management.resources.exporter import ResourceExporter
 from arches.app.utils.data_management.resource_graphs.importer import import_graph as ResourceGraphImporter
 from arches.app.utils.data_management.resources.formats import rdffile
 from arches.app.utils.data_management.resources.formats.rdffile import JsonLdReader
+from arches.management.commands import load_jsonld
 from pyld.jsonld import expand
 
 # these tests can be run from the command line via
@@ -1319,3 +1322,24 @@ class JsonLDImportTests(ArchesTestCase):
             },
         ]
         self.assertCountEqual(actual_tiledata, expected_tiledata)
+
+    def test_load_jsonld_reads_records_across_processes(self):
+        resourceids = ["6a5c3a1e-3c5f-4c6e-9b0e-0b6cf2f1a101", "6a5c3a1e-3c5f-4c6e-9b0e-0b6cf2f1a102"]
+        with tempfile.TemporaryDirectory() as source:
+            os.makedirs(os.path.join(source, "basic", "00"))
+            for resourceid in resourceids:
+                data = {
+                    "@id": f"http://localhost:8000/resources/{resourceid}",
+                    "@type": "http://www.cidoc-crm.org/cidoc-crm/E22_Man-Made_Object",
+                    "http://www.cidoc-crm.org/cidoc-crm/P3_has_note": f"note for {resourceid}",
+                }
+                with open(os.path.join(source, "basic", "00", f"{resourceid}.json"), "w") as f:
+                    json.dump(data, f)
+
+            with mock.patch.dict(load_jsonld.graph_uuid_map, {"basic": "bf734b4e-f6b5-11e9-8f09-a4d18cec433a"}):
+                management.call_command("load_jsonld", source=source, model="basic", fast=2, processes=2, quiet=True)
+
+        for resourceid in resourceids:
+            self.assertTrue(ResourceInstance.objects.filter(pk=resourceid).exists())
+            tiledata = [list(tile.data.values()) for tile in TileModel.objects.filter(resourceinstance_id=resourceid)]
+            self.assertEqual(tiledata, [[f"note for {resourceid}"]])
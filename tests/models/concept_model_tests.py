@@ -21,6 +21,7 @@ from tests.base_test import ArchesTestCase
 from arches.app.models import models
 from arches.app.models.concept import Concept
 from arches.app.models.concept import ConceptValue
+from arches.app.datatypes.concept_types import concept_value_cache, BaseConceptDataType
 
 # these tests can be run from the command line via
 # python manage.py test tests/models/concept_model_tests.py --pattern="*.py" --settings="tests.test_settings"
@@ -163,3 +164,32 @@ class ConceptModelTests(ArchesTestCase):
         self.assertEqual(pl.type, "prefLabel")
         self.assertEqual(pl.value, "bier" or "beer")
         self.assertEqual(pl.language, "nl" or "es-SP")
+
+    def test_changed_values_are_evicted_from_the_concept_value_cache(self):
+        """
+        Test that a concept value is looked up again once it has been changed or deleted
+
+        """
+
+        concept = Concept()
+        concept.nodetype = "Concept"
+        concept.values = [ConceptValue({"type": "prefLabel", "category": "label", "value": "cached label", "language": "en-US"})]
+        concept.save()
+        valueid = str(concept.values[0].id)
+        datatype = BaseConceptDataType()
+
+        self.assertEqual(datatype.get_value(valueid).value, "cached label")
+        self.assertIn(valueid, concept_value_cache)
+        with self.assertNumQueries(0):
+            self.assertEqual(datatype.get_value(valueid).value, "cached label")
+
+        value = models.Value.objects.get(pk=valueid)
+        value.value = "changed label"
+        value.save()
+        self.assertNotIn(valueid, concept_value_cache)
+        self.assertEqual(datatype.get_value(valueid).value, "changed label")
+
+        self.assertIn(valueid, concept_value_cache)
+        models.Value.objects.filter(pk=valueid).delete()
+        self.assertNotIn(valueid, concept_value_cache)
+        self.assertEqual(datatype.get_value(valueid).value, "")
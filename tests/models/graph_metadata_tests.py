@@ -0,0 +1,97 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from django.test.utils import override_settings
+from tests.base_test import ArchesTestCase
+from arches.app.models import models
+from arches.app.models.graph_metadata import graph_metadata
+
+# these tests can be run from the command line via
+# python manage.py test tests/models/graph_metadata_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "graph_metadata_tests"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GraphMetadataTests(ArchesTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graphid = "8b6d2a36-0f4c-11ec-9b4e-acde48001122"
+        models.GraphModel.objects.create(graphid=cls.graphid, name="Graph Metadata Test", isresource=True, isactive=True)
+        cls.root = models.Node.objects.create(
+            nodeid="8b6d2d4c-0f4c-11ec-9b4e-acde48001122",
+            name="Root",
+            istopnode=True,
+            datatype="semantic",
+            graph_id=cls.graphid,
+            ontologyclass="http://www.cidoc-crm.org/cidoc-crm/E1_CRM_Entity",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        models.GraphModel.objects.filter(graphid=cls.graphid).delete()
+
+    def setUp(self):
+        graph_metadata.invalidate()
+
+    def test_node_datatypes(self):
+        self.assertEqual(graph_metadata.get_node_datatypes()[str(self.root.nodeid)], "semantic")
+
+    def test_root_ontology_class(self):
+        self.assertEqual(graph_metadata.get_root_ontology_class(self.graphid), "http://www.cidoc-crm.org/cidoc-crm/E1_CRM_Entity")
+
+    def test_node_save_invalidates_cache(self):
+        graph_metadata.get_node_datatypes()
+        node = models.Node.objects.create(name="Child", istopnode=False, datatype="string", graph_id=self.graphid)
+        self.assertEqual(graph_metadata.get_node_datatypes()[str(node.nodeid)], "string")
+
+        node.datatype = "number"
+        node.save()
+        self.assertEqual(graph_metadata.get_node_datatypes()[str(node.nodeid)], "number")
+
+        nodeid = str(node.nodeid)
+        node.delete()
+        self.assertNotIn(nodeid, graph_metadata.get_node_datatypes())
+
+    def test_cache_is_reused_between_calls(self):
+        graph_metadata.get_node_datatypes()
+        with self.assertNumQueries(0):
+            graph_metadata.get_node_datatypes()
+
+    def test_graph_edge_tree(self):
+        nodegroup = models.NodeGroup.objects.create(cardinality="n")
+        node = models.Node.objects.create(
+            nodeid=nodegroup.pk, name="Name", istopnode=False, datatype="string", graph_id=self.graphid, nodegroup=nodegroup
+        )
+        edge = models.Edge.objects.create(domainnode=self.root, rangenode=node, graph_id=self.graphid)
+
+        edge_tree = graph_metadata.get_graph_edge_tree(self.graphid)
+        self.assertEqual(edge_tree["rootedges"], [])
+        self.assertEqual(edge_tree["nodedatatypes"][str(node.nodeid)], "string")
+        self.assertEqual(edge_tree["subgraphs"][str(nodegroup.pk)]["inedge"].pk, edge.pk)
+        self.assertIsNone(edge_tree["subgraphs"][str(nodegroup.pk)]["parentnode_nodegroup"])
+        with self.assertNumQueries(0):
+            graph_metadata.get_graph_edge_tree(self.graphid)
+
+        edge.delete()
+        node.delete()
+        nodegroup.delete()
+        self.assertNotIn(str(nodegroup.pk), graph_metadata.get_graph_edge_tree(self.graphid)["subgraphs"])
@@ -0,0 +1,182 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import management
+from tests import test_settings
+from tests.base_test import ArchesTestCase
+from arches.app.models import models
+from arches.app.models.mobile_survey import MobileSurvey
+from arches.app.models.tile import Tile
+from arches.app.utils.couch import Couch
+
+# these tests can be run from the command line via
+# python manage.py test tests/models/mobile_survey_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+
+class FakeCouchDB(object):
+    """
+    Keeps the documents and attachments written to a couch database in memory
+
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.attachments = {}
+        self.updates = []
+
+    def view(self, name, keys=None, include_docs=False):
+        return [SimpleNamespace(id=key, doc=dict(self.docs[key]) if key in self.docs else None) for key in keys]
+
+    def update(self, docs):
+        self.updates.append([doc["_id"] for doc in docs])
+        results = []
+        for doc in docs:
+            revision = int(doc.get("_rev", "0-").split("-")[0]) + 1
+            doc["_rev"] = "%s-%s" % (revision, uuid.uuid4().hex)
+            self.docs[doc["_id"]] = dict(doc)
+            results.append((True, doc["_id"], doc["_rev"]))
+        return results
+
+    def put_attachment(self, doc, content, filename=None, content_type=None):
+        self.attachments.setdefault(doc["_id"], {})[filename] = content
+
+    def compact(self):
+        pass
+
+
+class FakeCouch(object):
+    """
+    Serves the docs of a couch _changes feed given as a list of (sequence, doc) tuples
+    and writes documents to an in memory database with the same bulk update used with couchdb
+
+    """
+
+    bulk_update_docs = Couch.bulk_update_docs
+
+    def __init__(self, changes=None):
+        self.changes = changes if changes is not None else []
+        self.db = FakeCouchDB()
+
+    def create_db(self, name):
+        return self.db
+
+    def delete_db(self, name):
+        pass
+
+    def changed_docs(self, db, since=None):
+        since = 0 if since is None else int(since)
+        return [doc for sequence, doc in self.changes if sequence > since], self.changes[-1][0]
+
+
+class MobileSurveySyncTests(ArchesTestCase):
+    @classmethod
+    def setUpClass(cls):
+        test_pkg_path = os.path.join(test_settings.TEST_ROOT, "fixtures", "testing_prj", "testing_prj", "pkg")
+        management.call_command("packages", operation="load_package", source=test_pkg_path, yes=True)
+
+    def setUp(self):
+        self.data_type_graphid = "330802c5-95bd-11e8-b7ac-acde48001122"
+        self.resource_instance_id = "f562c2fa-48d3-4798-a723-10209806c068"
+        self.node = models.Node.objects.filter(graph_id=self.data_type_graphid, datatype="string").first()
+        self.user_a = User.objects.create_user(username="mobile_sync_a", password="Test12345!")
+        self.user_b = User.objects.create_user(username="mobile_sync_b", password="Test12345!")
+        survey = models.MobileSurveyModel.objects.create(name="Sync Test", createdby=self.user_a, lasteditedby=self.user_a)
+        self.survey = MobileSurvey.objects.get(pk=survey.pk)
+
+    def tearDown(self):
+        self.survey.delete()
+        self.user_a.delete()
+        self.user_b.delete()
+
+    def get_tile_doc(self, user, value):
+        return {
+            "_id": str(uuid.uuid4()),
+            "_rev": "1-%s" % uuid.uuid4().hex,
+            "type": "tile",
+            "tileid": str(uuid.uuid4()),
+            "resourceinstance_id": self.resource_instance_id,
+            "nodegroup_id": str(self.node.nodegroup_id),
+            "parenttile_id": None,
+            "sortorder": 0,
+            "data": {},
+            "provisionaledits": {str(user.id): {"value": {str(self.node.pk): value}}},
+        }
+
+    def sync(self, user):
+        with mock.patch.object(Tile, "bulk_save") as bulk_save, mock.patch.object(MobileSurvey, "load_data_into_couch"):
+            synclog = self.survey.sync(userid=user.id, use_celery=False)
+        self.assertEqual(synclog.status, "FINISHED")
+        return [tile.data[str(self.node.pk)] for tile in bulk_save.call_args[0][0]]
+
+    def test_sync_applies_edits_of_each_user(self):
+        """
+        Tests that a sync doesn't move another user's changes feed checkpoint past edits they haven't synced yet
+        """
+
+        self.survey.couch = FakeCouch([(1, self.get_tile_doc(self.user_a, "edit a")), (2, self.get_tile_doc(self.user_b, "edit b"))])
+
+        self.assertEqual(self.sync(self.user_a), ["edit a"])
+        self.assertEqual(self.sync(self.user_b), ["edit b"])
+
+        self.survey.couch.changes.append((3, self.get_tile_doc(self.user_a, "edit a2")))
+        self.assertEqual(self.sync(self.user_a), ["edit a2"])
+
+    def test_load_tiles_into_couch(self):
+        """
+        Tests that the tiles of the survey's nodegroups (and their child nodegroups) are pushed in a single bulk update
+        with their attachments, and that only changed tiles are pushed again
+        """
+
+        self.survey.couch = FakeCouch()
+        db = self.survey.couch.db
+        resource = models.ResourceInstance.objects.create(graph_id=self.data_type_graphid)
+        child_nodegroup = models.NodeGroup.objects.create(parentnodegroup_id=self.node.nodegroup_id, cardinality="n")
+        other_nodes = models.Node.objects.filter(graph_id=self.data_type_graphid).exclude(nodegroup=None)
+        other_nodegroupid = other_nodes.exclude(nodegroup_id=self.node.nodegroup_id).first().nodegroup_id
+        tile = models.TileModel.objects.create(
+            resourceinstance=resource, nodegroup_id=self.node.nodegroup_id, data={str(self.node.pk): "a"}
+        )
+        child_tile = models.TileModel.objects.create(resourceinstance=resource, nodegroup=child_nodegroup, parenttile=tile, data={})
+        models.TileModel.objects.create(resourceinstance=resource, nodegroup_id=other_nodegroupid, data={})
+        file = models.File.objects.create(path="uploadedfiles/photo.jpg", tile=child_tile)
+        instances = {str(resource.pk): {"resourceinstanceid": str(resource.pk)}}
+
+        with mock.patch("arches.app.models.mobile_survey.get_thumbnail", return_value=b"thumbnail") as get_thumbnail:
+            self.survey.load_tiles_into_couch(instances, [self.node.nodegroup_id])
+
+        self.assertEqual(len(db.updates), 1)
+        self.assertCountEqual(db.updates[0], [str(tile.pk), str(child_tile.pk)])
+        self.assertEqual(db.docs[str(tile.pk)]["type"], "tile")
+        self.assertEqual(db.docs[str(tile.pk)]["data"], {str(self.node.pk): "a"})
+        self.assertEqual(db.attachments, {str(child_tile.pk): {str(file.fileid): b"thumbnail"}})
+        get_thumbnail.assert_called_once()
+
+        tile.data = {str(self.node.pk): "b"}
+        tile.save()
+        with mock.patch("arches.app.models.mobile_survey.get_thumbnail", return_value=b"thumbnail") as get_thumbnail:
+            self.survey.load_tiles_into_couch(instances, [self.node.nodegroup_id])
+
+        self.assertEqual(db.updates[1:], [[str(tile.pk)]])
+        self.assertEqual(db.docs[str(tile.pk)]["data"], {str(self.node.pk): "b"})
+        self.assertTrue(db.docs[str(tile.pk)]["_rev"].startswith("2-"))
+        get_thumbnail.assert_not_called()
@@ -19,20 +19,31 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 import json
 import os
 import time
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
 
 from tests import test_settings
 from django.contrib.auth.models import User, Group
 from django.core import management
+from django.db import connection
+from django.test.utils import override_settings, CaptureQueriesContext
 from django.urls import reverse
 from django.test.client import Client
 from guardian.shortcuts import assign_perm, get_perms
+from arches.app.datatypes.concept_types import concept_value_cache
+from arches.app.datatypes.datatypes import DataTypeFactory
 from arches.app.models import models
 from arches.app.models.resource import Resource
 from arches.app.models.tile import Tile
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from arches.app.utils.data_management.resource_graphs.importer import import_graph as resource_graph_importer
 from arches.app.utils.exceptions import InvalidNodeNameException, MultipleNodesFoundException
-from arches.app.utils.index_database import index_resources_by_type
+from arches.app.search.mappings import RESOURCES_INDEX
+from arches.app.search.search_engine_factory import SearchEngineFactory
+from arches.app.utils.index_database import index_changed_resources, index_resources_by_type
+from arches.app.utils.label_based_graph import LabelBasedGraph
+from arches.app.utils.permission_backend import get_nodegroups_by_perm
 from tests.base_test import ArchesTestCase
 
 
@@ -205,6 +216,293 @@ class ResourceTests(ArchesTestCase):
 
         self.assertEqual(result, "Passed")
 
+    def test_time_wheels_are_invalidated_once_resources_are_searchable(self):
+        """
+        Test that the cached time wheels are only invalidated once the indexed resources can be searched,
+        so that they aren't rebuilt from the index before it is refreshed
+        """
+
+        se = SearchEngineFactory().create()
+        resource = Resource(graph_id=self.search_model_graphid)
+        resource.tiles.append(Tile(data={self.search_model_name_nodeid: "Time Wheel Name"}, nodegroup_id=self.search_model_name_nodeid))
+
+        def count_resources(query):
+            return se.count(index=RESOURCES_INDEX, body={"query": {"term": query}})
+
+        counts = []
+        with mock.patch(
+            "arches.app.models.resource.TimeWheel.invalidate",
+            side_effect=lambda: counts.append(count_resources({"resourceinstanceid": str(resource.pk)})),
+        ):
+            resource.save()
+        self.assertTrue(len(counts) > 0)
+        self.assertTrue(all(count == 1 for count in counts))
+
+        resource_count = models.ResourceInstance.objects.filter(graph_id=self.search_model_graphid).count()
+        counts = []
+        with mock.patch(
+            "arches.app.utils.index_database.TimeWheel.invalidate",
+            side_effect=lambda: counts.append(count_resources({"graph_id": self.search_model_graphid})),
+        ):
+            index_resources_by_type([self.search_model_graphid], clear_index=True)
+        self.assertEqual(counts, [resource_count])
+
+    def test_index_changed_resources(self):
+        """
+        Test that only the resources edited since the checkpoint (less the overlap) are indexed,
+        deleted resources are removed from the index and the checkpoint is moved forward
+        """
+
+        se = SearchEngineFactory().create()
+        checkpoint = datetime.now() - timedelta(hours=1)
+        models.ResourceIndexCheckpoint.objects.create(name="resource_test", timestamp=checkpoint)
+
+        def create_edited_resource(timestamp):
+            resource = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+            models.EditLog.objects.create(resourceinstanceid=str(resource.pk), edittype="create", timestamp=timestamp)
+            return str(resource.pk)
+
+        unchanged_resourceid = create_edited_resource(checkpoint - timedelta(days=1))
+        overlapping_resourceid = create_edited_resource(checkpoint - timedelta(minutes=2))
+        changed_resourceid = create_edited_resource(checkpoint + timedelta(minutes=10))
+        deleted_resourceid = str(uuid.uuid4())
+        models.EditLog.objects.create(
+            resourceinstanceid=deleted_resourceid, edittype="delete", timestamp=checkpoint + timedelta(minutes=10)
+        )
+        se.index_data(index=RESOURCES_INDEX, body={"resourceinstanceid": deleted_resourceid}, id=deleted_resourceid)
+        resourceids = [unchanged_resourceid, overlapping_resourceid, changed_resourceid, deleted_resourceid]
+
+        started = datetime.now()
+        index_changed_resources(quiet=True, checkpoint_name="resource_test", overlap=timedelta(minutes=5))
+        se.refresh(index=RESOURCES_INDEX)
+
+        results = se.search(index=RESOURCES_INDEX, body={"query": {"terms": {"resourceinstanceid": resourceids}}, "size": 10})
+        self.assertCountEqual([hit["_id"] for hit in results["hits"]["hits"]], [overlapping_resourceid, changed_resourceid])
+        self.assertGreaterEqual(models.ResourceIndexCheckpoint.objects.get(name="resource_test").timestamp, started)
+        se.delete(index=RESOURCES_INDEX, body={"query": {"terms": {"resourceinstanceid": resourceids}}})
+
+    def test_index_changed_resources_without_a_checkpoint(self):
+        """
+        Test that all resources are indexed (without clearing the index) if there isn't a checkpoint yet
+        """
+
+        with mock.patch("arches.app.utils.index_database.index_resources") as index_resources:
+            index_changed_resources(quiet=True, checkpoint_name="missing")
+
+        index_resources.assert_called_once()
+        self.assertFalse(index_resources.call_args.kwargs["clear_index"])
+
+    def test_load_tiles__bulk(self):
+        """
+        Test that loading the tiles of a batch of resources loads the same tiles as loading them one resource at a time
+        """
+
+        name_nodeid = self.search_model_name_nodeid
+        destruction_date_nodeid = self.search_model_destruction_date_nodeid
+        resource = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        models.TileModel.objects.create(resourceinstance=resource, nodegroup_id=name_nodeid, data={name_nodeid: "Bulk Name"})
+        models.TileModel.objects.create(
+            resourceinstance=resource, nodegroup_id=destruction_date_nodeid, data={destruction_date_nodeid: "1990-01-01"}
+        )
+        no_tiles = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        resourceids = [self.test_resource.pk, resource.pk, no_tiles.pk]
+
+        for user, perm in ((None, None), (self.user, "read_nodegroup")):
+            with self.subTest(user=user):
+                resources = list(Resource.objects.filter(pk__in=resourceids))
+                # the permitted nodegroups are cached per user, so only count the queries for the tiles
+                permitted_nodegroups = get_nodegroups_by_perm(user, perm) if user else []
+                with mock.patch("arches.app.models.resource.get_nodegroups_by_perm", return_value=permitted_nodegroups):
+                    with self.assertNumQueries(1):
+                        Resource.load_tiles__bulk(resources, user=user, perm=perm)
+                for bulk_resource in resources:
+                    single_resource = Resource.objects.get(pk=bulk_resource.pk)
+                    single_resource.load_tiles(user, perm)
+                    self.assertEqual({tile.pk for tile in bulk_resource.tiles}, {tile.pk for tile in single_resource.tiles})
+
+                tiles = {str(resource.pk): resource.tiles for resource in resources}
+                self.assertEqual(tiles[str(no_tiles.pk)], [])
+                destruction_dates = [tile for tile in tiles[str(resource.pk)] if str(tile.nodegroup_id) == destruction_date_nodeid]
+                # the test user has no access to the destruction date nodegroup
+                self.assertEqual(len(destruction_dates), 0 if user else 1)
+
+    def test_get_descriptors__bulk(self):
+        """
+        Test that the descriptors calculated for a batch of resources match those calculated for each resource
+        """
+
+        name_nodeid = self.search_model_name_nodeid
+        period_nodeid = self.search_model_cultural_period_nodeid
+        valueid = str(models.Value.objects.get(value="Mock concept", valuetype_id="prefLabel").valueid)
+
+        # names in a later sortorder are only used if there is no name in the first one
+        first_and_second_names = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        models.TileModel.objects.create(
+            resourceinstance=first_and_second_names, nodegroup_id=name_nodeid, data={name_nodeid: "Second Name"}, sortorder=1
+        )
+        models.TileModel.objects.create(
+            resourceinstance=first_and_second_names, nodegroup_id=name_nodeid, data={name_nodeid: "First Name"}, sortorder=0
+        )
+        models.TileModel.objects.create(
+            resourceinstance=first_and_second_names, nodegroup_id=period_nodeid, data={period_nodeid: valueid}, sortorder=0
+        )
+        second_name_only = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        models.TileModel.objects.create(
+            resourceinstance=second_name_only, nodegroup_id=name_nodeid, data={name_nodeid: "Only Name"}, sortorder=1
+        )
+        provisional_name = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        models.TileModel.objects.create(
+            resourceinstance=provisional_name,
+            nodegroup_id=name_nodeid,
+            data={},
+            provisionaledits={str(self.user.pk): {"value": {name_nodeid: "Provisional Name"}, "status": "review", "action": "create"}},
+        )
+        no_tiles = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+        resourceids = [
+            self.test_resource.pk,
+            first_and_second_names.pk,
+            second_name_only.pk,
+            provisional_name.pk,
+            no_tiles.pk,
+        ]
+
+        def get_descriptors():
+            resources = list(Resource.objects.filter(pk__in=resourceids))
+            Resource.get_descriptors__bulk(resources)
+            bulk_descriptors = {str(resource.pk): resource.descriptors for resource in resources}
+            descriptors = {
+                str(resource.pk): {
+                    descriptor: resource.get_descriptor(descriptor, None) for descriptor in ("name", "description", "map_popup")
+                }
+                for resource in Resource.objects.filter(pk__in=resourceids)
+            }
+            return bulk_descriptors, descriptors
+
+        # a graph without a descriptor function
+        bulk_descriptors, descriptors = get_descriptors()
+        self.assertEqual(bulk_descriptors, descriptors)
+
+        models.FunctionXGraph.objects.create(
+            function_id="60000000-0000-0000-0000-000000000001",
+            graph_id=self.search_model_graphid,
+            config={
+                "descriptor_types": {
+                    "name": {"nodegroup_id": name_nodeid, "string_template": "<Name>"},
+                    "description": {"nodegroup_id": period_nodeid, "string_template": "Period: <Cultural Period Concept>"},
+                    "map_popup": {"nodegroup_id": "", "string_template": ""},
+                }
+            },
+        )
+        bulk_descriptors, descriptors = get_descriptors()
+        self.assertEqual(bulk_descriptors, descriptors)
+        self.assertEqual(descriptors[str(first_and_second_names.pk)]["name"], "First Name")
+        self.assertEqual(descriptors[str(first_and_second_names.pk)]["description"], "Period: Mock concept")
+        self.assertEqual(descriptors[str(second_name_only.pk)]["name"], "Only Name")
+        self.assertEqual(descriptors[str(provisional_name.pk)]["name"], "Provisional Name")
+        self.assertEqual(descriptors[str(no_tiles.pk)]["name"], "Undefined")
+        self.assertEqual(descriptors[str(no_tiles.pk)]["map_popup"], "Undefined")
+
+    def test_concept_display_values__bulk(self):
+        """
+        Test that the concept display values resolved for a batch of tiles match those resolved one tile at a time,
+        and are fetched with one query however many tiles there are
+        """
+
+        nodeid = self.search_model_cultural_period_nodeid
+        node = models.Node.objects.get(pk=nodeid)
+        datatype = DataTypeFactory().get_instance(node.datatype)
+        valueids = [str(valueid) for valueid in models.Value.objects.filter(concept_id=self.conceptid).values_list("valueid", flat=True)]
+        self.assertTrue(len(valueids) > 1)
+
+        for count in (len(valueids), len(valueids) * 3):
+            with self.subTest(count=count):
+                tiles = [models.TileModel(nodegroup_id=nodeid, data={nodeid: valueids[i % len(valueids)]}) for i in range(count)]
+                tiles.append(models.TileModel(nodegroup_id=nodeid, data={nodeid: None}))
+
+                concept_value_cache.clear()
+                with self.assertNumQueries(1):
+                    display_values = datatype.get_display_values__bulk(tiles, node)
+                concept_value_cache.clear()
+                self.assertEqual(display_values, [datatype.get_display_value(tile, node) for tile in tiles])
+
+    def test_resource_instance_display_values__bulk(self):
+        """
+        Test that the names of the related resources resolved for a batch of tiles match the display name of each resource,
+        and are fetched with the same number of queries however many tiles there are
+        """
+
+        name_nodeid = self.search_model_name_nodeid
+        related_resourceids = []
+        for i in range(3):
+            related_resource = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+            models.TileModel.objects.create(
+                resourceinstance=related_resource, nodegroup_id=name_nodeid, data={name_nodeid: "Related Name %s" % i}
+            )
+            related_resourceids.append(str(related_resource.pk))
+        missing_resourceid = str(uuid.uuid4())
+        names = {resourceid: Resource.objects.get(pk=resourceid).displayname() for resourceid in related_resourceids}
+
+        nodeid = str(uuid.uuid4())
+        node = models.Node(nodeid=nodeid, name="Related Resources", datatype="resource-instance")
+        datatype = DataTypeFactory().get_instance(node.datatype)
+        self.assertEqual(datatype.get_resource_names__bulk(related_resourceids + [missing_resourceid]), names)
+
+        resourceids_by_tile = [related_resourceids[:1], related_resourceids[1:], [missing_resourceid, related_resourceids[0]], []]
+        tiles = [
+            models.TileModel(nodegroup_id=nodeid, data={nodeid: [{"resourceId": resourceid} for resourceid in resourceids]})
+            for resourceids in resourceids_by_tile
+        ]
+        expected = [
+            ", ".join(names[resourceid] for resourceid in resourceids if resourceid in names) for resourceids in resourceids_by_tile
+        ]
+        self.assertEqual(datatype.get_display_values__bulk(tiles, node), expected)
+        self.assertEqual([datatype.get_display_value(tile, node) for tile in tiles], expected)
+
+        with CaptureQueriesContext(connection) as single_tile_queries:
+            datatype.get_display_values__bulk(tiles[:1], node)
+        with CaptureQueriesContext(connection) as all_tile_queries:
+            datatype.get_display_values__bulk(tiles, node)
+        self.assertEqual(len(all_tile_queries), len(single_tile_queries))
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "resource_tests"},
+        }
+    )
+    def test_label_based_graph_display_values_are_prefetched(self):
+        """
+        Test that the label based graphs of a batch of resources match those built resolving each display value
+        one tile at a time, and are built with the same number of queries however many resources there are
+        """
+
+        name_nodeid = self.search_model_name_nodeid
+        period_nodeid = self.search_model_cultural_period_nodeid
+        valueid = str(models.Value.objects.get(value="Mock concept", valuetype_id="prefLabel").valueid)
+        resourceids = []
+        for i in range(3):
+            resource = models.ResourceInstance.objects.create(graph_id=self.search_model_graphid)
+            models.TileModel.objects.create(resourceinstance=resource, nodegroup_id=name_nodeid, data={name_nodeid: "Name %s" % i})
+            models.TileModel.objects.create(resourceinstance=resource, nodegroup_id=period_nodeid, data={period_nodeid: valueid})
+            resourceids.append(resource.pk)
+
+        def get_label_based_graphs(resourceids):
+            resources = list(Resource.objects.filter(pk__in=resourceids).order_by("pk"))
+            concept_value_cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                label_based_graphs = LabelBasedGraph.from_resources(resources, compact=True)
+            return label_based_graphs, len(queries)
+
+        # load the graph metadata into the cache
+        get_label_based_graphs(resourceids)
+        label_based_graphs, query_count = get_label_based_graphs(resourceids)
+        self.assertEqual(get_label_based_graphs(resourceids[:1])[1], query_count)
+        self.assertEqual({label_based_graph["Cultural Period Concept"] for label_based_graph in label_based_graphs}, {"Mock concept"})
+
+        with mock.patch.object(LabelBasedGraph, "_get_display_values__bulk", return_value={}):
+            expected, per_tile_query_count = get_label_based_graphs(resourceids)
+        self.assertEqual(JSONSerializer().serialize(label_based_graphs), JSONSerializer().serialize(expected))
+
     def test_creator_has_permissions(self):
         """
         Test user that created instance has full permissions
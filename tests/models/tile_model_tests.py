@@ -33,9 +33,7 @@ from django.db.utils import ProgrammingError
 from django.http import HttpRequest
 from arches.app.models.tile import Tile
 from arches.app.models.resource import Resource
-from arches.app.models.models import ResourceXResource
-
-
+from arches.app.models.models import ResourceXResource, EditLog
 
 # these tests can be run from the command line via
 # python manage.py test tests/models/tile_model_tests.py --pattern="*.py" --settings="tests.test_settings"
@@ -165,6 +163,50 @@ class TileTests(ArchesTestCase):
 
         self.assertEqual(tiles.count(), 2)
 
+    def test_bulk_save(self):
+        """
+        Test that a list of tiles and their child tiles can be saved in bulk and that saving
+        them again updates the existing tiles
+
+        """
+
+        json = {
+            "tiles": [
+                {
+                    "tiles": [],
+                    "resourceinstance_id": "40000000-0000-0000-0000-000000000000",
+                    "parenttile_id": "",
+                    "nodegroup_id": "72048cb3-adbc-11e6-9ccf-14109fd34195",
+                    "tileid": "",
+                    "data": {"72048cb3-adbc-11e6-9ccf-14109fd34195": "TEST 1"},
+                }
+            ],
+            "resourceinstance_id": "40000000-0000-0000-0000-000000000000",
+            "parenttile_id": "",
+            "nodegroup_id": "7204869c-adbc-11e6-8bec-14109fd34195",
+            "tileid": "",
+            "data": {},
+        }
+
+        t = Tile(json)
+        saved_tiles = Tile.bulk_save([t], index=False)
+
+        tiles = Tile.objects.filter(resourceinstance_id="40000000-0000-0000-0000-000000000000")
+        self.assertEqual(len(saved_tiles), 2)
+        self.assertEqual(tiles.count(), 2)
+        self.assertEqual(Tile.objects.get(pk=t.tiles[0].tileid).parenttile_id, t.tileid)
+        self.assertEqual(
+            EditLog.objects.filter(tileinstanceid__in=[str(tile.tileid) for tile in saved_tiles], edittype="tile create").count(), 2
+        )
+
+        child_tile = t.tiles[0]
+        child_tile.data["72048cb3-adbc-11e6-9ccf-14109fd34195"] = "TEST 2"
+        Tile.bulk_save([child_tile], index=False)
+
+        self.assertEqual(tiles.count(), 2)
+        self.assertEqual(Tile.objects.get(pk=child_tile.tileid).data["72048cb3-adbc-11e6-9ccf-14109fd34195"], "TEST 2")
+        self.assertEqual(EditLog.objects.filter(tileinstanceid=str(child_tile.tileid), edittype="tile edit").count(), 1)
+
     def test_simple_get(self):
         """
         Test that we can get a Tile object
@@ -21,16 +21,20 @@ Replace this with more appropriate tests for your application.
 
 import os
 import json
+import uuid
 from tests import test_settings
 from tests.base_test import ArchesTestCase
 from django.core import management
+from django.core.cache import caches
+from django.db import connection
 from django.urls import reverse
 from django.test.client import RequestFactory, Client
+from django.test.utils import override_settings
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
-from guardian.shortcuts import assign_perm, get_perms, remove_perm, get_group_perms, get_user_perms
-from arches.app.models.models import ResourceInstance, Node
+from guardian.shortcuts import assign_perm, get_perms, remove_perm, get_group_perms, get_user_perms, get_users_with_perms
+from arches.app.models.models import ResourceInstance, Node, TileModel
 from arches.app.models.resource import Resource
 from arches.app.utils.permission_backend import get_editable_resource_types
 from arches.app.utils.permission_backend import get_resource_types_by_perm
@@ -39,6 +43,10 @@ from arches.app.utils.permission_backend import user_can_edit_resource
 from arches.app.utils.permission_backend import user_can_read_concepts
 from arches.app.utils.permission_backend import user_has_resource_model_permissions
 from arches.app.utils.permission_backend import get_restricted_users
+from arches.app.utils.permission_backend import get_restricted_users__bulk
+from arches.app.utils.permission_backend import get_nodegroups_by_perm
+from arches.app.utils.permission_backend import get_restricted_instances_key
+from arches.app.utils.permission_backend import get_restricted_instances_sql
 
 # these tests can be run from the command line via
 # python manage.py test tests/permissions/permission_tests.py --pattern="*.py" --settings="tests.test_settings"
@@ -154,3 +162,217 @@ class PermissionTests(ArchesTestCase):
         ]
 
         self.assertTrue(all(results) is True)
+
+    def test_get_restricted_users__bulk(self):
+        """
+        Tests that users are properly identified as restricted from each of a list of resources.
+        """
+
+        resource = ResourceInstance.objects.get(resourceinstanceid=self.resource_instance_id)
+        unrestricted_resourceid = "7d1a5b1c-3a6e-4f0f-9c1e-2f3d0f8a6b11"
+        ben = self.user
+        jim = User.objects.get(username="jim")
+        assign_perm("no_access_to_resourceinstance", self.group, resource)
+        assign_perm("view_resourceinstance", ben, resource)
+        assign_perm("no_access_to_resourceinstance", jim, resource)
+        group_userids = {
+            user.id for user in self.group.user_set.all() if user.is_active and not user.is_superuser and user.id not in (ben.id, jim.id)
+        }
+
+        restrictions = get_restricted_users__bulk([resource, unrestricted_resourceid])
+
+        # ben is a member of the restricted group, so his direct view permission doesn't lift the restriction
+        self.assertIn(ben, self.group.user_set.all())
+        self.assertEqual(sorted(restrictions.keys()), sorted([str(resource.pk), unrestricted_resourceid]))
+        self.assertEqual(set(restrictions[str(resource.pk)]["no_access"]), group_userids | {jim.id, ben.id})
+        self.assertEqual(set(restrictions[str(resource.pk)]["cannot_read"]), group_userids | {jim.id, ben.id})
+        self.assertEqual(set(restrictions[str(resource.pk)]["cannot_write"]), group_userids | {jim.id, ben.id})
+        self.assertEqual(set(restrictions[str(resource.pk)]["cannot_delete"]), group_userids | {jim.id, ben.id})
+        self.assertEqual(
+            restrictions[unrestricted_resourceid], {"no_access": [], "cannot_read": [], "cannot_write": [], "cannot_delete": []}
+        )
+
+    def test_get_restricted_users__bulk_matches_guardian(self):
+        """
+        Tests that the bulk restrictions match those calculated from guardian's get_users_with_perms for the same resource.
+        """
+
+        def get_restricted_users_from_guardian(resource):
+            user_perms = get_users_with_perms(resource, attach_perms=True, with_group_users=False)
+            user_and_group_perms = get_users_with_perms(resource, attach_perms=True, with_group_users=True)
+            result = {"no_access": [], "cannot_read": [], "cannot_write": [], "cannot_delete": []}
+            for user, perms in user_and_group_perms.items():
+                if user.is_superuser:
+                    pass
+                elif user in user_perms and "no_access_to_resourceinstance" in user_perms[user]:
+                    for k, v in result.items():
+                        v.append(user.id)
+                else:
+                    if "view_resourceinstance" not in perms:
+                        result["cannot_read"].append(user.id)
+                    if "change_resourceinstance" not in perms:
+                        result["cannot_write"].append(user.id)
+                    if "delete_resourceinstance" not in perms:
+                        result["cannot_delete"].append(user.id)
+                    if "no_access_to_resourceinstance" in perms and len(perms) == 1:
+                        result["no_access"].append(user.id)
+            return {k: sorted(v) for k, v in result.items()}
+
+        resource = ResourceInstance.objects.get(resourceinstanceid=self.resource_instance_id)
+        jim = User.objects.get(username="jim")
+        sam = User.objects.get(username="sam")
+        inactive_user = User.objects.create_user(username="inactive", email="inactive@test.com", password="Test12345!", is_active=False)
+        self.group.user_set.add(inactive_user)
+        assign_perm("no_access_to_resourceinstance", self.group, resource)
+        assign_perm("view_resourceinstance", self.user, resource)
+        assign_perm("change_resourceinstance", jim, resource)
+        assign_perm("view_resourceinstance", sam, resource)
+        assign_perm("delete_resourceinstance", sam, resource)
+        assign_perm("no_access_to_resourceinstance", inactive_user, resource)
+
+        restrictions = get_restricted_users__bulk([resource])[str(resource.pk)]
+
+        self.assertEqual({k: sorted(v) for k, v in restrictions.items()}, get_restricted_users_from_guardian(resource))
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "permission_tests"},
+        }
+    )
+    def test_nodegroups_by_perm_cache_is_cleared_on_permission_change(self):
+        """
+        Tests that a user's cached permitted nodegroups are recalculated after their permissions change.
+        """
+
+        nodegroup = Node.objects.filter(graph_id=self.data_type_graphid).exclude(nodegroup=None).first().nodegroup
+        permitted = get_nodegroups_by_perm(self.user, "models.read_nodegroup")
+        self.assertIn(nodegroup.pk, [permitted_nodegroup.pk for permitted_nodegroup in permitted])
+
+        assign_perm("no_access_to_nodegroup", self.user, nodegroup)
+        permitted = get_nodegroups_by_perm(self.user, "models.read_nodegroup")
+        self.assertNotIn(nodegroup.pk, [permitted_nodegroup.pk for permitted_nodegroup in permitted])
+
+        remove_perm("no_access_to_nodegroup", self.user, nodegroup)
+        permitted = get_nodegroups_by_perm(self.user, "models.read_nodegroup")
+        self.assertIn(nodegroup.pk, [permitted_nodegroup.pk for permitted_nodegroup in permitted])
+
+    def test_get_restricted_instances_sql(self):
+        """
+        Tests that the geometries of resources any user or group is restricted from are excluded.
+        """
+
+        geojson_nodeid = "38870840-95ed-11e8-b2a9-acde48001122"
+        geojson_nodegroupid = "2e3b04c0-95ed-11e8-b68c-acde48001122"
+        resources = []
+        for i in range(3):
+            resource = ResourceInstance.objects.create(graph_id=self.data_type_graphid)
+            tile = TileModel.objects.create(
+                resourceinstance=resource,
+                nodegroup_id=geojson_nodegroupid,
+                data={
+                    geojson_nodeid: {
+                        "type": "FeatureCollection",
+                        "features": [
+                            {
+                                "type": "Feature",
+                                "id": str(uuid.uuid4()),
+                                "geometry": {"type": "Point", "coordinates": [i, i]},
+                                "properties": {},
+                            }
+                        ],
+                    }
+                },
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT * FROM refresh_tile_geojson_geometries(%s);", [tile.pk])
+            resources.append(resource)
+        assign_perm("no_access_to_resourceinstance", self.group, resources[0])
+        assign_perm("no_access_to_resourceinstance", self.user, resources[1])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """SELECT DISTINCT resourceinstanceid FROM geojson_geometries
+                WHERE resourceinstanceid = ANY(%s::uuid[]) AND {0}""".format(
+                    get_restricted_instances_sql("geojson_geometries.resourceinstanceid")
+                ),
+                [[str(resource.pk) for resource in resources]],
+            )
+            unrestricted = [str(row[0]) for row in cursor.fetchall()]
+
+        self.assertEqual(unrestricted, [str(resources[2].pk)])
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "permission_tests"},
+        }
+    )
+    def test_restricted_instances_key_changes_with_restrictions(self):
+        """
+        Tests that the restricted instances key only changes when a resource instance restriction is added or removed.
+        """
+
+        resource = ResourceInstance.objects.get(resourceinstanceid=self.resource_instance_id)
+        key = get_restricted_instances_key()
+        self.assertEqual(get_restricted_instances_key(), key)
+
+        assign_perm("view_resourceinstance", self.user, resource)
+        self.assertEqual(get_restricted_instances_key(), key)
+
+        assign_perm("no_access_to_resourceinstance", self.user, resource)
+        user_restricted_key = get_restricted_instances_key()
+        self.assertNotEqual(user_restricted_key, key)
+
+        assign_perm("no_access_to_resourceinstance", self.group, resource)
+        group_restricted_key = get_restricted_instances_key()
+        self.assertNotIn(group_restricted_key, (key, user_restricted_key))
+
+        remove_perm("no_access_to_resourceinstance", self.user, resource)
+        self.assertNotIn(get_restricted_instances_key(), (key, user_restricted_key, group_restricted_key))
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "permission_tests"},
+        }
+    )
+    def test_only_affected_cached_permissions_are_dropped(self):
+        """
+        Tests that object permission changes only drop the cached permissions of the users they affect,
+        and only if the permission is on a nodegroup.
+        """
+
+        user_permission_cache = caches["user_permission"]
+        jim = User.objects.get(username="jim")
+        group_userids = [str(userid) for userid in self.group.user_set.values_list("pk", flat=True)]
+        outsider = User.objects.exclude(pk__in=self.group.user_set.values_list("pk", flat=True)).first()
+
+        def fill_cache():
+            user_permission_cache.set("graph_metadata_version", "version")
+            for user in User.objects.all():
+                user_permission_cache.set(str(user.pk), {"nodegroups_by_perm": {}})
+
+        resource = ResourceInstance.objects.get(resourceinstanceid=self.resource_instance_id)
+        nodegroup = Node.objects.filter(graph_id=self.data_type_graphid).exclude(nodegroup=None).first().nodegroup
+
+        fill_cache()
+        assign_perm("view_resourceinstance", self.group, resource)
+        assign_perm("view_resourceinstance", jim, resource)
+        self.assertEqual(user_permission_cache.get("graph_metadata_version"), "version")
+        for user in User.objects.all():
+            self.assertIsNotNone(user_permission_cache.get(str(user.pk)))
+
+        fill_cache()
+        assign_perm("no_access_to_nodegroup", self.group, nodegroup)
+        self.assertEqual(user_permission_cache.get("graph_metadata_version"), "version")
+        for userid in group_userids:
+            self.assertIsNone(user_permission_cache.get(userid))
+        self.assertIsNotNone(user_permission_cache.get(str(outsider.pk)))
+
+        fill_cache()
+        assign_perm("no_access_to_nodegroup", outsider, nodegroup)
+        self.assertEqual(user_permission_cache.get("graph_metadata_version"), "version")
+        self.assertIsNone(user_permission_cache.get(str(outsider.pk)))
+        for userid in group_userids:
+            self.assertIsNotNone(user_permission_cache.get(userid))
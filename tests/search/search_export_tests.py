@@ -0,0 +1,92 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import uuid
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test.client import RequestFactory
+from tests.base_test import ArchesTestCase
+from arches.app.models.system_settings import settings
+from arches.app.search.elasticsearch_dsl_builder import Bool, Query, Terms
+from arches.app.search.mappings import RESOURCES_INDEX
+from arches.app.search.search_engine_factory import SearchEngineFactory
+from arches.app.search.search_export import SearchResultsExporter
+
+# these tests can be run from the command line via
+# python manage.py test tests/search/search_export_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+
+class SearchExportTests(ArchesTestCase):
+    def setUp(self):
+        self.se = SearchEngineFactory().create()
+        self.graphid = str(uuid.uuid4())
+        self.permitted_nodegroupid = str(uuid.uuid4())
+        self.restricted_nodegroupid = str(uuid.uuid4())
+        self.resourceids = [str(uuid.uuid4()) for i in range(7)]
+        for resourceid in self.resourceids:
+            document = {
+                "graph_id": self.graphid,
+                "resourceinstanceid": resourceid,
+                "tiles": [
+                    {"tileid": str(uuid.uuid4()), "nodegroup_id": self.permitted_nodegroupid, "resourceinstance_id": resourceid},
+                    {"tileid": str(uuid.uuid4()), "nodegroup_id": self.restricted_nodegroupid, "resourceinstance_id": resourceid},
+                ],
+            }
+            self.se.index_data(index=RESOURCES_INDEX, body=document, id=resourceid)
+        self.se.refresh(index=RESOURCES_INDEX)
+
+        request = RequestFactory().get("/search/export_results", {"format": "tilecsv"})
+        request.user = User.objects.get(username="admin")
+        self.exporter = SearchResultsExporter(search_request=request)
+        self.get_permitted_nodegroups = mock.patch(
+            "arches.app.views.search.get_permitted_nodegroups", return_value=[self.permitted_nodegroupid]
+        )
+        self.get_permitted_nodegroups.start()
+
+    def tearDown(self):
+        self.get_permitted_nodegroups.stop()
+        self.se.delete(index=RESOURCES_INDEX, body={"query": {"terms": {"resourceinstanceid": self.resourceids}}})
+
+    def get_dsl(self):
+        dsl = Query(self.se)
+        query = Bool()
+        query.filter(Terms(field="graph_id", terms=[self.graphid]))
+        dsl.add_query(query)
+        return dsl
+
+    def test_get_search_hits_scrolls_past_the_first_page(self):
+        with mock.patch.object(settings, "SEARCH_EXPORT_PAGE_SIZE", 2):
+            with mock.patch.object(self.se.es, "scroll", wraps=self.se.es.scroll) as scroll:
+                hits = list(self.exporter.get_search_hits(self.get_dsl()))
+
+        self.assertCountEqual([hit["_id"] for hit in hits], self.resourceids)
+        self.assertEqual(scroll.call_count, 4)
+
+    def test_get_search_hits_stops_at_the_export_limit(self):
+        with mock.patch.object(settings, "SEARCH_EXPORT_PAGE_SIZE", 2), mock.patch.object(settings, "SEARCH_EXPORT_LIMIT", 3):
+            hits = list(self.exporter.get_search_hits(self.get_dsl()))
+
+        self.assertEqual(len(hits), 3)
+
+    def test_get_search_hits_only_returns_permitted_tiles(self):
+        with mock.patch.object(settings, "SEARCH_EXPORT_PAGE_SIZE", 2):
+            hits = list(self.exporter.get_search_hits(self.get_dsl()))
+
+        self.assertEqual(len(hits), len(self.resourceids))
+        for hit in hits:
+            self.assertEqual([tile["nodegroup_id"] for tile in hit["_source"]["tiles"]], [self.permitted_nodegroupid])
@@ -18,9 +18,14 @@ along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import time
 import uuid
+from unittest import mock
+from django.core import management
+from django.core.management.base import CommandError
 from tests.base_test import ArchesTestCase
 from arches.app.search.search_engine_factory import SearchEngineFactory
+from arches.app.search.base_index import SearchIndexError
 from arches.app.search.elasticsearch_dsl_builder import Bool, Match, Query, Nested, Terms, GeoShape, Range
+from arches.app.utils.index_database import _bulk_indexing_mode
 
 # these tests can be run from the command line via
 # python manage.py test tests/search/search_tests.py --pattern="*.py" --settings="tests.test_settings"
@@ -32,6 +37,8 @@ class SearchTests(ArchesTestCase):
         se = SearchEngineFactory().create()
         se.delete_index(index="test")
         se.delete_index(index="bulk")
+        se.delete_index(index="unit_of_work")
+        se.delete_index(index="bulk_mode")
 
     def test_delete_by_query(self):
         """
@@ -79,6 +86,19 @@ class SearchTests(ArchesTestCase):
         ret = se.bulk_index(documents, refresh=True)
         count_after = se.count(index="test")
         self.assertEqual(count_after - count_before, 10)
+        self.assertEqual(ret.documents, 10)
+        self.assertEqual(ret.failures, [])
+
+    def test_bulk_chunks(self):
+        se = SearchEngineFactory().create()
+        documents = [se.create_bulk_item(index="test", id=i, data={"id": i, "value": "x" * 100}) for i in range(10)]
+
+        chunks = list(se._get_bulk_chunks(documents, chunk_size=4, max_chunk_bytes=2**20))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+
+        chunks = list(se._get_bulk_chunks(documents, chunk_size=500, max_chunk_bytes=500))
+        self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 10)
 
     def test_bulk_indexer(self):
         se = SearchEngineFactory().create()
@@ -91,3 +111,54 @@ class SearchTests(ArchesTestCase):
 
         count_after = se.count(index="bulk")
         self.assertEqual(count_after, 1001)
+
+    def test_index_unit_of_work(self):
+        se = SearchEngineFactory().create()
+        se.create_index(index="unit_of_work")
+
+        with se.IndexUnitOfWork(refresh=True) as unit_of_work:
+            for i in range(10):
+                doc = {"id": i, "type": "prefLabel", "value": "test pref label"}
+                unit_of_work.add(index="unit_of_work", id=doc["id"], data=doc)
+        self.assertEqual(se.count(index="unit_of_work"), 10)
+
+        with se.IndexUnitOfWork(refresh=True) as unit_of_work:
+            unit_of_work.delete(index="unit_of_work", id=0)
+            unit_of_work.delete(index="unit_of_work", id=1000)  # not indexed, so ignored
+        self.assertEqual(se.count(index="unit_of_work"), 9)
+        self.assertEqual(len(se.get_ids(index="unit_of_work", body={"query": {"match": {"type": "prefLabel"}}})), 9)
+
+    def test_bulk_indexing_mode(self):
+        se = SearchEngineFactory().create()
+        se.create_index(index="bulk_mode")
+
+        def get_refresh_interval():
+            index_settings = se.get_settings(index="bulk_mode", name="index.refresh_interval")
+            return list(index_settings.values())[0]["settings"].get("index", {}).get("refresh_interval")
+
+        with _bulk_indexing_mode("bulk_mode"):
+            self.assertEqual(get_refresh_interval(), "-1")
+            # a second reindex mustn't start, or it would restore refreshing turned off
+            with self.assertRaises(SearchIndexError):
+                with _bulk_indexing_mode("bulk_mode"):
+                    pass
+        self.assertIsNone(get_refresh_interval())
+
+    def test_parallel_bulk_index_records_failed_chunks(self):
+        se = SearchEngineFactory().create()
+        documents = [se.create_bulk_item(index="bulk", id=i, data={"id": i}) for i in range(10)]
+
+        with mock.patch.object(se, "_send_bulk_chunk", side_effect=ConnectionError("connection lost")):
+            stats = se.parallel_bulk_index(documents, thread_count=2, chunk_size=2)
+
+        self.assertEqual(stats.documents, 0)
+        self.assertCountEqual([failure["_id"] for failure in stats.failures], list(range(10)))
+
+    def test_reindex_command_fails_on_index_failures(self):
+        def index_resources(stats=None, **kwargs):
+            stats.add_failures([{"_index": "resources", "_id": "1", "status": 400, "error": "mapper_parsing_exception"}])
+            return stats
+
+        with mock.patch("arches.app.utils.index_database.index_resources", side_effect=index_resources):
+            with self.assertRaises(CommandError):
+                management.call_command("es", "index_resources")
@@ -0,0 +1,106 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import uuid
+from unittest import mock
+from django.test.utils import override_settings
+from tests.base_test import ArchesTestCase
+from arches.app.models.system_settings import settings
+from arches.app.search.mappings import RESOURCES_INDEX
+from arches.app.search.search_engine_factory import SearchEngineFactory
+from arches.app.search.time_wheel import TimeWheel, d3Item
+from arches.app.utils.date_utils import ExtendedDateFormat
+
+# these tests can be run from the command line via
+# python manage.py test tests/search/time_wheel_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+# the time wheels are kept in the shared cache (settings.TIMEWHEEL_CACHE), not the per process default cache
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "user_permission": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "time_wheel_tests"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TimeWheelCacheTests(ArchesTestCase):
+    def setUp(self):
+        TimeWheel.invalidate()
+        self.time_wheel = TimeWheel()
+        self.get_time_wheel_config = mock.patch.object(
+            TimeWheel, "get_time_wheel_config", side_effect=lambda nodegroups: d3Item(name="root")
+        )
+        self.get_time_wheel_config.start()
+
+    def tearDown(self):
+        self.get_time_wheel_config.stop()
+
+    def test_config_is_cached_per_permitted_nodegroups(self):
+        with mock.patch.object(TimeWheel, "get_permitted_nodegroups", return_value=["b", "a"]):
+            self.time_wheel.time_wheel_config(None)
+        with mock.patch.object(TimeWheel, "get_permitted_nodegroups", return_value=["a", "b"]):
+            self.time_wheel.time_wheel_config(None)
+        self.assertEqual(TimeWheel.get_time_wheel_config.call_count, 1)
+
+        with mock.patch.object(TimeWheel, "get_permitted_nodegroups", return_value=["a"]):
+            self.time_wheel.time_wheel_config(None)
+        self.assertEqual(TimeWheel.get_time_wheel_config.call_count, 2)
+
+    def test_invalidate_discards_cached_configs(self):
+        with mock.patch.object(TimeWheel, "get_permitted_nodegroups", return_value=["a"]):
+            self.time_wheel.time_wheel_config(None)
+            TimeWheel.invalidate()
+            self.time_wheel.time_wheel_config(None)
+        self.assertEqual(TimeWheel.get_time_wheel_config.call_count, 2)
+
+
+class TimeWheelConfigTests(ArchesTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.se = SearchEngineFactory().create()
+        cls.nodegroupid = str(uuid.uuid4())
+        cls.documents = {
+            str(uuid.uuid4()): {"dates": [{"date": ExtendedDateFormat("1950").lower, "nodegroup_id": cls.nodegroupid}]},
+            str(uuid.uuid4()): {
+                "date_ranges": [
+                    {
+                        "date_range": {"gte": ExtendedDateFormat("1850").lower, "lte": ExtendedDateFormat("1960").lower},
+                        "nodegroup_id": cls.nodegroupid,
+                    }
+                ]
+            },
+            # the dates of nodegroups that aren't permitted aren't counted
+            str(uuid.uuid4()): {"dates": [{"date": ExtendedDateFormat("1750").lower, "nodegroup_id": str(uuid.uuid4())}]},
+        }
+        for resourceid, document in cls.documents.items():
+            cls.se.index_data(index=RESOURCES_INDEX, body=dict(document, resourceinstanceid=resourceid), id=resourceid)
+        cls.se.refresh(index=RESOURCES_INDEX)
+
+    @classmethod
+    def tearDownClass(cls):
+        for resourceid in cls.documents:
+            cls.se.delete(index=RESOURCES_INDEX, id=resourceid)
+        cls.se.refresh(index=RESOURCES_INDEX)
+
+    def test_period_sizes(self):
+        date_tiers = {"name": "Millennium", "interval": 1000, "root": True, "child": {"name": "Century", "interval": 100}}
+        with mock.patch.object(settings, "TIMEWHEEL_DATE_TIERS", date_tiers):
+            root = TimeWheel().get_time_wheel_config([self.nodegroupid])
+
+        periods = {item.name: (item.size, [(child.name, child.size) for child in item.children]) for item in root.children}
+        self.assertEqual(periods, {"Millennium (1000 - 2000)": (2, [("Century (1800 - 1900)", 1), ("Century (1900 - 2000)", 2)])})
+        self.assertEqual(root.size, 2)
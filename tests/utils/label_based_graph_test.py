@@ -149,11 +149,28 @@ class LabelBasedGraph_FromResourceTests(TestCase):
         # and complex to get `displayname`
         cls.test_resource = mock.Mock(displayname="Test Resource", tiles=[])
 
+        # the test graph isn't saved, so leave the nodes to be looked up through the mocked Node model
+        cls.edge_tree_patcher = mock.patch(
+            "arches.app.utils.label_based_graph.graph_metadata.get_graph_edge_tree", return_value={"nodes": {}, "child_nodes": {}}
+        )
+        cls.edge_tree_patcher.start()
+
+    @classmethod
+    def tearDown(cls):
+        cls.edge_tree_patcher.stop()
+
     def test_smoke(self, mock_Node, mock_NodeGroup):
         label_based_graph = LabelBasedGraph.from_resource(resource=self.test_resource, compact=False, hide_empty_nodes=False)
 
         self.assertEqual(label_based_graph, {})
 
+    def test_tiles_are_only_loaded_when_not_already_loaded(self, mock_Node, mock_NodeGroup):
+        LabelBasedGraph.from_resource(resource=self.test_resource, tiles_loaded=True)
+        self.test_resource.load_tiles.assert_not_called()
+
+        LabelBasedGraph.from_resource(resource=self.test_resource, user="test_user", perm="read_nodegroup")
+        self.test_resource.load_tiles.assert_called_once_with("test_user", "read_nodegroup")
+
     def test_handles_node_with_single_value(self, mock_Node, mock_NodeGroup):
         mock_Node.objects.get.return_value = self.string_node
         mock_NodeGroup.objects.filter.return_value.values.return_value = [
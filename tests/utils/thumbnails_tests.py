@@ -0,0 +1,97 @@
+"""
+ARCHES - a program developed to inventory and manage immovable cultural heritage.
+Copyright (C) 2013 J. Paul Getty Trust and World Monuments Fund
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import shutil
+import tempfile
+from unittest import mock
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import override_settings
+from tests.base_test import ArchesTestCase
+from arches.app.models import models
+from arches.app.utils import thumbnails
+from arches.app.utils.thumbnails import get_thumbnail, get_thumbnail_dir, get_thumbnail_name
+
+# these tests can be run from the command line via
+# python manage.py test tests/utils/thumbnails_tests.py --pattern="*.py" --settings="tests.test_settings"
+
+
+def get_image_upload(name="photo.png", size=(400, 200)):
+    b = io.BytesIO()
+    Image.new("RGB", size, color="red").save(b, "PNG")
+    return SimpleUploadedFile(name, b.getvalue(), content_type="image/png")
+
+
+class ThumbnailTests(ArchesTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.file = models.File.objects.create(path=get_image_upload())
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_get_thumbnail_saves_the_thumbnail_to_storage(self):
+        thumbnail = get_thumbnail(self.file, 100)
+
+        name = get_thumbnail_name(self.file.fileid, 100)
+        self.assertEqual(name, "uploadedfiles/thumbnails/%s/100.jpg" % self.file.fileid)
+        self.assertTrue(default_storage.exists(name))
+        with default_storage.open(name, "rb") as f:
+            self.assertEqual(f.read(), thumbnail)
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (100, 50))
+
+    def test_get_thumbnail_reuses_the_saved_thumbnail(self):
+        thumbnail = get_thumbnail(self.file, 100)
+
+        with mock.patch.object(thumbnails, "create_thumbnail") as create_thumbnail:
+            self.assertEqual(get_thumbnail(self.file, 100), thumbnail)
+        create_thumbnail.assert_not_called()
+
+    def test_get_thumbnail_of_a_file_that_isnt_an_image(self):
+        file = models.File.objects.create(path=SimpleUploadedFile("notes.txt", b"not an image", content_type="text/plain"))
+
+        self.assertIsNone(get_thumbnail(file, 100))
+        self.assertFalse(default_storage.exists(get_thumbnail_name(file.fileid, 100)))
+
+    def test_thumbnails_are_deleted_with_the_file(self):
+        get_thumbnail(self.file, 100)
+        get_thumbnail(self.file, 200)
+
+        self.file.delete()
+
+        self.assertFalse(default_storage.exists(get_thumbnail_name(self.file.fileid, 100)))
+        self.assertFalse(default_storage.exists(get_thumbnail_name(self.file.fileid, 200)))
+        self.assertFalse(default_storage.exists(get_thumbnail_dir(self.file.fileid)))
+
+    def test_thumbnails_are_deleted_when_the_file_changes(self):
+        get_thumbnail(self.file, 100)
+
+        self.file.path = get_image_upload(name="other.png", size=(50, 300))
+        self.file.save()
+
+        self.assertFalse(default_storage.exists(get_thumbnail_name(self.file.fileid, 100)))
+        with Image.open(io.BytesIO(get_thumbnail(self.file, 100))) as image:
+            self.assertEqual(image.height, 100)
+            self.assertLess(image.width, 100)
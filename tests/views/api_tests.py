@@ -24,6 +24,9 @@ Replace this with more appropriate tests for your application.
 """
 
 import os
+import uuid
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 from tests import test_settings
 from tests.base_test import ArchesTestCase
 from django.urls import reverse
@@ -33,9 +36,11 @@ from arches.app.views.api import APIBase
 from arches.app.models import models
 from arches.app.models.graph import Graph
 from arches.app.models.resource import Resource
+from arches.app.models.system_settings import settings
 from arches.app.models.tile import Tile
 from arches.app.utils.betterJSONSerializer import JSONSerializer, JSONDeserializer
 from django.contrib.auth.models import User, Group, AnonymousUser
+from guardian.shortcuts import assign_perm
 
 # these tests can be run from the command line via
 # python manage.py test tests/views/api_tests.py --pattern="*.py" --settings="tests.test_settings"
@@ -380,3 +385,120 @@ class APITests(ArchesTestCase):
         # ==Assert==========================================================================================
         self.assertTrue("Resource matching query does not exist." in str(context_del.exception))  # Check exception message.
         # ==================================================================================================
+
+    def test_api_resources_follow_next_page(self):
+        """
+        Test that following "next" from the resources listing walks the pages in both cursor and page modes
+
+        """
+
+        resourceids = sorted(str(uuid.uuid4()) for i in range(5))
+        for resourceid in resourceids:
+            models.ResourceInstance.objects.create(resourceinstanceid=resourceid, graph_id=self.unique_graph.graphid)
+        base_url = "%s%s" % (settings.ARCHES_NAMESPACE_FOR_DATA_EXPORT, reverse("resources", args=[""]).lstrip("/"))
+        self.client.login(username="admin", password="admin")
+
+        for paging in ({}, {"page": 1}):
+            url = reverse("resources", kwargs={"resourceid": ""})
+            params = {"graph": str(self.unique_graph.graphid), **paging}
+            pages = []
+            with mock.patch.object(settings, "API_MAX_PAGE_SIZE", 2):
+                for i in range(3):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 200)
+                    data = JSONDeserializer().deserialize(response.content)
+                    pages.append([resourceid.replace(base_url, "") for resourceid in data["ldp:contains"]])
+                    if "next" not in data:
+                        break
+                    next_params = parse_qs(urlparse(data["next"]).query)
+                    self.assertTrue(all(len(values) == 1 for values in next_params.values()))
+                    self.assertEqual(next_params["graph"], [str(self.unique_graph.graphid)])
+                    url, params = data["next"], {}
+
+            self.assertEqual(pages, [resourceids[0:2], resourceids[2:4], resourceids[4:]])
+
+    def test_api_resources_stream_a_graph(self):
+        """
+        Test that the resources of a graph are streamed as newline delimited json-ld and n-triples
+
+        """
+
+        graphid = "330802c5-95bd-11e8-b7ac-acde48001122"
+        resourceids = {
+            str(resourceid)
+            for resourceid in models.TileModel.objects.filter(resourceinstance__graph_id=graphid).values_list(
+                "resourceinstance_id", flat=True
+            )
+        }
+        self.client.login(username="admin", password="admin")
+        url = reverse("resources", kwargs={"resourceid": ""})
+
+        response = self.client.get(url, {"graph": graphid, "format": "ndjson-ld"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual({JSONDeserializer().deserialize(line)["@id"].rstrip("/").split("/")[-1] for line in lines}, resourceids)
+
+        response = self.client.get(url, {"graph": graphid, "format": "nt"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/n-triples")
+        triples = b"".join(response.streaming_content).decode("utf-8")
+        for resourceid in resourceids:
+            self.assertIn("/resources/%s>" % resourceid, triples)
+
+        restricted_resourceid = sorted(resourceids)[0]
+        with mock.patch("arches.app.views.api.get_restricted_instances", return_value=[restricted_resourceid]):
+            response = self.client.get(url, {"graph": graphid, "format": "nt"})
+            triples = b"".join(response.streaming_content).decode("utf-8")
+        self.assertNotIn("/resources/%s>" % restricted_resourceid, triples)
+
+        self.assertEqual(self.client.get(url, {"format": "nt"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"graph": str(uuid.uuid4()), "format": "nt"}).status_code, 404)
+
+    def test_api_bulk_resources(self):
+        """
+        Test that the label based json of several resources is returned at once, leaving out the resources the user can't access
+
+        """
+
+        resourceids = sorted(
+            str(resourceid)
+            for resourceid in models.ResourceInstance.objects.filter(graph_id="330802c5-95bd-11e8-b7ac-acde48001122").values_list(
+                "resourceinstanceid", flat=True
+            )
+        )
+        self.assertTrue(len(resourceids) > 1)
+        url = reverse("api_bulk_resources")
+
+        self.client.logout()
+        response = self.client.get(url, {"resource_ids": ",".join(resourceids)})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(username="admin", password="admin")
+        response = self.client.get(url, {"resource_ids": ",".join(resourceids)})
+        self.assertEqual(response.status_code, 200)
+        resources = JSONDeserializer().deserialize(b"".join(response.streaming_content))
+        self.assertEqual(sorted(resource["@resource_id"] for resource in resources), resourceids)
+        for resource in resources:
+            expected = Resource.objects.get(pk=resource.pop("@resource_id")).to_json(compact=True)
+            self.assertEqual(JSONSerializer().serialize(resource, sort_keys=True), JSONSerializer().serialize(expected, sort_keys=True))
+
+        response = self.client.post(url, JSONSerializer().serialize({"resource_ids": resourceids}), content_type="application/json")
+        self.assertEqual(len(JSONDeserializer().deserialize(b"".join(response.streaming_content))), len(resourceids))
+
+        with mock.patch.object(settings, "API_MAX_BULK_RESOURCES", len(resourceids) - 1):
+            self.assertEqual(self.client.get(url, {"resource_ids": ",".join(resourceids)}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"resource_ids": "not-a-uuid"}).status_code, 400)
+
+        user = User.objects.create_user(username="bulk", email="bulk@archesproject.org", password="Test12345!")
+        user.groups.add(Group.objects.get(name="Guest"))
+        assign_perm("no_access_to_resourceinstance", user, models.ResourceInstance.objects.get(pk=resourceids[0]))
+        try:
+            self.client.login(username="bulk", password="Test12345!")
+            response = self.client.get(url, {"resource_ids": ",".join(resourceids)})
+            self.assertEqual(response.status_code, 200)
+            resources = JSONDeserializer().deserialize(b"".join(response.streaming_content))
+            self.assertEqual(sorted(resource["@resource_id"] for resource in resources), resourceids[1:])
+        finally:
+            user.delete()